@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Coaching attendance, revenue and coach-payment analytics
+Streams the coaching CSV exports or the coaching tables, aggregates per month and session type with numpy, and caches each month
+
+Sources:
+    csv   coaching_sessions.csv (one row per session with its head count),
+          the "Coaching Tracker - <type>.csv" registers (one row per player,
+          a 1 under each date attended, To Pay / Paid totals) and, if present,
+          coaching_analysis_data.csv for the coach's rate per session
+    db    coaching_sessions, coaching_attendance, coach_payment_config and
+          coach_payments, as extended by 20260109_coaching_attendance_system
+
+Each month's aggregates are cached with a fingerprint of that month's input,
+so a re-run only recomputes months whose rows changed (normally just the
+latest). In db mode unchanged months are not even fetched.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SESSIONS_CSV = REPO_ROOT / 'coaching_sessions.csv'
+ANALYSIS_CSV = REPO_ROOT / 'coaching_analysis_data.csv'
+TRACKER_GLOB = 'Coaching Tracker - *.csv'
+TRACKER_DIR = REPO_ROOT / 'screenshots'
+DEFAULT_CACHE = 'coaching_analytics_cache.json'
+CACHE_VERSION = 1
+
+SESSION_TYPES = ('Adults', 'Beginners', 'Juniors')
+# Tracker file suffixes -> session type
+TRACKER_TYPES = {'adults': 'Adults', 'beg': 'Beginners', 'beginners': 'Beginners', 'juniors': 'Juniors'}
+# £ per player per session; juniors are club-funded
+DEFAULT_SESSION_COSTS = {'Adults': 4.00, 'Beginners': 4.00, 'Juniors': 0.00}
+DEFAULT_COACH_RATE = 20.00
+PAYMENT_STATUSES = ('unpaid', 'pending_confirmation', 'paid')
+
+# Per month and session type; revenue_outstanding is expected less paid and pending
+FIELDS = ('sessions', 'attendance', 'revenue_expected', 'revenue_paid', 'revenue_pending',
+          'revenue_outstanding', 'coach_cost')
+MONEY_FIELDS = ('revenue_expected', 'revenue_paid', 'revenue_pending', 'revenue_outstanding', 'coach_cost',
+                'coach_paid')
+
+class Session(NamedTuple):
+    session_date: date
+    session_type: str
+    attendees: int
+    session_cost: float   # per attendee
+    coach_cost: float     # owed to the coach for the session
+
+class Attendance(NamedTuple):
+    session_date: date
+    session_type: str
+    player: str
+    amount: float
+    payment_status: str
+
+class CoachPayment(NamedTuple):
+    payment_date: date
+    amount: float
+
+def month_key(value: date) -> str:
+    return f"{value.year:04d}-{value.month:02d}"
+
+def money(text: str) -> float:
+    """'£12', '12', '£8.50' or '' as pounds"""
+    text = re.sub(r'[^0-9.\-]', '', text or '')
+    return float(text) if text else 0.0
+
+def read_sessions_csv(path, costs: Dict[str, float] = DEFAULT_SESSION_COSTS,
+                      coach_rate: float = DEFAULT_COACH_RATE) -> Iterator[Session]:
+    """coaching_sessions.csv rows: Date, Session Type, Number of Attendees"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            if not any((value or '').strip() for value in row.values()):
+                continue
+            try:
+                session_date = datetime.strptime(row['Date'].strip(), '%Y-%m-%d').date()
+                session_type = row['Session Type'].strip()
+                attendees = int(row['Number of Attendees'])
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"{path}:{reader.line_num}: unreadable session row ({e})") from None
+            yield Session(session_date, session_type, attendees, costs.get(session_type, 0.0), coach_rate)
+
+def tracker_session_type(path) -> str:
+    """'Coaching Tracker - Beg.csv' -> 'Beginners'"""
+    suffix = Path(path).stem.rsplit(' - ', 1)[-1].strip().lower()
+    if suffix not in TRACKER_TYPES:
+        raise ValueError(f"{path}: can't tell the session type from the file name")
+    return TRACKER_TYPES[suffix]
+
+def read_tracker_csv(path, costs: Dict[str, float] = DEFAULT_SESSION_COSTS) -> Iterator[Attendance]:
+    """
+    Attendance from a tracker register: Name, phone, one d/m/yy column per session, To Pay, Paid
+
+    The register only has a paid total per player, so it is applied to the
+    player's sessions oldest first: that many sessions count as paid and
+    the rest as unpaid.
+    """
+    session_type = tracker_session_type(path)
+    cost = costs.get(session_type, 0.0)
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        dates = {}
+        for column, title in enumerate(header):
+            try:
+                dates[column] = datetime.strptime(title.strip(), '%d/%m/%y').date()
+            except ValueError:
+                continue
+        paid_column = next((c for c, title in enumerate(header) if title.strip().lower() == 'paid'), None)
+        for row in reader:
+            player = row[0].strip() if row else ''
+            if not player:
+                continue
+            attended = sorted(dates[c] for c in dates if c < len(row) and row[c].strip() == '1')
+            paid = money(row[paid_column]) if paid_column is not None and paid_column < len(row) else 0.0
+            paid_sessions = int(round(paid / cost)) if cost else len(attended)
+            for n, session_date in enumerate(attended):
+                status = 'paid' if n < paid_sessions else 'unpaid'
+                yield Attendance(session_date, session_type, player, cost, status)
+
+def read_analysis_export(path) -> Dict[str, List[List[str]]]:
+    """coaching_analysis_data.csv as {section title: rows}, for the '=== TITLE ===' sections"""
+    sections: Dict[str, List[List[str]]] = {}
+    current = None
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            title = re.fullmatch(r'=== (.+) ===', row[0].strip())
+            if title:
+                current = sections.setdefault(title.group(1), [])
+            elif current is not None:
+                current.append(row)
+    return sections
+
+def analysis_coach_rate(path) -> Optional[float]:
+    """The 'Coach Cost Per Session' figure from the analysis export, if it has one"""
+    for row in read_analysis_export(path).get('SUMMARY METRICS', []):
+        if row[0].startswith('Coach Cost Per Session') and len(row) > 1:
+            return money(row[1])
+    return None
+
+# Per month, a fingerprint of everything that feeds its aggregates
+MONTH_FINGERPRINTS_SQL = """
+    SELECT month, md5(string_agg(item, ',' ORDER BY item))
+    FROM (
+        SELECT to_char(cs.session_date, 'YYYY-MM') AS month,
+               concat_ws('|', cs.id, cs.status, cs.session_type, cs.session_cost, cs.coach_payment_status,
+                         cs.coach_payment_amount, ca.player_id, ca.payment_status) AS item
+        FROM coaching_sessions cs
+        LEFT JOIN coaching_attendance ca ON ca.session_id = cs.id
+        WHERE cs.session_date <= CURRENT_DATE
+        UNION ALL
+        SELECT to_char(payment_date, 'YYYY-MM'), concat_ws('|', id, payment_date, amount)
+        FROM coach_payments
+    ) items
+    GROUP BY month
+"""
+
+# Rate changes apply to every month, so they are fingerprinted once for the whole cache
+RATES_FINGERPRINT_SQL = """
+    SELECT md5(COALESCE(string_agg(concat_ws('|', session_type, rate_per_session, effective_from, effective_to),
+                                   ',' ORDER BY session_type, effective_from), ''))
+    FROM coach_payment_config
+"""
+
+# Sessions the coach is owed for use the payment config rate in force on the day
+# unless the session overrides it; cancelled and future sessions are left out
+DB_SESSIONS_SQL = """
+    SELECT cs.session_date, cs.session_type, COUNT(ca.id), COALESCE(cs.session_cost, %s),
+           CASE WHEN COALESCE(cs.coach_payment_status, 'to_pay') = 'to_pay'
+                THEN COALESCE(cs.coach_payment_amount, rate.rate_per_session, %s)
+                ELSE 0 END
+    FROM coaching_sessions cs
+    LEFT JOIN coaching_attendance ca ON ca.session_id = cs.id
+    LEFT JOIN LATERAL (
+        SELECT c.rate_per_session
+        FROM coach_payment_config c
+        WHERE c.session_type = cs.session_type
+          AND c.effective_from <= cs.session_date
+          AND (c.effective_to IS NULL OR c.effective_to >= cs.session_date)
+        ORDER BY c.effective_from DESC
+        LIMIT 1
+    ) rate ON TRUE
+    WHERE cs.status <> 'cancelled' AND cs.session_date <= CURRENT_DATE
+      AND to_char(cs.session_date, 'YYYY-MM') = ANY(%s)
+    GROUP BY cs.id, cs.session_date, cs.session_type, cs.session_cost, cs.coach_payment_status,
+             cs.coach_payment_amount, rate.rate_per_session
+"""
+
+DB_ATTENDANCE_SQL = """
+    SELECT cs.session_date, cs.session_type, ca.player_id, COALESCE(cs.session_cost, %s),
+           COALESCE(ca.payment_status, 'unpaid')
+    FROM coaching_attendance ca
+    JOIN coaching_sessions cs ON ca.session_id = cs.id
+    WHERE cs.status <> 'cancelled' AND cs.session_date <= CURRENT_DATE
+      AND to_char(cs.session_date, 'YYYY-MM') = ANY(%s)
+"""
+
+DB_COACH_PAYMENTS_SQL = """
+    SELECT payment_date, amount
+    FROM coach_payments
+    WHERE to_char(payment_date, 'YYYY-MM') = ANY(%s)
+"""
+
+def aggregate(sessions: Sequence[Session], attendance: Sequence[Attendance],
+              coach_payments: Sequence[CoachPayment] = ()) -> Dict[str, Dict]:
+    """
+    Per month: {'types': {session_type: {field: value}}, 'coach_paid': pounds}
+
+    Sessions and attendance are grouped by (month, session type) with
+    np.bincount over a combined key, so the cost is a few array passes
+    whatever the number of rows.
+    """
+    months = sorted({month_key(r.session_date) for r in sessions}
+                    | {month_key(r.session_date) for r in attendance}
+                    | {month_key(r.payment_date) for r in coach_payments})
+    if not months:
+        return {}
+    month_index = {month: i for i, month in enumerate(months)}
+    type_index = {session_type: i for i, session_type in enumerate(SESSION_TYPES)}
+    for record in [*sessions, *attendance]:
+        if record.session_type not in type_index:
+            type_index[record.session_type] = len(type_index)
+    types = list(type_index)
+    size = len(months) * len(types)
+
+    def keys(records) -> np.ndarray:
+        return np.fromiter((month_index[month_key(r.session_date)] * len(types) + type_index[r.session_type]
+                            for r in records), dtype=np.int64, count=len(records))
+
+    session_keys = keys(sessions)
+    attendees = np.fromiter((r.attendees for r in sessions), dtype=np.float64, count=len(sessions))
+    session_cost = np.fromiter((r.session_cost for r in sessions), dtype=np.float64, count=len(sessions))
+    coach_cost = np.fromiter((r.coach_cost for r in sessions), dtype=np.float64, count=len(sessions))
+
+    attendance_keys = keys(attendance)
+    amount = np.fromiter((r.amount for r in attendance), dtype=np.float64, count=len(attendance))
+    status = np.fromiter((PAYMENT_STATUSES.index(r.payment_status) if r.payment_status in PAYMENT_STATUSES else 0
+                          for r in attendance), dtype=np.int8, count=len(attendance))
+
+    totals = {
+        'sessions': np.bincount(session_keys, minlength=size).astype(np.float64),
+        'attendance': np.bincount(session_keys, weights=attendees, minlength=size),
+        'revenue_expected': np.bincount(session_keys, weights=attendees * session_cost, minlength=size),
+        'revenue_paid': np.bincount(attendance_keys, weights=amount * (status == 2), minlength=size),
+        'revenue_pending': np.bincount(attendance_keys, weights=amount * (status == 1), minlength=size),
+        'coach_cost': np.bincount(session_keys, weights=coach_cost, minlength=size),
+    }
+    totals['revenue_outstanding'] = np.maximum(
+        totals['revenue_expected'] - totals['revenue_paid'] - totals['revenue_pending'], 0.0)
+    grid = {field: values.reshape(len(months), len(types)) for field, values in totals.items()}
+
+    payment_months = np.fromiter((month_index[month_key(r.payment_date)] for r in coach_payments),
+                                 dtype=np.int64, count=len(coach_payments))
+    coach_paid = np.bincount(payment_months, weights=np.fromiter((r.amount for r in coach_payments), dtype=np.float64,
+                                                                 count=len(coach_payments)), minlength=len(months))
+
+    result = {}
+    for m, month in enumerate(months):
+        by_type = {}
+        for t, session_type in enumerate(types):
+            if grid['sessions'][m, t] or grid['revenue_paid'][m, t] or grid['revenue_pending'][m, t]:
+                by_type[session_type] = {field: (round(float(grid[field][m, t]), 2) if field in MONEY_FIELDS
+                                                 else int(grid[field][m, t])) for field in FIELDS}
+        result[month] = {'types': by_type, 'coach_paid': round(float(coach_paid[m]), 2)}
+    return result
+
+def group_by_month(records: Iterable, date_field: str) -> Dict[str, List]:
+    grouped: Dict[str, List] = {}
+    for record in records:
+        grouped.setdefault(month_key(getattr(record, date_field)), []).append(record)
+    return grouped
+
+def fingerprint(*groups: Sequence) -> str:
+    digest = hashlib.md5()
+    for records in groups:
+        for record in sorted(map(repr, records)):
+            digest.update(record.encode())
+            digest.update(b'\n')
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+def load_cache(path: Optional[str], source: str, settings: Dict) -> Dict[str, Dict]:
+    """Cached months, or nothing if the cache was built from another source or with other settings"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        cache = json.load(f)
+    if cache.get('version') != CACHE_VERSION or cache.get('source') != source or cache.get('settings') != settings:
+        return {}
+    return cache.get('months', {})
+
+def save_cache(path: str, source: str, settings: Dict, months: Dict[str, Dict]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'source': source, 'settings': settings, 'months': months}, f, indent=1)
+    os.replace(tmp_path, path)
+
+def csv_months(sessions_path, tracker_paths: Sequence, cached: Dict[str, Dict], costs: Dict[str, float],
+               coach_rate: float) -> Tuple[Dict[str, Dict], List[str]]:
+    """
+    Aggregates for every month in the exports, reusing cached months whose rows are unchanged
+
+    Returns ({month: {'fingerprint', 'aggregates'}}, months recomputed).
+    """
+    sessions = group_by_month(read_sessions_csv(sessions_path, costs, coach_rate), 'session_date')
+    attendance = group_by_month((row for path in tracker_paths for row in read_tracker_csv(path, costs)),
+                                'session_date')
+    months, stale = {}, []
+    for month in sorted(set(sessions) | set(attendance)):
+        digest = fingerprint(sessions.get(month, ()), attendance.get(month, ()))
+        if month in cached and cached[month]['fingerprint'] == digest:
+            months[month] = cached[month]
+        else:
+            months[month] = {'fingerprint': digest}
+            stale.append(month)
+
+    if stale:
+        fresh = aggregate([r for month in stale for r in sessions.get(month, ())],
+                          [r for month in stale for r in attendance.get(month, ())])
+        for month in stale:
+            months[month]['aggregates'] = fresh[month]
+    return months, stale
+
+def db_months(cur, cached: Dict[str, Dict], costs: Dict[str, float],
+              coach_rate: float) -> Tuple[Dict[str, Dict], List[str]]:
+    """As csv_months, fetching rows only for months whose server-side fingerprint changed"""
+    cur.execute(MONTH_FINGERPRINTS_SQL)
+    digests = dict(cur.fetchall())
+    months, stale = {}, []
+    for month in sorted(digests):
+        if month in cached and cached[month]['fingerprint'] == digests[month]:
+            months[month] = cached[month]
+        else:
+            months[month] = {'fingerprint': digests[month]}
+            stale.append(month)
+    if not stale:
+        return months, stale
+
+    default_cost = costs['Adults']
+    cur.execute(DB_SESSIONS_SQL, (default_cost, coach_rate, stale))
+    sessions = [Session(session_date, session_type, attendees, float(cost), float(coach_cost))
+                for session_date, session_type, attendees, cost, coach_cost in cur.fetchall()]
+    cur.execute(DB_ATTENDANCE_SQL, (default_cost, stale))
+    attendance = [Attendance(session_date, session_type, str(player_id), float(cost), status)
+                  for session_date, session_type, player_id, cost, status in cur.fetchall()]
+    cur.execute(DB_COACH_PAYMENTS_SQL, (stale,))
+    payments = [CoachPayment(payment_date, float(amount)) for payment_date, amount in cur.fetchall()]
+
+    fresh = aggregate(sessions, attendance, payments)
+    empty = {'types': {}, 'coach_paid': 0.0}
+    for month in stale:
+        months[month]['aggregates'] = fresh.get(month, empty)
+    return months, stale
+
+def report_rows(months: Dict[str, Dict]) -> List[Dict]:
+    """Flat rows: one per month and session type, then a month total"""
+    rows = []
+    for month, entry in sorted(months.items()):
+        aggregates = entry['aggregates']
+        total = dict.fromkeys(FIELDS, 0)
+        for session_type, values in aggregates['types'].items():
+            rows.append({'month': month, 'session_type': session_type, **values})
+            for field in FIELDS:
+                total[field] += values[field]
+        rows.append({'month': month, 'session_type': 'All', **total, 'coach_paid': aggregates['coach_paid']})
+    for row in rows:
+        row['attendance_per_session'] = round(row['attendance'] / row['sessions'], 2) if row['sessions'] else 0.0
+        row['margin'] = round(row['revenue_paid'] - row['coach_cost'], 2)
+        for field in MONEY_FIELDS:
+            if field in row:
+                row[field] = round(row[field], 2)
+    return rows
+
+def print_report(rows: List[Dict]):
+    print(f"{'Month':<8} {'Type':<10} {'Sess':>4} {'Att':>4} {'Avg':>5} {'Expected':>9} {'Paid':>8} "
+          f"{'Pending':>8} {'Owed':>8} {'Coach':>8} {'Margin':>8}")
+    for row in rows:
+        if row['session_type'] == 'All':
+            print('-' * 92)
+        print(f"{row['month']:<8} {row['session_type']:<10} {row['sessions']:>4} {row['attendance']:>4} "
+              f"{row['attendance_per_session']:>5.1f} {row['revenue_expected']:>9.2f} {row['revenue_paid']:>8.2f} "
+              f"{row['revenue_pending']:>8.2f} {row['revenue_outstanding']:>8.2f} {row['coach_cost']:>8.2f} "
+              f"{row['margin']:>8.2f}")
+    totals = [row for row in rows if row['session_type'] == 'All']
+    expected = sum(row['revenue_expected'] for row in totals)
+    paid = sum(row['revenue_paid'] for row in totals)
+    coach_cost = sum(row['coach_cost'] for row in totals)
+    coach_paid = sum(row.get('coach_paid', 0) for row in totals)
+    print(f"\n📊 {sum(row['sessions'] for row in totals)} sessions, {sum(row['attendance'] for row in totals)} attendances; "
+          f"£{paid:.2f} of £{expected:.2f} collected ({paid / expected:.1%})" if expected else
+          "\n📊 No chargeable sessions")
+    print(f"   Coach: £{coach_cost:.2f} owed for sessions, £{coach_paid:.2f} paid")
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Coaching attendance, revenue and coach-payment report by month")
+    parser.add_argument('--source', choices=('csv', 'db'), default='csv')
+    parser.add_argument('--sessions-csv', default=str(SESSIONS_CSV), help="Session head counts (csv source)")
+    parser.add_argument('--tracker', action='append', dest='trackers', metavar='PATH',
+                        help=f"Tracker register CSV (repeatable; default {TRACKER_DIR.name}/{TRACKER_GLOB})")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--coach-rate', type=float,
+                        help=f"£ owed to the coach per session (default: the analysis export's figure, else "
+                             f"{DEFAULT_COACH_RATE:.2f}; db source uses coach_payment_config first)")
+    parser.add_argument('--session-cost', type=float, default=DEFAULT_SESSION_COSTS['Adults'],
+                        help="£ per player for Adults and Beginners sessions")
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help=f"Per-month cache file (default ./{DEFAULT_CACHE})")
+    parser.add_argument('--no-cache', action='store_true', help="Recompute every month and leave the cache alone")
+    parser.add_argument('--format', choices=('table', 'json', 'csv'), default='table')
+    parser.add_argument('-o', '--output', help="Output file for json/csv (default stdout)")
+    args = parser.parse_args(argv)
+
+    coach_rate = args.coach_rate
+    if coach_rate is None and args.source == 'csv' and ANALYSIS_CSV.exists():
+        coach_rate = analysis_coach_rate(ANALYSIS_CSV)
+    coach_rate = coach_rate if coach_rate is not None else DEFAULT_COACH_RATE
+    costs = {**DEFAULT_SESSION_COSTS, 'Adults': args.session_cost, 'Beginners': args.session_cost}
+    settings = {'coach_rate': coach_rate, 'session_costs': costs}
+
+    start = time.perf_counter()
+    cache_path = None if args.no_cache else args.cache
+    if args.source == 'csv':
+        trackers = args.trackers or sorted(str(path) for path in TRACKER_DIR.glob(TRACKER_GLOB))
+        months, stale = csv_months(args.sessions_csv, trackers, load_cache(cache_path, 'csv', settings),
+                                   costs, coach_rate)
+    else:
+        from elo_db import connection
+        with connection(args.dsn) as conn, conn.cursor() as cur:
+            cur.execute(RATES_FINGERPRINT_SQL)
+            settings['rates'] = cur.fetchone()[0]
+            months, stale = db_months(cur, load_cache(cache_path, 'db', settings), costs, coach_rate)
+    if cache_path:
+        save_cache(cache_path, args.source, settings, months)
+    elapsed = time.perf_counter() - start
+
+    rows = report_rows(months)
+    if args.format == 'table':
+        print_report(rows)
+    else:
+        out = open(args.output, 'w', newline='') if args.output else sys.stdout
+        try:
+            if args.format == 'json':
+                json.dump(rows, out, indent=2)
+                out.write('\n')
+            elif rows:
+                writer = csv.DictWriter(out, fieldnames=list(rows[-1]), restval='')
+                writer.writeheader()
+                writer.writerows(rows)
+        finally:
+            if args.output:
+                out.close()
+    print(f"⏱️  {len(months)} months, {len(stale)} recomputed ({', '.join(stale) or 'none'}) in {elapsed * 1000:.1f} ms",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,19 @@
 #!/usr/bin/env python3
 """
 ELO Calculator Helper - Calculate ELO changes for Winter 25 matches
+Writes the elo_history rows as a batched INSERT script or a COPY file for psql
 """
 
-import math
+import argparse
+import json
+from typing import Dict, Iterator, List, Tuple
 
-def calculate_expected_score(rating_a: float, rating_b: float) -> float:
-    """Calculate expected score using ELO formula"""
-    return 1.0 / (1.0 + math.pow(10, (rating_b - rating_a) / 400))
+from elo_engine import DEFAULT_K_FACTOR, FixtureBatch, RatingStore, replay_season
+from elo_history_writer import DEFAULT_BATCH_SIZE, history_rows
+from elo_snapshot import Snapshot
+from elo_sql_emitter import OUTPUT_FORMATS, copy_command, emit, execute_inserts
 
-def update_elo(old_rating: float, actual_score: float, expected_score: float, k_factor: int = 32) -> float:
-    """Update ELO rating based on match result"""
-    return old_rating + k_factor * (actual_score - expected_score)
-
-# Current ELO ratings
+# Current ELO ratings (replace with --snapshot to start from a current elo_snapshot.py file)
 players = {
     'cb3c3050-19a6-4f39-b7bf-f218c73964c4': {'name': 'Ben', 'elo': 1110, 'season_player_id': '0babd282-5efb-4360-8e0c-a84739bc1124'},
     '2447e434-4cfd-4cde-8587-e90f5b9bc402': {'name': 'Bev', 'elo': 1070, 'season_player_id': '40d28b67-7984-404a-b170-3a69aa58a300'},
@@ -38,97 +38,93 @@ players = {
     '195aa25e-1ce4-4de9-99c7-17253ed45d9a': {'name': 'Tim', 'elo': 1120, 'season_player_id': '87de9fe5-806f-4a60-85f2-b12a9e5df53d'},
 }
 
-def process_match(fixture_id, pair1_ids, pair2_ids, pair1_score, pair2_score, created_at, week):
-    """Process a match and generate SQL for ELO updates"""
-    
-    # Get current ELO ratings
-    pair1_elos = [players[pid]['elo'] for pid in pair1_ids]
-    pair2_elos = [players[pid]['elo'] for pid in pair2_ids]
-    
-    pair1_avg = sum(pair1_elos) / 2
-    pair2_avg = sum(pair2_elos) / 2
-    
-    # Calculate expected scores
-    pair1_expected = calculate_expected_score(pair1_avg, pair2_avg)
-    pair2_expected = 1.0 - pair1_expected
-    
-    # Calculate actual scores
-    total_games = pair1_score + pair2_score
-    pair1_actual = pair1_score / total_games if total_games > 0 else 0.5
-    pair2_actual = pair2_score / total_games if total_games > 0 else 0.5
-    
-    print(f"\n=== Match: Week {week} ===")
-    print(f"Fixture ID: {fixture_id}")
-    print(f"Pair 1: {[players[pid]['name'] for pid in pair1_ids]} (Avg ELO: {pair1_avg:.0f})")
-    print(f"Pair 2: {[players[pid]['name'] for pid in pair2_ids]} (Avg ELO: {pair2_avg:.0f})")
-    print(f"Score: {pair1_score}-{pair2_score}")
-    print(f"Expected: {pair1_expected:.3f} vs {pair2_expected:.3f}")
-    print(f"Actual: {pair1_actual:.3f} vs {pair2_actual:.3f}")
-    print()
+# The match this helper was first written for
+EXAMPLE_FIXTURES = [
+    {
+        'fixture_id': '974a4908-0917-4938-965f-7d9e3958f492',
+        'pair1': ['c43d2d40-0e50-4059-90c5-ff4d6b3af11f', 'abc931be-0bd9-4a88-8382-9bab512c350c'],  # Charlie + Oxy
+        'pair2': ['1d2cc410-a11f-47c0-89b4-da8ff8a55677', 'cb3c3050-19a6-4f39-b7bf-f218c73964c4'],  # James + Ben
+        'pair1_score': 4,
+        'pair2_score': 4,
+        'created_at': '2025-09-01 07:08:18.698302+00',
+        'week': 1,
+    },
+]
+
+def process_matches(fixtures: List[Dict], k_factor: int = DEFAULT_K_FACTOR,
+                    verbose: bool = True) -> Iterator[Tuple]:
+    """
+    Replay fixtures in order from the current ratings and return their elo_history rows
+
+    Each fixture is a dict with fixture_id, pair1/pair2 player IDs, scores,
+    created_at and week. players is updated with the new ratings; the rows
+    are generated lazily so they can be streamed straight to a file.
+    """
+    store = RatingStore.from_dict({player_id: player['elo'] for player_id, player in players.items()})
+    batch = FixtureBatch()
+    for fixture in fixtures:
+        batch.add([store.index[player_id] for player_id in fixture['pair1'] + fixture['pair2']],
+                  fixture['pair1_score'], fixture['pair2_score'],
+                  fixture['fixture_id'], fixture['created_at'], fixture.get('week'))
+    result = replay_season(store, batch, k_factor)
+
+    if verbose:
+        for f, fixture in enumerate(fixtures):
+            print(f"\n=== Match: Week {fixture.get('week')} ===")
+            print(f"Fixture ID: {fixture['fixture_id']}")
+            print(f"Pair 1: {[players[pid]['name'] for pid in fixture['pair1']]} (Avg ELO: {result.pair_avgs[2*f]:.0f})")
+            print(f"Pair 2: {[players[pid]['name'] for pid in fixture['pair2']]} (Avg ELO: {result.pair_avgs[2*f+1]:.0f})")
+            print(f"Score: {fixture['pair1_score']}-{fixture['pair2_score']}")
+            print(f"Expected: {result.pair_expected[2*f]:.3f} vs {result.pair_expected[2*f+1]:.3f}")
+            print(f"Actual: {result.actual[2*f]:.3f} vs {result.actual[2*f+1]:.3f}")
+            print()
+            for slot in range(4 * f, 4 * f + 4):
+                name = players[store.keys[batch.players[slot]]]['name']
+                old_elo, new_elo = result.old_ratings[slot], result.new_ratings[slot]
+                print(f"{name}: {old_elo:.0f} → {new_elo:.0f} ({result.deltas[slot]:+.0f})")
+
+    # Carry the new ratings forward for any later calculation
+    for player_id, rating in store.to_dict().items():
+        players[player_id]['elo'] = rating
+
+    season_player_ids = [players[player_id]['season_player_id'] for player_id in store.keys]
+    return history_rows(batch, result, season_player_ids)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculate ELO changes for Winter 25 matches and write the SQL")
+    parser.add_argument('--snapshot', help="Load current ratings from an elo_snapshot.py file")
+    parser.add_argument('--fixtures', help="JSON list of fixtures to process in order (default: the built-in example)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='insert',
+                        help="Batched INSERT script, or a COPY data file for psql \\copy (default insert)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per INSERT statement")
+    parser.add_argument('-o', '--output', default='elo_history_backfill.sql', help="File to write")
+    parser.add_argument('--execute', action='store_true',
+                        help="Insert the rows directly with parameterised batched INSERTs instead of writing a file")
+    parser.add_argument('--dsn', help="Postgres connection string for --execute (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--quiet', action='store_true', help="Skip the per-match breakdown")
+    args = parser.parse_args()
     
-    # Generate SQL statements
-    sql_statements = []
+    if args.snapshot:
+        with Snapshot(args.snapshot) as snapshot:
+            players = snapshot.players_by_id()
     
-    # Process pair 1 players
-    for i, player_id in enumerate(pair1_ids):
-        old_elo = players[player_id]['elo']
-        new_elo = update_elo(old_elo, pair1_actual, pair1_expected)
-        rating_change = new_elo - old_elo
-        season_player_id = players[player_id]['season_player_id']
-        
-        # Update the player's ELO for next calculation
-        players[player_id]['elo'] = new_elo
-        
-        # Create ELO history insert
-        sql = f"""
-INSERT INTO elo_history (
-    season_player_id, match_fixture_id, old_rating, new_rating, 
-    rating_change, k_factor, opponent_avg_rating, expected_score, 
-    actual_score, created_at
-) VALUES (
-    '{season_player_id}', '{fixture_id}', {int(old_elo)}, {int(new_elo)}, 
-    {int(rating_change)}, 32, {int(pair2_avg)}, {pair1_expected:.6f}, 
-    {pair1_actual:.6f}, '{created_at}'
-);"""
-        sql_statements.append(sql)
-        
-        print(f"{players[player_id]['name']}: {old_elo:.0f} → {new_elo:.0f} ({rating_change:+.0f})")
+    fixtures = EXAMPLE_FIXTURES
+    if args.fixtures:
+        with open(args.fixtures) as f:
+            fixtures = json.load(f)
     
-    # Process pair 2 players
-    for i, player_id in enumerate(pair2_ids):
-        old_elo = players[player_id]['elo']
-        new_elo = update_elo(old_elo, pair2_actual, pair2_expected)
-        rating_change = new_elo - old_elo
-        season_player_id = players[player_id]['season_player_id']
+    rows = process_matches(fixtures, verbose=not args.quiet)
+    if args.execute:
+        from elo_db import connection
+        # One transaction: a failing batch leaves no rows behind
+        with connection(args.dsn) as conn, conn.cursor() as cur:
+            written = execute_inserts(cur, rows, batch_size=args.batch_size)
+        print(f"\n✅ Inserted {written} elo_history rows")
+    else:
+        written = emit(args.output, rows, args.format, args.batch_size)
         
-        # Update the player's ELO for next calculation
-        players[player_id]['elo'] = new_elo
-        
-        # Create ELO history insert
-        sql = f"""
-INSERT INTO elo_history (
-    season_player_id, match_fixture_id, old_rating, new_rating, 
-    rating_change, k_factor, opponent_avg_rating, expected_score, 
-    actual_score, created_at
-) VALUES (
-    '{season_player_id}', '{fixture_id}', {int(old_elo)}, {int(new_elo)}, 
-    {int(rating_change)}, 32, {int(pair1_avg)}, {pair2_expected:.6f}, 
-    {pair2_actual:.6f}, '{created_at}'
-);"""
-        sql_statements.append(sql)
-        
-        print(f"{players[player_id]['name']}: {old_elo:.0f} → {new_elo:.0f} ({rating_change:+.0f})")
-    
-    return sql_statements
-
-# Process first match
-match1_sql = process_match(
-    '974a4908-0917-4938-965f-7d9e3958f492',
-    ['c43d2d40-0e50-4059-90c5-ff4d6b3af11f', 'abc931be-0bd9-4a88-8382-9bab512c350c'],  # Charlie + Oxy
-    ['1d2cc410-a11f-47c0-89b4-da8ff8a55677', 'cb3c3050-19a6-4f39-b7bf-f218c73964c4'],  # James + Ben
-    4, 4, '2025-09-01 07:08:18.698302+00', 1
-)
-
-print("SQL to execute:")
-for sql in match1_sql:
-    print(sql)
\ No newline at end of file
+        print(f"\n📄 Wrote {written} elo_history rows to {args.output}")
+        if args.format == 'copy':
+            print(f"Load from psql with: {copy_command(args.output)}")
+        else:
+            print(f"Apply with: psql \"$DATABASE_URL\" -f {args.output}")
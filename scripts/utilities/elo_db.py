@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Shared database access for the ELO utilities
+Connection settings from the environment, one connection pool per process, prepared hot queries and typed rows
+"""
+
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import execute_batch
+from psycopg2.pool import ThreadedConnectionPool
+
+# DATABASE_URL wins; without it libpq reads PGHOST, PGUSER, PGPASSWORD etc.
+DSN_ENV = 'DATABASE_URL'
+POOL_MIN = int(os.environ.get('ELO_DB_POOL_MIN', 1))
+POOL_MAX = int(os.environ.get('ELO_DB_POOL_MAX', 4))
+# Supabase's transaction-mode pooler (port 6543) can't keep prepared
+# statements between transactions; set ELO_DB_PREPARE=0 when using it
+PREPARE_STATEMENTS = os.environ.get('ELO_DB_PREPARE', '1') != '0'
+
+class Season(NamedTuple):
+    id: str
+    name: str
+    k_factor: int
+    result_count: int
+
+class SeasonPlayer(NamedTuple):
+    season_player_id: str
+    player_id: str
+    name: str
+    starting_elo: float
+
+class FixtureResult(NamedTuple):
+    """Field order matches FixtureBatch.from_rows"""
+    fixture_id: str
+    pair1_player1_id: Optional[str]
+    pair1_player2_id: Optional[str]
+    pair2_player1_id: Optional[str]
+    pair2_player2_id: Optional[str]
+    pair1_score: int
+    pair2_score: int
+    created_at: datetime
+    week: Optional[int]
+
+SEASONS_SQL = """
+    SELECT s.id, s.name, COALESCE(s.elo_k_factor, 32) AS k_factor, COUNT(mr.fixture_id) AS result_count
+    FROM seasons s
+    LEFT JOIN matches m ON m.season_id = s.id
+    LEFT JOIN match_fixtures mf ON mf.match_id = m.id
+    LEFT JOIN match_results mr ON mr.fixture_id = mf.id
+    WHERE s.elo_enabled
+    GROUP BY s.id, s.name, s.elo_k_factor, s.start_date
+    ORDER BY s.start_date
+"""
+
+# Starting ratings come from each player's first elo_history row when there
+# is one: once a season has been backdated, season_players.elo_rating holds
+# the final rating, not the starting one.
+SEASON_PLAYERS_SQL = """
+    SELECT sp.id, sp.player_id, p.name,
+           COALESCE(first_eh.old_rating, sp.elo_rating) AS starting_elo
+    FROM season_players sp
+    JOIN profiles p ON sp.player_id = p.id
+    LEFT JOIN LATERAL (
+        SELECT eh.old_rating
+        FROM elo_history eh
+        WHERE eh.season_player_id = sp.id
+        ORDER BY eh.created_at, eh.match_fixture_id
+        LIMIT 1
+    ) first_eh ON TRUE
+    WHERE sp.season_id = %s
+    ORDER BY p.name
+"""
+
+ORDERED_RESULTS_SQL = """
+    SELECT
+        mf.id as fixture_id,
+        mf.pair1_player1_id,
+        mf.pair1_player2_id,
+        mf.pair2_player1_id,
+        mf.pair2_player2_id,
+        mr.pair1_score,
+        mr.pair2_score,
+        mr.created_at,
+        m.week_number
+    FROM match_fixtures mf
+    JOIN matches m ON mf.match_id = m.id
+    JOIN match_results mr ON mf.id = mr.fixture_id
+    WHERE m.season_id = %s
+    ORDER BY mr.created_at, mf.id
+"""
+
+INSERT_ELO_HISTORY_SQL = """
+    INSERT INTO elo_history (
+        season_player_id, match_fixture_id, old_rating, new_rating,
+        rating_change, k_factor, opponent_avg_rating, expected_score,
+        actual_score, created_at
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# name -> (parameter types, SQL with %s placeholders)
+PREPARED = {
+    'elo_season_players': (('uuid',), SEASON_PLAYERS_SQL),
+    'elo_ordered_results': (('uuid',), ORDERED_RESULTS_SQL),
+    'elo_insert_history': (('uuid', 'uuid', 'integer', 'integer', 'integer', 'integer', 'integer',
+                            'double precision', 'double precision', 'timestamptz'), INSERT_ELO_HISTORY_SQL),
+}
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """A connection that remembers which statements it has prepared"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+def _numbered(sql: str) -> str:
+    """Swap %s placeholders for PREPARE's $1, $2, ..."""
+    parts = sql.split('%s')
+    return parts[0] + ''.join(f"${i}{part}" for i, part in enumerate(parts[1:], 1))
+
+def _ensure_prepared(cur, name: str) -> str:
+    """PREPARE a statement on the cursor's connection once; returns the EXECUTE template"""
+    types, sql = PREPARED[name]
+    conn = cur.connection
+    if name not in conn.prepared:
+        cur.execute(f"PREPARE {name} ({', '.join(types)}) AS {_numbered(sql)}")
+        conn.prepared.add(name)
+    return f"EXECUTE {name} ({', '.join(['%s'] * len(types))})"
+
+def execute_prepared(cur, name: str, params: Sequence):
+    """Run one of the PREPARED statements, preparing it on first use per connection"""
+    if PREPARE_STATEMENTS and isinstance(getattr(cur, 'connection', None), PreparingConnection):
+        cur.execute(_ensure_prepared(cur, name), params)
+    else:
+        cur.execute(PREPARED[name][1], params)
+
+_pools: Dict[Tuple[int, str], ThreadedConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def database_url(dsn: Optional[str] = None) -> str:
+    """The connection string to use: explicit, then $DATABASE_URL, then libpq's PG* variables"""
+    return dsn or os.environ.get(DSN_ENV, '')
+
+def get_pool(dsn: Optional[str] = None) -> ThreadedConnectionPool:
+    """
+    The process-wide pool for a DSN
+
+    Pools are keyed by process ID as well, so a forked worker opens its own
+    connections instead of sharing the parent's sockets.
+    """
+    key = (os.getpid(), database_url(dsn))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ThreadedConnectionPool(POOL_MIN, POOL_MAX, key[1],
+                                                        connection_factory=PreparingConnection)
+    return pool
+
+@contextmanager
+def connection(dsn: Optional[str] = None, metrics=None) -> Iterator[PreparingConnection]:
+    """
+    Borrow a pooled connection for one transaction
+
+    Commits when the block succeeds and rolls back if it raises. Connections
+    that broke mid-transaction are discarded instead of being returned.
+    With an elo_metrics.Metrics, the borrow and the commit are timed as the
+    connect and commit phases.
+    """
+    start = time.perf_counter()
+    pool = get_pool(dsn)
+    conn = pool.getconn()
+    if metrics is not None:
+        metrics.add('connect', time.perf_counter() - start)
+    try:
+        yield conn
+        start = time.perf_counter()
+        conn.commit()
+        if metrics is not None:
+            metrics.add('commit', time.perf_counter() - start)
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+            # Don't rely on statements prepared in the failed transaction
+            with conn.cursor() as cur:
+                cur.execute("DEALLOCATE ALL")
+            conn.commit()
+            conn.prepared.clear()
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+def close_pools():
+    """Close every pool this process opened"""
+    with _pools_lock:
+        for (pid, _), pool in list(_pools.items()):
+            if pid == os.getpid():
+                pool.closeall()
+        _pools.clear()
+
+atexit.register(close_pools)
+
+def fetch_seasons(cur) -> List[Season]:
+    cur.execute(SEASONS_SQL)
+    return [Season(str(season_id), name, k_factor, result_count)
+            for season_id, name, k_factor, result_count in cur.fetchall()]
+
+def fetch_season_players(cur, season_id: str) -> List[SeasonPlayer]:
+    """Season players with their starting rating, ordered by name"""
+    execute_prepared(cur, 'elo_season_players', (season_id,))
+    return [SeasonPlayer(str(season_player_id), str(player_id), name, starting_elo)
+            for season_player_id, player_id, name, starting_elo in cur.fetchall()]
+
+def fixture_results(rows: Iterable[Sequence]) -> List[FixtureResult]:
+    """Typed rows from ORDERED_RESULTS_SQL output, with IDs as strings"""
+    return [FixtureResult(str(fixture_id), *(str(pid) if pid else None for pid in (p1p1, p1p2, p2p1, p2p2)),
+                          pair1_score, pair2_score, created_at, week)
+            for fixture_id, p1p1, p1p2, p2p1, p2p2, pair1_score, pair2_score, created_at, week in rows]
+
+def fetch_ordered_results(cur, season_id: str) -> List[FixtureResult]:
+    """Every fixture with a result, in replay order (created_at, fixture ID)"""
+    execute_prepared(cur, 'elo_ordered_results', (season_id,))
+    return fixture_results(cur.fetchall())
+
+def insert_history_rows(cur, rows: Iterable[Sequence], page_size: int = 100) -> int:
+    """
+    Insert elo_history rows through the prepared INSERT, page_size per round trip
+
+    Cheaper than COPY for the handful of rows an incremental run appends.
+    """
+    rows = list(rows)
+    if PREPARE_STATEMENTS and isinstance(getattr(cur, 'connection', None), PreparingConnection):
+        execute_batch(cur, _ensure_prepared(cur, 'elo_insert_history'), rows, page_size=page_size)
+    else:
+        execute_batch(cur, INSERT_ELO_HISTORY_SQL, rows, page_size=page_size)
+    return len(rows)
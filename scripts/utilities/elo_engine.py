@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Shared ELO engine for the ladder utility scripts
+Replays whole seasons of doubles fixtures against an array-backed rating store
+"""
+
+import math
+from array import array
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_K_FACTOR = 32
+# Selectable with replay_with_model(); elo is the production model
+RATING_MODELS = ('elo', 'glicko2')
+
+def calculate_expected_score(rating_a: float, rating_b: float) -> float:
+    """Calculate expected score using ELO formula"""
+    return 1.0 / (1.0 + math.pow(10, (rating_b - rating_a) / 400))
+
+def update_elo(old_rating: float, actual_score: float, expected_score: float, k_factor: int = DEFAULT_K_FACTOR) -> float:
+    """Update ELO rating based on match result"""
+    return old_rating + k_factor * (actual_score - expected_score)
+
+def actual_scores(pair1_score: int, pair2_score: int) -> Tuple[float, float]:
+    """Normalise a games score to 0-1 actual scores (0-0 counts as a draw)"""
+    total_games = pair1_score + pair2_score
+    if total_games > 0:
+        return pair1_score / total_games, pair2_score / total_games
+    return 0.5, 0.5
+
+class RatingStore:
+    """Ratings held in a flat float array, indexed by interned integer player IDs"""
+
+    def __init__(self):
+        self.keys: List[Hashable] = []
+        self.index: Dict[Hashable, int] = {}
+        self.ratings = array('d')
+
+    @classmethod
+    def from_dict(cls, ratings: Dict[Hashable, float]) -> 'RatingStore':
+        """Build a store from a {player_key: rating} dict"""
+        store = cls()
+        for key, rating in ratings.items():
+            store.intern(key, rating)
+        return store
+
+    def intern(self, key: Hashable, rating: Optional[float] = None) -> int:
+        """Return the integer ID for a player, adding them if new"""
+        idx = self.index.get(key)
+        if idx is None:
+            if rating is None:
+                raise KeyError(f"No starting rating for player {key!r}")
+            idx = len(self.keys)
+            self.keys.append(key)
+            self.index[key] = idx
+            self.ratings.append(float(rating))
+        return idx
+
+    def get(self, key: Hashable) -> float:
+        return self.ratings[self.index[key]]
+
+    def copy(self) -> 'RatingStore':
+        clone = RatingStore()
+        clone.keys = list(self.keys)
+        clone.index = dict(self.index)
+        clone.ratings = array('d', self.ratings)
+        return clone
+
+    def to_dict(self) -> Dict[Hashable, float]:
+        return dict(zip(self.keys, self.ratings))
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.index
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+class FixtureBatch:
+    """
+    A season of doubles fixtures packed into flat arrays
+
+    players holds four store indices per fixture (pair1 x2, pair2 x2) and
+    scores holds two game counts per fixture. Fixture IDs, result timestamps
+    and week numbers ride alongside in plain lists for writers and reports.
+    """
+
+    def __init__(self):
+        self.players = array('i')
+        self.scores = array('i')
+        self.fixture_ids: List = []
+        self.created_at: List = []
+        self.weeks: List = []
+        self.skipped: List[Tuple[object, str]] = []
+
+    def add(self, players: Sequence[int], pair1_score: int, pair2_score: int,
+            fixture_id=None, created_at=None, week=None):
+        """Append one fixture given four store indices"""
+        self.players.extend(players)
+        self.scores.append(pair1_score)
+        self.scores.append(pair2_score)
+        self.fixture_ids.append(fixture_id)
+        self.created_at.append(created_at)
+        self.weeks.append(week)
+
+    @classmethod
+    def from_matches(cls, store: RatingStore, matches: Iterable[dict],
+                     resolve: Callable[[str], Hashable] = lambda name: name) -> 'FixtureBatch':
+        """Build a batch from MATCH_RESULTS-style dicts (pair1/pair2 name lists)"""
+        batch = cls()
+        index = store.index
+        resolved: Dict[str, int] = {}
+        for i, match in enumerate(matches):
+            players = []
+            for name in match["pair1"] + match["pair2"]:
+                idx = resolved.get(name)
+                if idx is None:
+                    idx = resolved[name] = index[resolve(name)]
+                players.append(idx)
+            batch.add(players, match["pair1_score"], match["pair2_score"],
+                      fixture_id=match.get("fixture_id", i), created_at=match.get("created_at"),
+                      week=match.get("week"))
+        return batch
+
+    @classmethod
+    def from_rows(cls, store: RatingStore, rows: Iterable[Sequence]) -> 'FixtureBatch':
+        """
+        Build a batch from the ordered fixture/result query rows:
+        (fixture_id, p1p1, p1p2, p2p1, p2p2, pair1_score, pair2_score, created_at, week)
+
+        Fixtures with missing players or players outside the store are recorded
+        in skipped rather than raising.
+        """
+        batch = cls()
+        index = store.index
+        for fixture_id, p1p1, p1p2, p2p1, p2p2, pair1_score, pair2_score, created_at, week in rows:
+            player_ids = (p1p1, p1p2, p2p1, p2p2)
+            if not all(player_ids):
+                batch.skipped.append((fixture_id, "missing player IDs"))
+                continue
+            if not all(pid in index for pid in player_ids):
+                batch.skipped.append((fixture_id, "players not in season"))
+                continue
+            batch.add([index[pid] for pid in player_ids], pair1_score, pair2_score,
+                      fixture_id=fixture_id, created_at=created_at, week=week)
+        return batch
+
+    def slice(self, start: int, stop: Optional[int] = None) -> 'FixtureBatch':
+        """Return fixtures [start, stop) as a new batch sharing the same store indices"""
+        stop = len(self) if stop is None else stop
+        part = FixtureBatch()
+        part.players = self.players[4 * start:4 * stop]
+        part.scores = self.scores[2 * start:2 * stop]
+        part.fixture_ids = self.fixture_ids[start:stop]
+        part.created_at = self.created_at[start:stop]
+        part.weeks = self.weeks[start:stop]
+        return part
+
+    def __len__(self) -> int:
+        return len(self.scores) // 2
+
+class ReplayResult:
+    """
+    Per-fixture outputs of a replay, aligned with the batch
+
+    The hot loop only records pair1's expected score per fixture; pair
+    averages, actual scores and the per-player old/new ratings and deltas are
+    rebuilt from the starting ratings on first access, so callers that only
+    want final ratings never pay for them. pair_avgs, actual and pair_expected
+    hold two values per fixture (pair1, pair2); old_ratings, new_ratings and
+    deltas hold four, in batch.players order.
+    """
+
+    def __init__(self, batch: FixtureBatch, start_ratings: array, expected: array, k_factor: int):
+        self.batch = batch
+        self.start_ratings = start_ratings
+        self.expected = expected
+        self.k_factor = k_factor
+        self._details = None
+
+    def _materialise(self):
+        n = len(self.batch)
+        ratings = list(self.start_ratings)
+        k_factor = self.k_factor
+        pair_avgs = array('d', bytes(16 * n))
+        pair_expected = array('d', bytes(16 * n))
+        actual = array('d', bytes(16 * n))
+        old_ratings = array('d', bytes(32 * n))
+        new_ratings = array('d', bytes(32 * n))
+        deltas = array('d', bytes(32 * n))
+        players = self.batch.players
+        scores = self.batch.scores
+
+        for f, pair1_expected in enumerate(self.expected):
+            p = 4 * f
+            s = 2 * f
+            pair2_expected = 1.0 - pair1_expected
+            pair1_actual, pair2_actual = actual_scores(scores[s], scores[s + 1])
+            pair_avgs[s] = (ratings[players[p]] + ratings[players[p + 1]]) / 2
+            pair_avgs[s + 1] = (ratings[players[p + 2]] + ratings[players[p + 3]]) / 2
+            pair_expected[s] = pair1_expected
+            pair_expected[s + 1] = pair2_expected
+            actual[s] = pair1_actual
+            actual[s + 1] = pair2_actual
+            for slot in range(p, p + 4):
+                idx = players[slot]
+                old_rating = ratings[idx]
+                if slot < p + 2:
+                    new_rating = old_rating + k_factor * (pair1_actual - pair1_expected)
+                else:
+                    new_rating = old_rating + k_factor * (pair2_actual - pair2_expected)
+                ratings[idx] = new_rating
+                old_ratings[slot] = old_rating
+                new_ratings[slot] = new_rating
+                deltas[slot] = new_rating - old_rating
+
+        self._details = {
+            'pair_avgs': pair_avgs,
+            'pair_expected': pair_expected,
+            'actual': actual,
+            'old_ratings': old_ratings,
+            'new_ratings': new_ratings,
+            'deltas': deltas,
+        }
+
+    def _detail(self, name: str) -> array:
+        if self._details is None:
+            self._materialise()
+        return self._details[name]
+
+    def pair_changes(self) -> array:
+        """
+        Rating change applied to each pair (pair1, pair2 per fixture)
+
+        Computed exactly as in the replay loop, so adding these to the
+        starting ratings in fixture order reproduces the final ratings.
+        """
+        k_factor = self.k_factor
+        scores = self.batch.scores
+        changes = array('d', bytes(16 * len(self.expected)))
+        for f, pair1_expected in enumerate(self.expected):
+            pair1_score = scores[2 * f]
+            pair2_score = scores[2 * f + 1]
+            total_games = pair1_score + pair2_score
+            if total_games > 0:
+                changes[2 * f] = k_factor * (pair1_score / total_games - pair1_expected)
+                changes[2 * f + 1] = k_factor * (pair2_score / total_games - (1.0 - pair1_expected))
+            else:
+                changes[2 * f] = k_factor * (0.5 - pair1_expected)
+                changes[2 * f + 1] = k_factor * (0.5 - (1.0 - pair1_expected))
+        return changes
+
+    pair_avgs = property(lambda self: self._detail('pair_avgs'))
+    pair_expected = property(lambda self: self._detail('pair_expected'))
+    actual = property(lambda self: self._detail('actual'))
+    old_ratings = property(lambda self: self._detail('old_ratings'))
+    new_ratings = property(lambda self: self._detail('new_ratings'))
+    deltas = property(lambda self: self._detail('deltas'))
+
+def replay_season(store: RatingStore, batch: FixtureBatch, k_factor: int = DEFAULT_K_FACTOR) -> ReplayResult:
+    """
+    Replay a batch of fixtures in order, updating store.ratings in place
+
+    The arithmetic matches the original per-match loops operation for
+    operation (pair averages, expected score, one update per player in
+    pair order), so final ratings are bit-identical to run_elo_simulation.
+    On 12,000 fixtures the replay alone is about 3-4x the plain per-match
+    dict loop; counting FixtureBatch.from_matches it is only 1-2x, so the
+    gain comes from building a batch once and replaying it many times.
+    """
+    start_ratings = array('d', store.ratings)
+    ratings = list(start_ratings)
+    expected = array('d')
+    record = expected.append
+    pow_ = math.pow
+
+    players = iter(batch.players)
+    scores = iter(batch.scores)
+    for a, b, c, d, pair1_score, pair2_score in zip(players, players, players, players, scores, scores):
+        pair1_expected = 1.0 / (1.0 + pow_(10, ((ratings[c] + ratings[d]) / 2 - (ratings[a] + ratings[b]) / 2) / 400))
+        total_games = pair1_score + pair2_score
+        if total_games > 0:
+            pair1_change = k_factor * (pair1_score / total_games - pair1_expected)
+            pair2_change = k_factor * (pair2_score / total_games - (1.0 - pair1_expected))
+        else:
+            pair1_change = k_factor * (0.5 - pair1_expected)
+            pair2_change = k_factor * (0.5 - (1.0 - pair1_expected))
+        ratings[a] += pair1_change
+        ratings[b] += pair1_change
+        ratings[c] += pair2_change
+        ratings[d] += pair2_change
+        record(pair1_expected)
+
+    store.ratings[:] = array('d', ratings)
+    return ReplayResult(batch, start_ratings, expected, k_factor)
+
+def replay_with_model(model: str, store: RatingStore, batch: FixtureBatch, k_factor: int = DEFAULT_K_FACTOR):
+    """
+    Replay under one of RATING_MODELS; glicko2 (elo_glicko.py) needs numpy and has no K-factor
+
+    Returns a ReplayResult, or for glicko2 an elo_glicko.GlickoResult with
+    the same per-fixture arrays but no pair_changes.
+    """
+    if model == 'elo':
+        return replay_season(store, batch, k_factor)
+    if model == 'glicko2':
+        # Imported here so the ELO replay never needs numpy
+        from elo_glicko import replay_season_glicko2
+        return replay_season_glicko2(store, batch)
+    raise ValueError(f"Unknown rating model: {model}")
+
+def replay_seasons(store: RatingStore, batches: Iterable[FixtureBatch],
+                   k_factor: int = DEFAULT_K_FACTOR) -> List[ReplayResult]:
+    """Replay several batches back to back, carrying ratings between them"""
+    return [replay_season(store, batch, k_factor) for batch in batches]
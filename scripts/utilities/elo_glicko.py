@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Glicko-2 doubles rating model
+An alternative to the ELO replay with per-player uncertainty, updated in vectorised weekly rating periods and scored against ELO by log-loss (slower than the ELO replay; see replay_season_glicko2)
+"""
+
+import argparse
+import math
+import sys
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from elo_engine import DEFAULT_K_FACTOR, FixtureBatch, RatingStore, actual_scores, replay_season
+from elo_snapshot import to_micros
+from elo_tuner import LOG_LOSS_EPSILON, load_db_batches, load_sample_batches
+
+# Glicko-2's internal scale: with this factor 1 / (1 + exp(-(mu1 - mu2))) is
+# exactly the ELO expected score 1 / (1 + 10^((r2 - r1) / 400))
+GLICKO_SCALE = 400 / math.log(10)
+DEFAULT_RD = 200.0
+MAX_RD = 350.0
+DEFAULT_VOLATILITY = 0.06
+# System constant: how far volatility may move in one period
+DEFAULT_TAU = 0.5
+CONVERGENCE_TOLERANCE = 1e-6
+MAX_ITERATIONS = 100
+WEEK_US = 7 * 24 * 3600 * 1_000_000
+# The epoch was a Thursday; shifting by three days makes 7-day buckets run Monday to Sunday
+MONDAY_OFFSET_US = 3 * 24 * 3600 * 1_000_000
+
+# Pair 1 sits in slots 0-1, pair 2 in slots 2-3
+SLOT_SIGN = np.array([1.0, 1.0, -1.0, -1.0])
+# m @ HALF_SIGN is the gap between pair averages; p2 @ QUARTER the variance of a pair-average difference
+HALF_SIGN = SLOT_SIGN / 2.0
+QUARTER = np.full(4, 0.25)
+
+def rating_periods(batch: FixtureBatch) -> List[Tuple[int, int]]:
+    """
+    [(start, stop), ...] runs of consecutive fixtures that form one rating period
+
+    A period is a league week. Fixtures without a week number fall into
+    7-day buckets of created_at, and fixtures with neither stand alone.
+    """
+    n = len(batch)
+    weeks = np.fromiter((-1 if week is None else week for week in batch.weeks), dtype=np.int64, count=n)
+    days = np.fromiter((-1 if week is not None or created_at is None else (to_micros(created_at) + MONDAY_OFFSET_US) // WEEK_US
+                        for week, created_at in zip(batch.weeks, batch.created_at)), dtype=np.int64, count=n)
+    # Week numbers are >= 0, so 7-day buckets get negative codes of their own
+    code = np.where(weeks >= 0, weeks, -2 - days)
+    alone = (weeks < 0) & (days < 0)
+    breaks = np.flatnonzero((code[1:] != code[:-1]) | alone[1:] | alone[:-1]) + 1
+    bounds = [0, *breaks.tolist(), n] if n else []
+    return list(zip(bounds, bounds[1:]))
+
+def _array(values: np.ndarray) -> array:
+    return array('d', np.ascontiguousarray(values, dtype=np.float64).tobytes())
+
+def _g(variance: np.ndarray) -> np.ndarray:
+    return 1.0 / np.sqrt(1.0 + 3.0 * variance / math.pi ** 2)
+
+def _new_volatility(phi2: np.ndarray, sigma: np.ndarray, v: np.ndarray, delta: np.ndarray, tau: float) -> np.ndarray:
+    """
+    Glicko-2 step 5 (Illinois root-finding) for every player in a period at once
+
+    Each iteration updates the whole vector; players whose bracket has
+    closed are masked out of further updates, and the loop stops when
+    none are left or after MAX_ITERATIONS.
+    """
+    a = np.log(sigma * sigma)
+    delta2 = delta * delta
+    base = phi2 + v
+    tau2 = tau * tau
+
+    def f(x):
+        ex = np.exp(x)
+        total = base + ex
+        return ex * (delta2 - total) / (2.0 * total * total) - (x - a) / tau2
+
+    big = delta2 > base
+    B = np.where(big, np.log(np.where(big, delta2 - base, 1.0)), a - tau)
+    fB = f(B)
+    low = ~big & (fB < 0)
+    for _ in range(MAX_ITERATIONS):
+        if not low.any():
+            break
+        B = np.where(low, B - tau, B)
+        fB = f(B)
+        low &= fB < 0
+
+    A, fA = a, f(a)
+    active = np.abs(B - A) > CONVERGENCE_TOLERANCE
+    for _ in range(MAX_ITERATIONS):
+        if not active.any():
+            break
+        denominator = fB - fA
+        C = A + (A - B) * fA / np.where(denominator == 0, 1.0, denominator)
+        fC = f(C)
+        crossed = active & (fC * fB <= 0)
+        A = np.where(crossed, B, A)
+        fA = np.where(crossed, fB, np.where(active, fA / 2.0, fA))
+        B = np.where(active, C, B)
+        fB = np.where(active, fC, fB)
+        active &= np.abs(B - A) > CONVERGENCE_TOLERANCE
+    return np.exp(A / 2.0)
+
+class GlickoResult:
+    """
+    Per-fixture outputs of a Glicko-2 replay, aligned with the batch
+
+    Carries the same per-fixture arrays as elo_engine.ReplayResult
+    (expected, pair_avgs, pair_expected, actual, old_ratings, new_ratings,
+    deltas), so previews and verbose output read either. There is no
+    K-factor and partners move by different amounts, so it has no
+    pair_changes and isn't written to elo_history. Ratings move once per
+    rating period, but a player's period change is a sum of per-fixture
+    terms, so old_ratings/new_ratings/deltas attribute it fixture by
+    fixture and still add up to the period's result. expected holds
+    pair1's pre-period prediction per fixture. rd and volatility are the
+    final deviations, indexed like store.ratings.
+    """
+
+    def __init__(self, batch: FixtureBatch, start_ratings: array, expected: array, details: Dict[str, array],
+                 rd: np.ndarray, volatility: np.ndarray, start_rd: np.ndarray):
+        self.batch = batch
+        self.start_ratings = start_ratings
+        self.expected = expected
+        self.pair_avgs = details['pair_avgs']
+        self.pair_expected = details['pair_expected']
+        self.actual = details['actual']
+        self.old_ratings = details['old_ratings']
+        self.new_ratings = details['new_ratings']
+        self.deltas = details['deltas']
+        self.rd = rd
+        self.volatility = volatility
+        self.start_rd = start_rd
+
+def replay_season_glicko2(store: RatingStore, batch: FixtureBatch, rd: Optional[Sequence[float]] = None,
+                          volatility: float = DEFAULT_VOLATILITY, tau: float = DEFAULT_TAU,
+                          initial_rd: float = DEFAULT_RD) -> GlickoResult:
+    """
+    Replay a batch as Glicko-2 rating periods, updating store.ratings in place
+
+    A pair plays as the average of its players' ratings, as in the ELO
+    replay. Each player is updated against the rating gap their pair
+    faced, with the gradient halved for their half share of the pair and
+    the other three players' deviations folded into g(). Players idle
+    for a period only gain deviation, up to MAX_RD.
+
+    Every update inside a period is vectorised, but periods run one after
+    another and each costs a few dozen numpy calls, so at club size this
+    is roughly 10-20x slower than replay_season (about 3-5 ms against
+    0.2-0.3 ms for 300 fixtures). It is meant for comparisons and previews,
+    not the elo_history write path.
+    """
+    n_players = len(store)
+    start_ratings = array('d', store.ratings)
+    mu = (np.frombuffer(start_ratings, dtype=np.float64) - 1500.0) / GLICKO_SCALE
+    phi = (np.full(n_players, initial_rd) if rd is None else np.array(rd, dtype=np.float64)) / GLICKO_SCALE
+    start_rd = phi * GLICKO_SCALE
+    phi2 = phi * phi
+    sigma = np.full(n_players, volatility)
+    max_phi2 = (MAX_RD / GLICKO_SCALE) ** 2
+
+    n = len(batch)
+    players = np.frombuffer(batch.players, dtype=np.int32).reshape(n, 4) if n else np.zeros((0, 4), np.int32)
+    flat = players.ravel()
+    scores = np.frombuffer(batch.scores, dtype=np.int32).reshape(n, 2) if n else np.zeros((0, 2), np.int32)
+    totals = scores.sum(axis=1)
+    pair1_actual = np.where(totals > 0, scores[:, 0] / np.maximum(totals, 1), 0.5)
+    slot_actual = np.stack([pair1_actual, pair1_actual, 1.0 - pair1_actual, 1.0 - pair1_actual], axis=1)
+
+    # The loop only does what each period's update needs; predictions and
+    # the per-fixture breakdown are rebuilt from these afterwards in one go
+    start_mu = np.empty((n, 4))
+    start_phi2 = np.empty((n, 4))
+    steps = np.empty((n, 4))
+
+    periods = rating_periods(batch)
+    for start, stop in periods:
+        pl = players[start:stop]
+        slots = flat[4 * start:4 * stop]
+        m = start_mu[start:stop] = mu[pl]
+        p2 = start_phi2[start:stop] = phi2[pl]
+
+        # Each slot's own deviation is what gets updated; the rest is opponent noise
+        g = _g((p2 @ QUARTER)[:, None] - p2 / 4.0) / 2.0
+        e = 1.0 / (1.0 + np.exp(-g * np.outer(m @ HALF_SIGN, 2.0 * SLOT_SIGN)))
+        info = np.bincount(slots, weights=(g * g * e * (1.0 - e)).ravel(), minlength=n_players)
+        score = g * (slot_actual[start:stop] - e)
+        gradient = np.bincount(slots, weights=score.ravel(), minlength=n_players)
+
+        played = np.flatnonzero(info)
+        v = 1.0 / info[played]
+        new_sigma = _new_volatility(phi2[played], sigma[played], v, v * gradient[played], tau)
+        phi_star2 = phi2 + sigma * sigma
+        phi_star2[played] = phi2[played] + new_sigma * new_sigma
+        sigma[played] = new_sigma
+        phi2 = np.minimum(phi_star2, max_phi2)
+        phi2[played] = 1.0 / (1.0 / phi_star2[played] + info[played])
+
+        # mu' = mu + phi'^2 * sum(score), one term per fixture slot
+        step = steps[start:stop] = phi2[pl] * score
+        mu = mu + np.bincount(slots, weights=step.ravel(), minlength=n_players)
+
+    # Each fixture's old rating is the period's starting mu plus the
+    # player's earlier terms in the period: an exclusive running sum
+    # within each (period, player) run of slots
+    period_of = np.repeat(np.arange(len(periods)), [stop - start for start, stop in periods])
+    key = np.repeat(period_of, 4) * n_players + flat
+    order = np.argsort(key, kind='stable')
+    ordered = steps.ravel()[order]
+    running = np.cumsum(ordered) - ordered
+    first = np.r_[True, key[order][1:] != key[order][:-1]] if n else np.zeros(0, bool)
+    running -= running[first][np.cumsum(first) - 1]
+    before = np.empty_like(running)
+    before[order] = running
+
+    gap = start_mu @ HALF_SIGN
+    expected = 1.0 / (1.0 + np.exp(-_g(start_phi2 @ QUARTER) * gap))
+    pair_avgs = np.stack([start_mu[:, 0] + start_mu[:, 1], start_mu[:, 2] + start_mu[:, 3]], axis=1) / 2.0
+
+    store.ratings[:] = _array(1500.0 + GLICKO_SCALE * mu)
+    old = 1500.0 + GLICKO_SCALE * (start_mu + before.reshape(-1, 4))
+    deltas = GLICKO_SCALE * steps
+    details = {
+        'pair_avgs': _array(1500.0 + GLICKO_SCALE * pair_avgs),
+        'pair_expected': _array(np.stack([expected, 1.0 - expected], axis=1)),
+        'actual': _array(np.stack([pair1_actual, 1.0 - pair1_actual], axis=1)),
+        'old_ratings': _array(old),
+        'new_ratings': _array(old + deltas),
+        'deltas': _array(deltas),
+    }
+    return GlickoResult(batch, start_ratings, _array(expected), details,
+                        np.sqrt(phi2) * GLICKO_SCALE, sigma, start_rd)
+
+def prediction_scores(batch: FixtureBatch, expected: Sequence[float]) -> Dict[str, float]:
+    """Log-loss and Brier score of pair1 predictions against the share of games pair1 won"""
+    if not len(batch):
+        return {'log_loss': float('nan'), 'brier': float('nan'), 'predictions': 0}
+    scores = batch.scores
+    target = np.array([actual_scores(scores[2 * f], scores[2 * f + 1])[0] for f in range(len(batch))])
+    p = np.clip(np.asarray(expected, dtype=np.float64), LOG_LOSS_EPSILON, 1.0 - LOG_LOSS_EPSILON)
+    return {
+        'log_loss': float(-(target * np.log(p) + (1.0 - target) * np.log(1.0 - p)).mean()),
+        'brier': float(((np.asarray(expected) - target) ** 2).mean()),
+        'predictions': len(batch),
+    }
+
+def compare_models(name: str, store: RatingStore, batch: FixtureBatch, k_factor: int = DEFAULT_K_FACTOR,
+                   **glicko_options) -> List[Dict]:
+    """Replay one season under both models from the same starting ratings and score their predictions"""
+    rows = []
+    for model in ('elo', 'glicko2'):
+        start = time.perf_counter()
+        if model == 'elo':
+            result = replay_season(store.copy(), batch, k_factor)
+        else:
+            result = replay_season_glicko2(store.copy(), batch, **glicko_options)
+        elapsed = time.perf_counter() - start
+        rows.append({'season': name, 'model': model, 'seconds': elapsed,
+                     **prediction_scores(batch, result.expected)})
+    return rows
+
+def print_comparison(rows: Sequence[Dict]):
+    print(f"{'Season':<24} {'Model':<8} {'Fixtures':>8} {'Log-loss':>9} {'Brier':>8} {'Replay':>9}")
+    print("-" * 71)
+    for row in rows:
+        print(f"{row['season'][:24]:<24} {row['model']:<8} {row['predictions']:>8} "
+              f"{row['log_loss']:>9.5f} {row['brier']:>8.5f} {row['seconds'] * 1000:>7.2f}ms")
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare Glicko-2 and ELO predictive log-loss on the same fixtures")
+    parser.add_argument('--source', choices=('db', 'sample'), default='db',
+                        help="Replay every ELO-enabled season from the database, or the MATCH_RESULTS sample")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--season', action='append', dest='seasons', metavar='SEASON_ID',
+                        help="Only these seasons (repeatable)")
+    parser.add_argument('--initial-rd', type=float, default=DEFAULT_RD,
+                        help=f"Starting rating deviation (default {DEFAULT_RD:g})")
+    parser.add_argument('--volatility', type=float, default=DEFAULT_VOLATILITY,
+                        help=f"Starting volatility (default {DEFAULT_VOLATILITY:g})")
+    parser.add_argument('--tau', type=float, default=DEFAULT_TAU, help=f"System constant (default {DEFAULT_TAU:g})")
+    args = parser.parse_args(argv)
+
+    seasons = load_sample_batches() if args.source == 'sample' else load_db_batches(args.dsn, args.seasons)
+    if not seasons:
+        print("❌ No seasons to compare")
+        return 1
+
+    options = {'initial_rd': args.initial_rd, 'volatility': args.volatility, 'tau': args.tau}
+    rows = []
+    for name, store, batch, k_factor in seasons:
+        rows.extend(compare_models(name, store, batch, k_factor, **options))
+    print_comparison(rows)
+
+    if len(seasons) > 1:
+        for model in ('elo', 'glicko2'):
+            model_rows = [row for row in rows if row['model'] == model and row['predictions']]
+            n = sum(row['predictions'] for row in model_rows)
+            if n:
+                loss = sum(row['log_loss'] * row['predictions'] for row in model_rows) / n
+                print(f"📊 {model}: log-loss {loss:.5f} over {n} fixtures")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Bulk writers for elo_history and season_players
+Stages replayed history rows in memory and flushes them with COPY FROM STDIN
+"""
+
+import io
+import time
+from typing import Dict, Iterable, Iterator, Sequence, Tuple
+
+from elo_engine import FixtureBatch, ReplayResult
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Below this many rows a prepared INSERT beats the fixed cost of a COPY
+PREPARED_INSERT_MAX_ROWS = 200
+
+ELO_HISTORY_COLUMNS = (
+    'season_player_id',
+    'match_fixture_id',
+    'old_rating',
+    'new_rating',
+    'rating_change',
+    'k_factor',
+    'opponent_avg_rating',
+    'expected_score',
+    'actual_score',
+    'created_at',
+)
+
+def history_rows(batch: FixtureBatch, result: ReplayResult,
+                 season_player_ids: Sequence[str]) -> Iterator[Tuple]:
+    """
+    Yield one elo_history row per player per fixture
+
+    season_player_ids is indexed by the store's integer player IDs. Ratings
+    are truncated with int() exactly as the per-row INSERTs always did.
+    """
+    old_ratings = result.old_ratings
+    new_ratings = result.new_ratings
+    deltas = result.deltas
+    pair_avgs = result.pair_avgs
+    pair_expected = result.pair_expected
+    actual = result.actual
+    players = batch.players
+    k_factor = result.k_factor
+
+    for f, (fixture_id, created_at) in enumerate(zip(batch.fixture_ids, batch.created_at)):
+        for slot in range(4 * f, 4 * f + 4):
+            # Pair 1 sits in slots 0-1, pair 2 in slots 2-3
+            side = 2 * f + (slot - 4 * f) // 2
+            opponent = side ^ 1
+            yield (
+                season_player_ids[players[slot]],
+                fixture_id,
+                int(old_ratings[slot]),
+                int(new_ratings[slot]),
+                int(deltas[slot]),
+                k_factor,
+                int(pair_avgs[opponent]),
+                pair_expected[side],
+                actual[side],
+                created_at,
+            )
+
+def _copy_value(value) -> str:
+    """Format a value for COPY's text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, float):
+        return repr(value)
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+def copy_line(row: Sequence) -> str:
+    """One row in COPY's text format, newline included"""
+    return '\t'.join(_copy_value(value) for value in row) + '\n'
+
+def copy_history_rows(cur, rows: Iterable[Tuple], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    COPY rows into elo_history, batch_size rows per COPY statement
+
+    Returns the number of rows written. Each batch is one round trip.
+    """
+    sql = f"COPY elo_history ({', '.join(ELO_HISTORY_COLUMNS)}) FROM STDIN"
+    written = 0
+    buffer = io.StringIO()
+    pending = 0
+
+    for row in rows:
+        buffer.write(copy_line(row))
+        pending += 1
+        if pending >= batch_size:
+            buffer.seek(0)
+            cur.copy_expert(sql, buffer)
+            written += pending
+            buffer = io.StringIO()
+            pending = 0
+
+    if pending:
+        buffer.seek(0)
+        cur.copy_expert(sql, buffer)
+        written += pending
+
+    return written
+
+def update_final_ratings(cur, final_ratings: Dict[str, float], page_size: int = DEFAULT_BATCH_SIZE):
+    """Write final ratings to season_players as one set-based UPDATE"""
+    # Imported here so the row formatters above work without psycopg2
+    from psycopg2.extras import execute_values
+
+    execute_values(cur, """
+        UPDATE season_players AS sp
+        SET elo_rating = v.elo_rating
+        FROM (VALUES %s) AS v(id, elo_rating)
+        WHERE sp.id = v.id::uuid
+    """, [(season_player_id, int(rating)) for season_player_id, rating in final_ratings.items()],
+        page_size=page_size)
+
+def write_replay(cur, batch: FixtureBatch, result: ReplayResult, season_player_ids: Sequence[str],
+                 final_ratings: Dict[str, float], batch_size: int = DEFAULT_BATCH_SIZE) -> Tuple[int, float]:
+    """
+    Flush a replayed season: write its history rows, then update final ratings
+
+    Full replays go through COPY; the few rows of a typical incremental run
+    use the prepared INSERT. Returns (rows written, elapsed seconds) so
+    callers can report rows/sec.
+    """
+    start = time.perf_counter()
+    rows = history_rows(batch, result, season_player_ids)
+    if 4 * len(batch) <= PREPARED_INSERT_MAX_ROWS:
+        from elo_db import insert_history_rows
+        written = insert_history_rows(cur, rows)
+    else:
+        written = copy_history_rows(cur, rows, batch_size)
+    update_final_ratings(cur, final_ratings, page_size=batch_size)
+    return written, time.perf_counter() - start
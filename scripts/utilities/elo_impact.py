@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+What-if ELO impact table for a week's proposed fixtures
+Computes every player's rating change for every possible scoreline of every rubber in one numpy pass
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from elo_engine import DEFAULT_K_FACTOR, FixtureBatch, RatingStore
+from elo_verify import MAX_RATING, MIN_RATING, js_round
+
+# A rubber is 8 games, so scorelines run 0-8 ... 8-0
+GAMES_PER_RUBBER = 8
+OUTPUT_FORMATS = ('json', 'csv')
+
+SEASON_K_FACTOR_SQL = "SELECT COALESCE(elo_k_factor, 32) FROM seasons WHERE id = %s"
+
+# Current ratings: after a backdate season_players.elo_rating holds the latest rating
+CURRENT_RATINGS_SQL = """
+    SELECT sp.player_id, p.name, sp.elo_rating
+    FROM season_players sp
+    JOIN profiles p ON sp.player_id = p.id
+    WHERE sp.season_id = %s
+"""
+
+# Earliest week that still has fixtures without a result
+NEXT_WEEK_SQL = """
+    SELECT MIN(m.week_number)
+    FROM match_fixtures mf
+    JOIN matches m ON mf.match_id = m.id
+    LEFT JOIN match_results mr ON mr.fixture_id = mf.id
+    WHERE m.season_id = %s AND mr.fixture_id IS NULL
+"""
+
+# Columns 0-5 follow FixtureBatch.from_rows; court and game ride along for display
+WEEK_FIXTURES_SQL = """
+    SELECT mf.id, mf.pair1_player1_id, mf.pair1_player2_id, mf.pair2_player1_id, mf.pair2_player2_id,
+           mf.court_number, mf.game_number
+    FROM match_fixtures mf
+    JOIN matches m ON mf.match_id = m.id
+    WHERE m.season_id = %s AND m.week_number = %s
+      AND NOT EXISTS (SELECT 1 FROM match_results mr WHERE mr.fixture_id = mf.id)
+    ORDER BY mf.court_number, mf.game_number, mf.id
+"""
+
+def scorelines(games: int = GAMES_PER_RUBBER) -> np.ndarray:
+    """Every (pair1, pair2) games score from 0-games to games-0, shape (games + 1, 2)"""
+    pair1 = np.arange(games + 1)
+    return np.stack([pair1, games - pair1], axis=1)
+
+def compute_impacts(store: RatingStore, batch: FixtureBatch, k_factor: int = DEFAULT_K_FACTOR,
+                    games: int = GAMES_PER_RUBBER) -> Dict[str, np.ndarray]:
+    """
+    Rating changes for every fixture under every scoreline, without loops
+
+    Each fixture is scored from the ratings in store, as if it were the next
+    one played: rubbers later in the same night would really start from the
+    ratings earlier rubbers leave behind, so the table previews each rubber
+    on its own. The update is the app's (eloCalculator.js, as replayed by
+    elo_verify's rounded rule), broadcast over a (fixtures, scorelines,
+    players) grid: each pair's change is Math.round()ed on its own and new
+    ratings are clamped to MIN_RATING-MAX_RATING.
+
+    Returns expected (F,) pair-1 expected score, old (F, 4) ratings, and
+    change and new of shape (F, S, 4) in slot order p1p1, p1p2, p2p1, p2p2.
+    """
+    ratings = np.frombuffer(store.ratings, dtype=np.float64)
+    players = np.frombuffer(batch.players, dtype=np.int32).reshape(-1, 4)
+    old = ratings[players]
+
+    pair_avgs = (old[:, 0::2] + old[:, 1::2]) / 2
+    pair1_expected = 1.0 / (1.0 + np.power(10.0, (pair_avgs[:, 1] - pair_avgs[:, 0]) / 400))
+    # The app scores each side separately rather than as 1 - pair1_expected
+    pair2_expected = 1.0 / (1.0 + np.power(10.0, (pair_avgs[:, 0] - pair_avgs[:, 1]) / 400))
+
+    scores = scorelines(games)
+    # (S,) shares of games; every scoreline sums to games, so no 0-0 case
+    pair1_actual = scores[:, 0] / games
+    pair2_actual = scores[:, 1] / games
+    pair1_change = k_factor * (pair1_actual[np.newaxis, :] - pair1_expected[:, np.newaxis])
+    pair2_change = k_factor * (pair2_actual[np.newaxis, :] - pair2_expected[:, np.newaxis])
+
+    changes = np.vectorize(js_round, otypes=[np.int64])(np.stack([pair1_change, pair2_change], axis=2))
+    delta = np.repeat(changes, 2, axis=2)
+    old = np.trunc(old).astype(np.int64)
+    return {
+        'expected': pair1_expected,
+        'old': old,
+        'change': delta,
+        'new': np.clip(old[:, np.newaxis, :] + delta, MIN_RATING, MAX_RATING),
+    }
+
+def impact_document(season_id: str, week: Optional[int], k_factor: int, store: RatingStore,
+                    batch: FixtureBatch, impacts: Dict[str, np.ndarray], names: Dict[str, str],
+                    extras: Sequence[Sequence], games: int = GAMES_PER_RUBBER) -> Dict:
+    """
+    The table as JSON for the app: one entry per fixture, one change list per player
+
+    changes[player_id][i] is that player's rating change if the rubber
+    finishes scorelines[i], matching elo_history.rating_change.
+    """
+    keys = store.keys
+    fixtures = []
+    for f, fixture_id in enumerate(batch.fixture_ids):
+        player_ids = [keys[batch.players[4 * f + slot]] for slot in range(4)]
+        court, game = extras[f]
+        fixtures.append({
+            'fixture_id': fixture_id,
+            'court_number': court,
+            'game_number': game,
+            'pair1': player_ids[:2],
+            'pair2': player_ids[2:],
+            'expected_score': round(float(impacts['expected'][f]), 4),
+            'ratings': {pid: int(impacts['old'][f, slot]) for slot, pid in enumerate(player_ids)},
+            'changes': {pid: impacts['change'][f, :, slot].tolist() for slot, pid in enumerate(player_ids)},
+        })
+    return {
+        'season_id': season_id,
+        'week': week,
+        'k_factor': k_factor,
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'scorelines': scorelines(games).tolist(),
+        'players': {pid: names.get(pid) for pid in keys},
+        'fixtures': fixtures,
+    }
+
+def write_csv(out, store: RatingStore, batch: FixtureBatch, impacts: Dict[str, np.ndarray],
+              names: Dict[str, str], games: int = GAMES_PER_RUBBER) -> int:
+    """The table in long form, one row per fixture, scoreline and player; returns rows written"""
+    writer = csv.writer(out)
+    writer.writerow(['fixture_id', 'pair1_score', 'pair2_score', 'player_id', 'player_name',
+                     'old_rating', 'new_rating', 'rating_change'])
+    keys = store.keys
+    scores = scorelines(games)
+    rows = 0
+    for f, fixture_id in enumerate(batch.fixture_ids):
+        for s, (pair1_score, pair2_score) in enumerate(scores.tolist()):
+            for slot in range(4):
+                pid = keys[batch.players[4 * f + slot]]
+                writer.writerow([fixture_id, pair1_score, pair2_score, pid, names.get(pid, ''),
+                                 impacts['old'][f, slot], impacts['new'][f, s, slot], impacts['change'][f, s, slot]])
+                rows += 1
+    return rows
+
+def load_week(cur, season_id: str, week: Optional[int] = None):
+    """
+    Current ratings and the unplayed fixtures of one week (default: the next week to play)
+
+    Returns (week, k_factor, store, batch, names, extras) where extras holds
+    (court_number, game_number) per fixture in batch order.
+    """
+    cur.execute(SEASON_K_FACTOR_SQL, (season_id,))
+    row = cur.fetchone()
+    k_factor = row[0] if row else DEFAULT_K_FACTOR
+
+    if week is None:
+        cur.execute(NEXT_WEEK_SQL, (season_id,))
+        week = cur.fetchone()[0]
+
+    store = RatingStore()
+    names = {}
+    cur.execute(CURRENT_RATINGS_SQL, (season_id,))
+    for player_id, name, rating in cur.fetchall():
+        if rating is not None:
+            store.intern(str(player_id), rating)
+            names[str(player_id)] = name
+
+    cur.execute(WEEK_FIXTURES_SQL, (season_id, week))
+    rows = cur.fetchall()
+    extras = {str(row[0]): (row[5], row[6]) for row in rows}
+    batch = FixtureBatch.from_rows(store, (
+        (str(row[0]), *(str(pid) if pid else None for pid in row[1:5]), 0, 0, None, week) for row in rows))
+    return week, k_factor, store, batch, names, [extras[fixture_id] for fixture_id in batch.fixture_ids]
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute the ELO impact of every scoreline for a week's fixtures")
+    parser.add_argument('--season-id', required=True)
+    parser.add_argument('--week', type=int, help="Week number (default: the next week with unplayed fixtures)")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='json')
+    parser.add_argument('-o', '--output', help="Output file (default stdout)")
+    args = parser.parse_args(argv)
+
+    from elo_db import connection
+    with connection(args.dsn) as conn, conn.cursor() as cur:
+        week, k_factor, store, batch, names, extras = load_week(cur, args.season_id, args.week)
+
+    for fixture_id, reason in batch.skipped:
+        print(f"⚠️  Skipping fixture {fixture_id} - {reason}", file=sys.stderr)
+    if week is None or not len(batch):
+        print("No unplayed fixtures to preview", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    impacts = compute_impacts(store, batch, k_factor)
+    elapsed = time.perf_counter() - start
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump(impact_document(args.season_id, week, k_factor, store, batch, impacts, names, extras), out)
+            out.write('\n')
+        else:
+            write_csv(out, store, batch, impacts, names)
+    finally:
+        if args.output:
+            out.close()
+
+    print(f"📊 Week {week}: {len(batch)} fixtures x {GAMES_PER_RUBBER + 1} scorelines in {elapsed * 1000:.1f} ms",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
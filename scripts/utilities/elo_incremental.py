@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Incremental ELO backdating
+Resumes a season from its stored checkpoint instead of deleting and replaying everything
+"""
+
+import json
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from elo_db import fetch_ordered_results, fetch_season_players
+from elo_engine import DEFAULT_K_FACTOR, FixtureBatch, RatingStore, replay_season
+from elo_history_writer import DEFAULT_BATCH_SIZE, write_replay
+from elo_metrics import Metrics
+
+CHECKPOINT_VERSION = 1
+
+class Checkpoint:
+    """
+    Replay state for one season, stored as JSON in elo_replay_checkpoints
+
+    applied holds one entry per replayed fixture, in replay order:
+    [created_at, fixture_id, p1p1, p1p2, p2p1, p2p2, pair1_score, pair2_score,
+    pair1_change, pair2_change]. The first eight fields identify the result
+    as it was when applied; the pair changes let the rating vector at any
+    earlier fixture be rebuilt without recomputing expected scores.
+    """
+
+    def __init__(self, season_id: str, k_factor: int, start_ratings: Dict[str, float],
+                 ratings: Dict[str, float], applied: List[list]):
+        self.season_id = season_id
+        self.k_factor = k_factor
+        self.start_ratings = start_ratings
+        self.ratings = ratings
+        self.applied = applied
+
+    @property
+    def last_applied(self) -> Optional[Tuple[str, str]]:
+        """(created_at, fixture_id) of the last fixture replayed"""
+        if not self.applied:
+            return None
+        return self.applied[-1][0], self.applied[-1][1]
+
+    def ratings_before(self, position: int) -> Dict[str, float]:
+        """Rating vector just before applied[position], rebuilt from the start ratings"""
+        if position == len(self.applied):
+            return dict(self.ratings)
+        ratings = dict(self.start_ratings)
+        for entry in self.applied[:position]:
+            p1p1, p1p2, p2p1, p2p2 = entry[2:6]
+            pair1_change, pair2_change = entry[8], entry[9]
+            ratings[p1p1] += pair1_change
+            ratings[p1p2] += pair1_change
+            ratings[p2p1] += pair2_change
+            ratings[p2p2] += pair2_change
+        return ratings
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'version': CHECKPOINT_VERSION,
+            'k_factor': self.k_factor,
+            'start_ratings': self.start_ratings,
+            'ratings': self.ratings,
+            'applied': self.applied,
+        })
+
+    @classmethod
+    def from_json(cls, season_id: str, state) -> Optional['Checkpoint']:
+        if isinstance(state, str):
+            state = json.loads(state)
+        if not state or state.get('version') != CHECKPOINT_VERSION:
+            return None
+        return cls(season_id, state['k_factor'], state['start_ratings'], state['ratings'], state['applied'])
+
+def fixture_key(batch: FixtureBatch, f: int, keys: Sequence[str]) -> list:
+    """Identity of fixture f as stored in a checkpoint entry"""
+    players = batch.players
+    created_at = batch.created_at[f]
+    return [
+        created_at.isoformat() if hasattr(created_at, 'isoformat') else str(created_at),
+        str(batch.fixture_ids[f]),
+        *(keys[players[4 * f + j]] for j in range(4)),
+        batch.scores[2 * f],
+        batch.scores[2 * f + 1],
+    ]
+
+def first_divergence(checkpoint: Optional[Checkpoint], current: List[list]) -> int:
+    """Index of the first fixture whose result differs from what was applied"""
+    if checkpoint is None:
+        return 0
+    for position, (entry, key) in enumerate(zip(checkpoint.applied, current)):
+        if entry[:8] != key:
+            return position
+    return min(len(checkpoint.applied), len(current))
+
+def load_checkpoint(cur, season_id: str, k_factor: int = DEFAULT_K_FACTOR) -> Optional[Checkpoint]:
+    """Load a season's checkpoint; one taken under a different K-factor is ignored"""
+    cur.execute("SELECT state FROM elo_replay_checkpoints WHERE season_id = %s", (season_id,))
+    row = cur.fetchone()
+    checkpoint = Checkpoint.from_json(season_id, row[0]) if row else None
+    if checkpoint is not None and checkpoint.k_factor != k_factor:
+        return None
+    return checkpoint
+
+def save_checkpoint(cur, checkpoint: Checkpoint):
+    last_created_at, last_fixture_id = checkpoint.last_applied or (None, None)
+    cur.execute("""
+        INSERT INTO elo_replay_checkpoints (season_id, last_created_at, last_fixture_id, state, updated_at)
+        VALUES (%s, %s, %s, %s::jsonb, NOW())
+        ON CONFLICT (season_id) DO UPDATE
+        SET last_created_at = EXCLUDED.last_created_at,
+            last_fixture_id = EXCLUDED.last_fixture_id,
+            state = EXCLUDED.state,
+            updated_at = NOW()
+    """, (checkpoint.season_id, last_created_at, last_fixture_id, checkpoint.to_json()))
+
+def incremental_backdate(cur, season_id: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                         k_factor: int = DEFAULT_K_FACTOR, metrics: Optional[Metrics] = None) -> Dict[str, float]:
+    """
+    Bring a season's elo_history up to date from its checkpoint
+
+    New results after the checkpoint are appended, replacing any rows the
+    app already wrote for them. If a result was edited, removed or
+    submitted out of order, history is replayed from the earliest affected
+    fixture only. Seasons without a checkpoint are replayed in full
+    once. The caller owns the transaction: history, final ratings and the new
+    checkpoint are written on cur and become visible together on commit.
+
+    Returns counts of fixtures kept, replayed, removed and skipped, plus the history
+    rows written and how long the write took. Phase timings and match counts
+    also go to metrics; skipped fixtures are counted there, not printed.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    with metrics.phase('fetch'):
+        season_players = fetch_season_players(cur, season_id)
+        checkpoint = load_checkpoint(cur, season_id, k_factor)
+        results = fetch_ordered_results(cur, season_id)
+
+    store = RatingStore()
+    season_player_ids = []
+    for season_player_id, player_id, name, starting_elo in season_players:
+        if checkpoint is not None and player_id in checkpoint.start_ratings:
+            starting_elo = checkpoint.start_ratings[player_id]
+        store.intern(player_id, starting_elo)
+        season_player_ids.append(season_player_id)
+    # Keep players who have since left the season: earlier entries still name them
+    start_ratings = dict(checkpoint.start_ratings) if checkpoint is not None else {}
+    start_ratings.update(store.to_dict())
+
+    compute_start = time.perf_counter()
+    batch = FixtureBatch.from_rows(store, results)
+    for fixture_id, reason in batch.skipped:
+        metrics.skip(fixture_id, reason)
+
+    current = [fixture_key(batch, f, store.keys) for f in range(len(batch))]
+    position = first_divergence(checkpoint, current)
+    stale = checkpoint.applied[position:] if checkpoint is not None else []
+
+    # Resume from the rating vector just before the first affected fixture
+    if checkpoint is not None:
+        resumed = checkpoint.ratings_before(position)
+        store.ratings = array('d', (resumed.get(key, start_ratings[key]) for key in store.keys))
+
+    tail = batch.slice(position)
+    result = replay_season(store, tail, k_factor)
+    changes = result.pair_changes()
+
+    applied = checkpoint.applied[:position] if checkpoint is not None else []
+    for f in range(len(tail)):
+        applied.append(current[position + f] + [changes[2 * f], changes[2 * f + 1]])
+    metrics.add('compute', time.perf_counter() - compute_start)
+
+    written, elapsed = 0, 0.0
+    with metrics.phase('write'):
+        if checkpoint is None:
+            # No checkpoint: anything already in elo_history is from a full run
+            cur.execute("""
+                DELETE FROM elo_history
+                WHERE season_player_id IN (SELECT id FROM season_players WHERE season_id = %s)
+            """, (season_id,))
+        elif stale or len(tail):
+            # The app writes elo_history for each result as it is entered, so
+            # tail fixtures usually have rows already: replace, don't append
+            fixture_ids = dict.fromkeys([entry[1] for entry in stale] + [str(f) for f in tail.fixture_ids])
+            cur.execute("""
+                DELETE FROM elo_history
+                WHERE season_player_id IN (SELECT id FROM season_players WHERE season_id = %s)
+                  AND match_fixture_id = ANY(%s::uuid[])
+            """, (season_id, list(fixture_ids)))
+        if len(tail) or stale:
+            final_ratings = dict(zip(season_player_ids, store.ratings))
+            written, elapsed = write_replay(cur, tail, result, season_player_ids, final_ratings, batch_size)
+        save_checkpoint(cur, Checkpoint(season_id, k_factor, start_ratings, store.to_dict(), applied))
+    metrics.count('matches_processed', len(tail))
+    metrics.count('matches_kept', position)
+    metrics.count('matches_removed', len(stale))
+    metrics.count('rows_written', written)
+
+    return {
+        'kept': position,
+        'replayed': len(tail),
+        'removed': len(stale),
+        'skipped': len(batch.skipped),
+        'rows_written': written,
+        'write_seconds': elapsed,
+    }
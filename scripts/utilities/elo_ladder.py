@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Historical ladder and rank-at-time queries
+Keeps a season's ladder ordered incrementally as fixtures are applied, so "rank of X after fixture N" and "ladder at date D" need no re-sort
+"""
+
+import argparse
+import sys
+from array import array
+from datetime import datetime, timezone
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+from elo_engine import DEFAULT_K_FACTOR, ReplayResult, replay_season
+from elo_model import SeasonModel
+
+class RankTree:
+    """
+    Fenwick tree of 0/1 counts over a fixed, sorted universe of positions
+
+    prefix(pos) is the number of occupied positions <= pos, i.e. a rank;
+    kth(k) finds the k-th occupied position. Both are O(log n).
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = array('i', bytes(4 * (size + 1)))
+        self.top = 1 << max(size.bit_length() - 1, 0)
+
+    def add(self, pos: int, delta: int):
+        tree, i = self.tree, pos + 1
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, pos: int) -> int:
+        tree, i, total = self.tree, pos + 1, 0
+        while i:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def kth(self, k: int) -> int:
+        tree, pos, step = self.tree, 0, self.top
+        while step:
+            if pos + step <= self.size and tree[pos + step] < k:
+                pos += step
+                k -= tree[pos]
+            step >>= 1
+        return pos
+
+class Ladder:
+    """
+    A season's ladder at any point in its replay
+
+    Every rating a player holds during the season is known once it has been
+    replayed, so (rating descending, store order) keys are ranked up front
+    and the ladder is a RankTree over those positions. Moving the cursor one
+    fixture forward or back swaps four positions, O(log n) each; seeking
+    from fixture a to b costs O(|b - a| log n), so walking a season in
+    order (animation, audits) is O(n log n) overall. Ties keep store order,
+    as the stable sorts in elo_simulation's tables do.
+    """
+
+    def __init__(self, model: SeasonModel, result: Optional[ReplayResult] = None,
+                 k_factor: int = DEFAULT_K_FACTOR):
+        self.model = model
+        if result is None:
+            result = replay_season(model.store.copy(), model.batch, k_factor)
+        start = model.store.ratings
+        players = model.batch.players
+        new_ratings = result.new_ratings
+        n_players = len(start)
+
+        # Rank every (rating, player) the season produces, best first
+        order = sorted(range(n_players + len(players)),
+                       key=lambda i: (-start[i], i) if i < n_players
+                       else (-new_ratings[i - n_players], players[i - n_players]))
+        position = array('i', bytes(4 * len(order)))
+        for pos, i in enumerate(order):
+            position[i] = pos
+        self.ratings = array('d', (start[i] if i < n_players else new_ratings[i - n_players] for i in order))
+        self.owner = array('i', (i if i < n_players else players[i - n_players] for i in order))
+
+        # Each slot moves its player from their previous position to a new one
+        self.slot_new = position[n_players:]
+        self.slot_old = array('i', bytes(4 * len(players)))
+        current = position[:n_players]
+        for slot, idx in enumerate(players):
+            self.slot_old[slot] = current[idx]
+            current[idx] = self.slot_new[slot]
+
+        self.current = position[:n_players]
+        self.tree = RankTree(len(order))
+        for pos in self.current:
+            self.tree.add(pos, 1)
+        self.applied = 0
+
+    def __len__(self) -> int:
+        return len(self.current)
+
+    def seek(self, fixtures: int) -> 'Ladder':
+        """Move to the ladder after the first `fixtures` fixtures (0 is the starting ladder)"""
+        if not 0 <= fixtures <= len(self.model):
+            raise IndexError(f"fixture {fixtures} outside 0..{len(self.model)}")
+        players, tree, current = self.model.batch.players, self.tree, self.current
+        while self.applied < fixtures:
+            for slot in range(4 * self.applied, 4 * self.applied + 4):
+                tree.add(self.slot_old[slot], -1)
+                tree.add(self.slot_new[slot], 1)
+                current[players[slot]] = self.slot_new[slot]
+            self.applied += 1
+        while self.applied > fixtures:
+            self.applied -= 1
+            for slot in range(4 * self.applied + 3, 4 * self.applied - 1, -1):
+                tree.add(self.slot_new[slot], -1)
+                tree.add(self.slot_old[slot], 1)
+                current[players[slot]] = self.slot_old[slot]
+        return self
+
+    def seek_date(self, when) -> 'Ladder':
+        """Move to the ladder after every fixture with created_at <= when; ValueError if any fixture has no created_at"""
+        # Missing timestamps count as the epoch, which would put those fixtures before any date
+        missing = sum(created_at is None for created_at in self.model.batch.created_at)
+        if missing:
+            raise ValueError(f"{missing} of {len(self.model)} fixtures have no created_at, so the ladder can't be placed by date")
+        return self.seek(self.model.through(when))
+
+    def rank(self, key: Hashable, after: Optional[int] = None) -> int:
+        """1-based rank of a player, now or after fixture `after`"""
+        if after is not None:
+            self.seek(after)
+        return self.tree.prefix(self.current[self.model.store.index[key]])
+
+    def rating(self, key: Hashable, after: Optional[int] = None) -> float:
+        if after is not None:
+            self.seek(after)
+        return self.ratings[self.current[self.model.store.index[key]]]
+
+    def at(self, rank: int) -> Tuple[Hashable, float]:
+        """(player key, rating) holding a 1-based rank"""
+        pos = self.tree.kth(rank)
+        return self.model.store.keys[self.owner[pos]], self.ratings[pos]
+
+    def table(self, top: Optional[int] = None) -> List[Tuple[int, Hashable, float]]:
+        """[(rank, key, rating), ...] best first; top limits it to the first few"""
+        count = len(self) if top is None else min(top, len(self))
+        return [(rank, *self.at(rank)) for rank in range(1, count + 1)]
+
+    def rank_series(self, key: Hashable) -> array:
+        """A player's rank at every point of the season: index i is the rank after i fixtures"""
+        self.seek(0)
+        ranks = array('i', [self.rank(key)])
+        for n in range(1, len(self.model) + 1):
+            ranks.append(self.seek(n).rank(key))
+        return ranks
+
+def parse_when(value: str) -> datetime:
+    """ISO date or timestamp; a bare date means the end of that day, naive values are UTC"""
+    when = datetime.fromisoformat(value)
+    if len(value) == 10:
+        when = when.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return when if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+def load_sample_model() -> Tuple[SeasonModel, int]:
+    """The Winter 25 MATCH_RESULTS literal, starting from STARTING_ELO_2"""
+    from elo_engine import FixtureBatch, RatingStore
+    from elo_simulation import MATCH_RESULTS, STARTING_ELO_2, normalize_name
+
+    store = RatingStore.from_dict(STARTING_ELO_2)
+    batch = FixtureBatch.from_matches(store, MATCH_RESULTS, resolve=normalize_name)
+    return SeasonModel(store, batch, names=store.keys), DEFAULT_K_FACTOR
+
+def find_player(model: SeasonModel, name: str) -> Hashable:
+    names = model.names or model.store.keys
+    matches = [key for key, player_name in zip(model.store.keys, names)
+               if name in (key, player_name) or player_name.lower() == name.lower()]
+    if len(matches) != 1:
+        raise KeyError(f"{'No' if not matches else 'More than one'} player matches {name!r}")
+    return matches[0]
+
+def print_table(ladder: Ladder, baseline: Ladder, top: Optional[int] = None):
+    """The ladder with each player's movement since the baseline point"""
+    names = dict(zip(ladder.model.store.keys, ladder.model.names or ladder.model.store.keys))
+    print(f"{'Rank':<4} {'Player':<20} {'ELO':<6} {'Move':<5}")
+    print("-" * 38)
+    for rank, key, rating in ladder.table(top):
+        move = baseline.rank(key) - rank
+        print(f"{rank:<4} {names[key]:<20} {rating:<6.0f} {move:+d}" if move else
+              f"{rank:<4} {names[key]:<20} {rating:<6.0f} =")
+
+def print_series(ladder: Ladder, key: Hashable, name: str):
+    """Rank and rating after each of a player's fixtures"""
+    model = ladder.model
+    print(f"{'Fixture':<8} {'Week':<5} {'Rank':<5} {'ELO':<6}")
+    print("-" * 26)
+    ladder.seek(0)
+    print(f"{'start':<8} {'':<5} {ladder.rank(key):<5} {ladder.rating(key):.0f}")
+    for fixture in model.fixtures_for(key):
+        ladder.seek(fixture + 1)
+        week = model.weeks[fixture]
+        print(f"{fixture + 1:<8} {'' if week < 0 else week:<5} {ladder.rank(key):<5} {ladder.rating(key):.0f}")
+    print(f"📈 {name}: best rank {min(ladder.rank_series(key))} of {len(ladder)}")
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Show a season's ladder at any fixture or date, or one player's rank over time")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--season-id', help="Load the season from the database (default: the Winter 25 sample)")
+    source.add_argument('--snapshot', help="Load the season from an elo_snapshot.py file")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    point = parser.add_mutually_exclusive_group()
+    point.add_argument('--after', type=int, help="Ladder after this many fixtures (default: all of them)")
+    point.add_argument('--at', type=parse_when, help="Ladder as of this ISO date or timestamp")
+    parser.add_argument('--player', help="Print one player's rank after each of their fixtures instead")
+    parser.add_argument('--top', type=int, help="Only show the first TOP places")
+    args = parser.parse_args(argv)
+
+    if args.season_id:
+        from elo_db import connection, fetch_seasons
+        from elo_model import load_season_model
+        with connection(args.dsn) as conn, conn.cursor() as cur:
+            model = load_season_model(cur, args.season_id)
+            k_factor = next((season.k_factor for season in fetch_seasons(cur) if season.id == args.season_id),
+                            DEFAULT_K_FACTOR)
+    elif args.snapshot:
+        from elo_snapshot import Snapshot
+        with Snapshot(args.snapshot) as snapshot:
+            model = SeasonModel.from_snapshot(snapshot)
+            k_factor = snapshot.season.get('k_factor', DEFAULT_K_FACTOR)
+    else:
+        model, k_factor = load_sample_model()
+
+    for fixture_id, reason in model.batch.skipped:
+        print(f"⚠️  Skipping fixture {fixture_id} - {reason}", file=sys.stderr)
+
+    result = replay_season(model.store.copy(), model.batch, k_factor)
+    ladder = Ladder(model, result)
+    if args.player:
+        try:
+            key = find_player(model, args.player)
+        except KeyError as e:
+            print(f"❌ {e.args[0]}", file=sys.stderr)
+            return 1
+        print_series(ladder, key, args.player)
+        return 0
+
+    if args.at is not None:
+        try:
+            ladder.seek_date(args.at)
+        except ValueError as e:
+            print(f"❌ {e.args[0]}", file=sys.stderr)
+            return 1
+        label = f"as of {args.at:%Y-%m-%d %H:%M} ({ladder.applied} fixtures)"
+    else:
+        try:
+            ladder.seek(len(model) if args.after is None else args.after)
+        except IndexError as e:
+            print(f"❌ {e.args[0]}", file=sys.stderr)
+            return 1
+        label = f"after {ladder.applied} fixtures"
+
+    # Movement is measured against a second ladder left at the start of the season
+    print(f"\n=== Ladder {label}, season has {len(model)} ===")
+    print_table(ladder, Ladder(model, result), args.top)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
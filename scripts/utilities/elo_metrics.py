@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Instrumentation for the ELO utilities
+Per-phase timers, counters, a one-screen summary, a JSON metrics file and opt-in cProfile or sampling profiles
+"""
+
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+# Report order; phases outside this list follow in the order first seen
+PHASES = ('connect', 'fetch', 'compute', 'write', 'commit')
+PROFILERS = ('cprofile', 'sample')
+DEFAULT_PROFILE_OUTPUT = {'cprofile': 'elo_profile.prof', 'sample': 'elo_profile.folded'}
+# Skipped fixtures are counted; only this many IDs are kept for the metrics file
+MAX_SKIPPED_IDS = 50
+
+class Metrics:
+    """
+    Timings and counts for one run
+
+    phases maps a phase name to [seconds, calls]. Worker processes build
+    their own Metrics and send as_dict() back for the parent to merge(), in
+    which case phase times are summed across workers.
+    """
+
+    def __init__(self, name: str = ''):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}
+        self.counters: Counter = Counter()
+        self.skipped: List[List[str]] = []
+
+    def add(self, phase: str, seconds: float, calls: int = 1):
+        totals = self.phases.setdefault(phase, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += calls
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the block as one call of a phase, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    def skip(self, fixture_id, reason: str):
+        """Count a fixture left out of the replay, keeping the first few IDs"""
+        self.counters['matches_skipped'] += 1
+        self.counters[f"skipped: {reason}"] += 1
+        if len(self.skipped) < MAX_SKIPPED_IDS:
+            self.skipped.append([str(fixture_id), reason])
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def merge(self, other: Dict):
+        """Fold in another run's as_dict(), e.g. from a worker process"""
+        for phase, totals in other.get('phases', {}).items():
+            self.add(phase, totals['seconds'], totals['calls'])
+        self.counters.update(other.get('counters', {}))
+        self.skipped.extend(other.get('skipped', [])[:MAX_SKIPPED_IDS - len(self.skipped)])
+
+    def ordered_phases(self) -> List[str]:
+        return [p for p in PHASES if p in self.phases] + [p for p in self.phases if p not in PHASES]
+
+    def as_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'seconds': self.elapsed,
+            'python': platform.python_version(),
+            'phases': {p: {'seconds': self.phases[p][0], 'calls': self.phases[p][1]} for p in self.ordered_phases()},
+            'counters': dict(self.counters),
+            'skipped': self.skipped,
+        }
+
+    def summary(self) -> str:
+        """A few lines for the console: one per phase, then the counters"""
+        lines = [f"⏱️  {self.name or 'Run'} finished in {self.elapsed:.2f}s"]
+        for p in self.ordered_phases():
+            seconds, calls = self.phases[p]
+            lines.append(f"   {p:<10} {seconds:>9.3f}s  ({calls} call{'s' if calls != 1 else ''})")
+        if self.counters:
+            lines.append("   " + ", ".join(f"{name} {value:,}" for name, value in sorted(self.counters.items())))
+        return "\n".join(lines)
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+class SamplingProfiler:
+    """
+    Stdlib sampling profiler for the calling thread
+
+    A background thread records the target thread's stack every interval
+    seconds. Output is in collapsed-stack format ("a;b;c count"), which
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='elo-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top(self, n: int = 15) -> str:
+        """Functions seen most often at the top of the stack"""
+        leaves: Counter = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return "\n".join(f"{count / total:>7.1%}  {leaf}" for leaf, count in leaves.most_common(n))
+
+@contextmanager
+def profiled(kind: Optional[str], output: Optional[str] = None) -> Iterator[None]:
+    """Profile the block with cProfile or the sampling profiler; does nothing when kind is None"""
+    if kind is None:
+        yield
+        return
+    if kind not in PROFILERS:
+        raise ValueError(f"Unknown profiler: {kind}")
+    output = output or DEFAULT_PROFILE_OUTPUT[kind]
+
+    if kind == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(output)
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(15)
+            print(report.getvalue())
+            print(f"🔬 cProfile stats written to {output} (python -m pstats {output})")
+    else:
+        sampler = SamplingProfiler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.write(output)
+            print(f"\n🔬 {sum(sampler.samples.values())} samples, top of stack:")
+            print(sampler.top())
+            print(f"Collapsed stacks written to {output} (flamegraph.pl or speedscope)")
+
+def add_arguments(parser, profile: bool = True):
+    """The --metrics flag, and unless profile is False the profiler flags, for a script's parser"""
+    parser.add_argument('--metrics', metavar='PATH', help="Write phase timings and counters to this JSON file")
+    if profile:
+        parser.add_argument('--profile', choices=PROFILERS,
+                            help="Profile the run with cProfile or the stdlib sampling profiler")
+        parser.add_argument('--profile-output', metavar='PATH',
+                            help="Where to write the profile (default elo_profile.prof / elo_profile.folded)")
+
+def report(metrics: Metrics, path: Optional[str] = None):
+    """Print the summary and, with a path, write the metrics file"""
+    print()
+    print(metrics.summary())
+    if path:
+        metrics.write(path)
+        print(f"📄 Metrics written to {path}")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Columnar in-memory model of one season's fixtures
+Built once from the database, a snapshot or a FixtureBatch, with per-player and per-week indexes so lookups cost O(k)
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Hashable, List, Optional, Sequence
+
+from elo_engine import FixtureBatch, RatingStore
+from elo_snapshot import to_micros
+
+class SeasonModel:
+    """
+    A season's fixtures as flat arrays plus two CSR-style indexes
+
+    The batch stays the source of truth: players (4 store indices per
+    fixture) and scores (2 per fixture) are the batch's own arrays, so
+    replay_season(model.store, model.batch) and the shaped views below
+    share memory with it. created_us (epoch microseconds) and weeks (-1
+    when unknown) are added alongside, one entry per fixture.
+
+    player_slots lists, for each player in store order, the flat slot
+    (4 * fixture + position) of every fixture they played, in replay
+    order; player_offsets[i]:player_offsets[i + 1] is player i's run.
+    week_fixtures and week_offsets do the same for week numbers.
+    """
+
+    def __init__(self, store: RatingStore, batch: FixtureBatch, season_player_ids: Optional[Sequence[str]] = None,
+                 names: Optional[Sequence[str]] = None, season_id: Optional[str] = None):
+        self.store = store
+        self.batch = batch
+        self.season_player_ids = list(season_player_ids) if season_player_ids is not None else None
+        self.names = list(names) if names is not None else None
+        self.season_id = season_id
+        self.created_us = array('q', (to_micros(created_at) for created_at in batch.created_at))
+        self.weeks = array('i', (-1 if week is None else week for week in batch.weeks))
+        self._index_players()
+        self._index_weeks()
+
+    def _index_players(self):
+        """Counting sort of slots by player: two passes, no comparisons"""
+        offsets = array('i', bytes(4 * (len(self.store) + 1)))
+        for idx in self.batch.players:
+            offsets[idx + 1] += 1
+        for i in range(1, len(offsets)):
+            offsets[i] += offsets[i - 1]
+        slots = array('i', bytes(4 * len(self.batch.players)))
+        fill = array('i', offsets)
+        for slot, idx in enumerate(self.batch.players):
+            slots[fill[idx]] = slot
+            fill[idx] += 1
+        self.player_offsets = offsets
+        self.player_slots = slots
+
+    def _index_weeks(self):
+        order = sorted(range(len(self.weeks)), key=lambda f: (self.weeks[f], f))
+        self.week_fixtures = array('i', order)
+        self.week_numbers = sorted(set(self.weeks))
+        self.week_offsets = array('i', (bisect_left(self.week_fixtures, week, key=self.weeks.__getitem__)
+                                        for week in self.week_numbers))
+        self.week_offsets.append(len(order))
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> 'SeasonModel':
+        """From an elo_snapshot.Snapshot, starting ratings loaded"""
+        return cls(snapshot.store(), snapshot.batch(), snapshot.season_player_ids, snapshot.names,
+                   snapshot.season.get('id'))
+
+    def __len__(self) -> int:
+        return len(self.batch)
+
+    @property
+    def players(self) -> memoryview:
+        """(n_fixtures, 4) int32 view of batch.players; numpy.asarray() of it doesn't copy"""
+        return memoryview(self.batch.players).cast('B').cast('i', [len(self), 4]) if len(self) else memoryview(self.batch.players)
+
+    @property
+    def scores(self) -> memoryview:
+        """(n_fixtures, 2) int32 view of batch.scores"""
+        return memoryview(self.batch.scores).cast('B').cast('i', [len(self), 2]) if len(self) else memoryview(self.batch.scores)
+
+    def slots_for(self, key: Hashable) -> memoryview:
+        """Flat slots (4 * fixture + position) a player appears in, in replay order"""
+        idx = self.store.index[key]
+        return memoryview(self.player_slots)[self.player_offsets[idx]:self.player_offsets[idx + 1]]
+
+    def fixtures_for(self, key: Hashable) -> List[int]:
+        """Fixture indexes a player played in, in replay order"""
+        return [slot // 4 for slot in self.slots_for(key)]
+
+    def week(self, week: int) -> memoryview:
+        """Fixture indexes of one week, in replay order; empty if there's no such week"""
+        i = bisect_left(self.week_numbers, week)
+        if i == len(self.week_numbers) or self.week_numbers[i] != week:
+            return memoryview(self.week_fixtures)[0:0]
+        return memoryview(self.week_fixtures)[self.week_offsets[i]:self.week_offsets[i + 1]]
+
+    def between(self, start=None, end=None) -> range:
+        """Fixture indexes with start <= created_at < end (datetimes or epoch microseconds)"""
+        lo = 0 if start is None else bisect_left(self.created_us, to_micros(start))
+        hi = len(self) if end is None else bisect_left(self.created_us, to_micros(end))
+        return range(lo, max(lo, hi))
+
+    def through(self, end) -> int:
+        """Number of fixtures with created_at <= end"""
+        return bisect_right(self.created_us, to_micros(end))
+
+def load_season_model(cur, season_id: str) -> SeasonModel:
+    """
+    One season as the backdates see it: starting ratings, then every result in replay order
+
+    Fixtures with missing players, or players outside the season, are left
+    in model.batch.skipped.
+    """
+    # Imported here so models built from snapshots or batches never need psycopg2
+    from elo_db import fetch_ordered_results, fetch_season_players
+
+    store = RatingStore()
+    season_player_ids, names = [], []
+    for season_player_id, player_id, name, starting_elo in fetch_season_players(cur, season_id):
+        if player_id in store:
+            continue
+        store.intern(player_id, starting_elo)
+        season_player_ids.append(season_player_id)
+        names.append(name)
+    batch = FixtureBatch.from_rows(store, fetch_ordered_results(cur, season_id))
+    return SeasonModel(store, batch, season_player_ids, names, season_id)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo starting-ELO sensitivity for the Winter 25 season
+Replays MATCH_RESULTS under thousands of sampled starting ratings and match orders
+"""
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from elo_engine import DEFAULT_K_FACTOR, FixtureBatch, RatingStore
+from elo_simulation import MATCH_RESULTS, STARTING_ELO_1, STARTING_ELO_2, normalize_name
+
+SHUFFLE_MODES = ('none', 'within-week', 'all')
+
+def pack_season(matches: List[dict], players: List[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pack matches into numpy arrays via the engine's FixtureBatch
+
+    Returns (fixture players (F, 4) int32, actual scores (F, 2), week numbers (F,)).
+    Actual scores don't depend on ratings, so they are normalised once here.
+    """
+    store = RatingStore.from_dict({name: 0 for name in players})
+    batch = FixtureBatch.from_matches(store, matches, resolve=normalize_name)
+    fixture_players = np.frombuffer(batch.players, dtype=np.int32).reshape(-1, 4)
+    scores = np.frombuffer(batch.scores, dtype=np.int32).reshape(-1, 2).astype(np.float64)
+    totals = scores.sum(axis=1, keepdims=True)
+    actual = np.where(totals > 0, scores / np.where(totals > 0, totals, 1), 0.5)
+    weeks = np.array([week if week is not None else 0 for week in batch.weeks])
+    return fixture_players, actual, weeks
+
+def sample_starting_ratings(rng: np.random.Generator, low: np.ndarray, high: np.ndarray,
+                            n_samples: int, jitter: float) -> np.ndarray:
+    """One starting-rating vector per row, uniform between the two scenarios plus optional noise"""
+    ratings = low + rng.random((n_samples, low.size)) * (high - low)
+    if jitter > 0:
+        ratings += rng.normal(0.0, jitter, ratings.shape)
+    return ratings
+
+def sample_match_orders(rng: np.random.Generator, weeks: np.ndarray, n_samples: int, shuffle: str) -> np.ndarray:
+    """One fixture ordering per row: unchanged, shuffled within each week, or fully shuffled"""
+    n_fixtures = weeks.size
+    if shuffle == 'none':
+        return np.broadcast_to(np.arange(n_fixtures), (n_samples, n_fixtures))
+    if shuffle == 'all':
+        return rng.random((n_samples, n_fixtures)).argsort(axis=1)
+    # Sort by week first, random key second: weeks stay in order, fixtures within a week don't
+    keys = weeks[np.newaxis, :] + rng.random((n_samples, n_fixtures))
+    return keys.argsort(axis=1, kind='stable')
+
+def replay_batch(start_ratings: np.ndarray, fixture_players: np.ndarray, actual: np.ndarray,
+                 orders: np.ndarray, k_factor: int = DEFAULT_K_FACTOR) -> np.ndarray:
+    """
+    Replay every sample at once: row s is one scenario, column p one player
+
+    Each step applies the same ELO update as elo_engine.replay_season to all
+    rows, so the loop runs once per fixture, not once per fixture per sample.
+    """
+    ratings = start_ratings.astype(np.float64, copy=True)
+    rows = np.arange(ratings.shape[0])
+    players = fixture_players[orders]
+    scores = actual[orders]
+
+    for f in range(orders.shape[1]):
+        a, b, c, d = players[:, f, 0], players[:, f, 1], players[:, f, 2], players[:, f, 3]
+        pair1_avg = (ratings[rows, a] + ratings[rows, b]) / 2
+        pair2_avg = (ratings[rows, c] + ratings[rows, d]) / 2
+        pair1_expected = 1.0 / (1.0 + np.power(10.0, (pair2_avg - pair1_avg) / 400))
+        pair1_change = k_factor * (scores[:, f, 0] - pair1_expected)
+        pair2_change = k_factor * (scores[:, f, 1] - (1.0 - pair1_expected))
+        ratings[rows, a] += pair1_change
+        ratings[rows, b] += pair1_change
+        ratings[rows, c] += pair2_change
+        ratings[rows, d] += pair2_change
+
+    return ratings
+
+def _run_chunk(args) -> np.ndarray:
+    """Worker: sample and replay one chunk of scenarios"""
+    seed, n_samples, low, high, jitter, shuffle, fixture_players, actual, weeks, k_factor = args
+    rng = np.random.default_rng(seed)
+    start = sample_starting_ratings(rng, low, high, n_samples, jitter)
+    orders = sample_match_orders(rng, weeks, n_samples, shuffle)
+    return replay_batch(start, fixture_players, actual, orders, k_factor)
+
+def run_monte_carlo(n_samples: int, workers: int = 1, shuffle: str = 'within-week', jitter: float = 0.0,
+                    seed: int = 0, k_factor: int = DEFAULT_K_FACTOR) -> Tuple[List[str], np.ndarray]:
+    """Return (player names, final ratings of shape (n_samples, n_players))"""
+    players = sorted(STARTING_ELO_1)
+    low = np.array([min(STARTING_ELO_1[name], STARTING_ELO_2[name]) for name in players], dtype=np.float64)
+    high = np.array([max(STARTING_ELO_1[name], STARTING_ELO_2[name]) for name in players], dtype=np.float64)
+    fixture_players, actual, weeks = pack_season(MATCH_RESULTS, players)
+
+    n_chunks = max(1, min(workers, n_samples))
+    sizes = [n_samples // n_chunks + (1 if i < n_samples % n_chunks else 0) for i in range(n_chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    jobs = [(s, size, low, high, jitter, shuffle, fixture_players, actual, weeks, k_factor)
+            for s, size in zip(seeds, sizes)]
+
+    if n_chunks == 1:
+        chunks = [_run_chunk(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=n_chunks) as pool:
+            chunks = list(pool.map(_run_chunk, jobs))
+    return players, np.concatenate(chunks)
+
+def rank_matrix(final_ratings: np.ndarray) -> np.ndarray:
+    """Ladder position (1 = top) of every player in every sample"""
+    n_samples, n_players = final_ratings.shape
+    order = np.argsort(-final_ratings, axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    ranks[np.arange(n_samples)[:, np.newaxis], order] = np.arange(1, n_players + 1)
+    return ranks
+
+def summarise(players: List[str], final_ratings: np.ndarray) -> List[Dict]:
+    """Per-player rating and rank distribution across all samples"""
+    ranks = rank_matrix(final_ratings)
+    p5, p50, p95 = np.percentile(final_ratings, [5, 50, 95], axis=0)
+    rank_p5, rank_p95 = np.percentile(ranks, [5, 95], axis=0)
+    summary = []
+    for i, name in enumerate(players):
+        summary.append({
+            'player': name,
+            'mean_rating': final_ratings[:, i].mean(),
+            'sd_rating': final_ratings[:, i].std(),
+            'p5_rating': p5[i],
+            'median_rating': p50[i],
+            'p95_rating': p95[i],
+            'mean_rank': ranks[:, i].mean(),
+            'best_rank': ranks[:, i].min(),
+            'worst_rank': ranks[:, i].max(),
+            'rank_p5': rank_p5[i],
+            'rank_p95': rank_p95[i],
+            'p_top': (ranks[:, i] == 1).mean(),
+        })
+    return sorted(summary, key=lambda row: row['mean_rank'])
+
+def print_summary(summary: List[Dict], n_samples: int):
+    print(f"\n=== Monte Carlo Results ({n_samples:,} scenarios) ===")
+    print(f"{'Player':<20} {'Mean ELO':>9} {'SD':>6} {'5%-95% ELO':>13} {'Mean Rank':>10} {'Rank Range':>11} {'P(1st)':>7}")
+    print("-" * 82)
+    for row in summary:
+        elo_range = f"{row['p5_rating']:.0f}-{row['p95_rating']:.0f}"
+        rank_range = f"{row['rank_p5']:.0f}-{row['rank_p95']:.0f}"
+        print(f"{row['player']:<20} {row['mean_rating']:>9.0f} {row['sd_rating']:>6.1f} {elo_range:>13} "
+              f"{row['mean_rank']:>10.2f} {rank_range:>11} {row['p_top']:>7.1%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo sensitivity of final ELO to starting ratings and match order")
+    parser.add_argument('--samples', type=int, default=10000, help="Scenarios to simulate (default 10000)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument('--shuffle', choices=SHUFFLE_MODES, default='within-week',
+                        help="How to permute match order per scenario (default within-week)")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="Extra normal noise (SD, ELO points) on sampled starting ratings")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--k-factor', type=int, default=DEFAULT_K_FACTOR)
+    parser.add_argument('--output', help="Also write the per-player summary to this CSV file")
+    args = parser.parse_args()
+
+    print("ELO MONTE CARLO: Winter 25 Season Results")
+    print("=" * 50)
+    print("Starting ratings sampled uniformly between Starting ELO 1 and Starting ELO 2")
+
+    start = time.perf_counter()
+    players, final_ratings = run_monte_carlo(args.samples, args.workers, args.shuffle,
+                                             args.jitter, args.seed, args.k_factor)
+    elapsed = time.perf_counter() - start
+
+    summary = summarise(players, final_ratings)
+    print_summary(summary, args.samples)
+    print(f"\n⏱  {args.samples:,} scenarios x {len(MATCH_RESULTS)} matches in {elapsed:.2f}s")
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(summary[0]))
+            writer.writeheader()
+            writer.writerows(summary)
+        print(f"📄 Summary written to {args.output}")
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Balanced court and pairing scheduler seeded from ELO ratings
+Local search over court assignments so every rubber's predicted pair1_expected is as close to 0.5 as possible
+"""
+
+import argparse
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from elo_engine import calculate_expected_score
+
+# A court of four plays all three partner rotations, as in the ladder CSV
+ROTATIONS = ((0, 1, 2, 3), (0, 2, 1, 3), (0, 3, 1, 2))
+DEFAULT_ITERATIONS = 200
+# Stop once this many kicks in a row find nothing better
+DEFAULT_PATIENCE = 25
+DEFAULT_TIME_LIMIT = 1.0
+
+def court_layout(n_players: int) -> List[int]:
+    """
+    Court sizes for n players: courts of four, plus courts of five when n isn't a multiple of four
+
+    Uses as many four-player courts as possible, like the first all-4 option
+    in courtLayoutUtils.js. Raises ValueError when no mix of 4s and 5s fits.
+    """
+    for courts_of_5 in range(n_players // 5 + 1):
+        remaining = n_players - 5 * courts_of_5
+        if remaining >= 0 and remaining % 4 == 0:
+            return [4] * (remaining // 4) + [5] * courts_of_5
+    raise ValueError(f"{n_players} players can't be split into courts of 4 and 5")
+
+def _imbalance(expected: float) -> float:
+    return (expected - 0.5) ** 2
+
+def best_rotation(ratings: Sequence[float], four: Sequence[int]) -> Tuple[float, Tuple[int, int, int, int]]:
+    """The most even of a foursome's three pairings: (imbalance, players in pair1/pair2 order)"""
+    pow_ = math.pow
+    best = None
+    for a, b, c, d in ROTATIONS:
+        p = (four[a], four[b], four[c], four[d])
+        expected = 1.0 / (1.0 + pow_(10, ((ratings[p[2]] + ratings[p[3]]) / 2 - (ratings[p[0]] + ratings[p[1]]) / 2) / 400))
+        cost = _imbalance(expected)
+        if best is None or cost < best[0]:
+            best = (cost, p)
+    return best
+
+def court_rubbers(ratings: Sequence[float], court: Sequence[int]) -> List[Tuple[Tuple[int, int, int, int], Optional[int]]]:
+    """
+    The rubbers a court plays: (pair1 + pair2 players, player sitting out)
+
+    Four players play every rotation. Five players play five rubbers, each
+    sitting out once, and every foursome plays its most even pairing.
+    """
+    if len(court) == 4:
+        return [(tuple(court[i] for i in rotation), None) for rotation in ROTATIONS]
+    rubbers = []
+    for out in range(len(court)):
+        four = [player for i, player in enumerate(court) if i != out]
+        rubbers.append((best_rotation(ratings, four)[1], court[out]))
+    return rubbers
+
+def court_cost(ratings: Sequence[float], court: Sequence[int]) -> float:
+    """Sum over the court's rubbers of (pair1_expected - 0.5)^2"""
+    if len(court) == 4:
+        pow_ = math.pow
+        a, b, c, d = (ratings[p] for p in court)
+        cost = 0.0
+        for x, y, z, w in ((a, b, c, d), (a, c, b, d), (a, d, b, c)):
+            expected = 1.0 / (1.0 + pow_(10, ((z + w) / 2 - (x + y) / 2) / 400))
+            cost += (expected - 0.5) ** 2
+        return cost
+    return sum(best_rotation(ratings, [p for i, p in enumerate(court) if i != out])[0] for out in range(len(court)))
+
+def total_cost(ratings: Sequence[float], courts: Sequence[Sequence[int]]) -> float:
+    return sum(court_cost(ratings, court) for court in courts)
+
+def ladder_courts(ratings: Sequence[float], layout: Sequence[int]) -> List[List[int]]:
+    """Players sorted by rating and cut into courts in order, as applyCourtLayout does"""
+    order = sorted(range(len(ratings)), key=lambda p: -ratings[p])
+    courts, start = [], 0
+    for size in layout:
+        courts.append(order[start:start + size])
+        start += size
+    return courts
+
+def improve(cost: Callable[[Sequence[int]], float], courts: List[List[int]], costs: List[float]) -> float:
+    """
+    Swap players between courts while any swap lowers the total cost
+
+    First-improvement descent; courts and costs are updated in place.
+    Returns the final total cost.
+    """
+    improved = True
+    while improved:
+        improved = False
+        for i, j in itertools.combinations(range(len(courts)), 2):
+            court_i, court_j = courts[i], courts[j]
+            for x in range(len(court_i)):
+                for y in range(len(court_j)):
+                    court_i[x], court_j[y] = court_j[y], court_i[x]
+                    cost_i = cost(court_i)
+                    cost_j = cost(court_j)
+                    if cost_i + cost_j < costs[i] + costs[j] - 1e-12:
+                        costs[i], costs[j] = cost_i, cost_j
+                        improved = True
+                    else:
+                        court_i[x], court_j[y] = court_j[y], court_i[x]
+    return sum(costs)
+
+def solve(ratings: Sequence[float], layout: Optional[Sequence[int]] = None, iterations: int = DEFAULT_ITERATIONS,
+          time_limit: float = DEFAULT_TIME_LIMIT, seed: int = 0,
+          patience: int = DEFAULT_PATIENCE) -> Tuple[List[List[int]], float]:
+    """
+    Assign players (indices into ratings) to courts, minimising total_cost
+
+    Iterated local search: descend from the ladder split, then repeatedly
+    kick the best assignment with a few random swaps and descend again,
+    keeping any improvement. Stops after iterations kicks, patience kicks
+    in a row without improvement or time_limit seconds, whichever comes
+    first; the same seed gives the same answer unless the time limit cuts
+    the run short.
+    """
+    layout = list(layout) if layout is not None else court_layout(len(ratings))
+    if sum(layout) != len(ratings):
+        raise ValueError(f"Layout {layout} seats {sum(layout)} players, not {len(ratings)}")
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + time_limit
+
+    # Descents revisit the same foursomes constantly, so cost each line-up once
+    cache: Dict[Tuple[int, ...], float] = {}
+
+    def cost(court: Sequence[int]) -> float:
+        key = tuple(sorted(court))
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = court_cost(ratings, key)
+        return value
+
+    best = ladder_courts(ratings, layout)
+    best_costs = [cost(court) for court in best]
+    best_cost = improve(cost, best, best_costs)
+
+    if len(best) > 1:
+        stale = 0
+        for _ in range(iterations):
+            if stale >= patience or time.perf_counter() > deadline:
+                break
+            courts = [list(court) for court in best]
+            for _ in range(rng.randint(2, 4)):
+                i, j = rng.sample(range(len(courts)), 2)
+                x, y = rng.randrange(len(courts[i])), rng.randrange(len(courts[j]))
+                courts[i][x], courts[j][y] = courts[j][y], courts[i][x]
+            costs = [cost(court) for court in courts]
+            total = improve(cost, courts, costs)
+            if total < best_cost - 1e-12:
+                best, best_cost, stale = courts, total, 0
+            else:
+                stale += 1
+
+    # Court 1 is the strongest, as on the ladder
+    best.sort(key=lambda court: -sum(ratings[p] for p in court) / len(court))
+    return best, best_cost
+
+def partitions(players: Sequence[int], sizes: Sequence[int]) -> Iterator[List[List[int]]]:
+    """Every split of players into unordered courts of the given sizes"""
+    if not players:
+        yield []
+        return
+    first, rest = players[0], players[1:]
+    for size in sorted(set(sizes)):
+        remaining = list(sizes)
+        remaining.remove(size)
+        for others in itertools.combinations(rest, size - 1):
+            left = [p for p in rest if p not in others]
+            for tail in partitions(left, remaining):
+                yield [[first, *others]] + tail
+
+def brute_force(ratings: Sequence[float], layout: Optional[Sequence[int]] = None) -> Tuple[List[List[int]], float]:
+    """The exact optimum by enumerating every court assignment; only for small player counts"""
+    layout = list(layout) if layout is not None else court_layout(len(ratings))
+    best, best_cost = None, float('inf')
+    for courts in partitions(list(range(len(ratings))), layout):
+        cost = total_cost(ratings, courts)
+        if cost < best_cost:
+            best, best_cost = courts, cost
+    return best, best_cost
+
+def schedule(names: Sequence[str], ratings: Sequence[float], courts: Sequence[Sequence[int]]) -> List[Dict]:
+    """Courts with their rubbers, pair names and predicted pair1_expected"""
+    result = []
+    for number, court in enumerate(courts, 1):
+        rubbers = []
+        for (a, b, c, d), out in court_rubbers(ratings, court):
+            rubbers.append({
+                'pair1': [names[a], names[b]],
+                'pair2': [names[c], names[d]],
+                'sitting_out': names[out] if out is not None else None,
+                'pair1_expected': calculate_expected_score((ratings[a] + ratings[b]) / 2,
+                                                           (ratings[c] + ratings[d]) / 2),
+            })
+        result.append({
+            'court': number,
+            'players': [names[p] for p in court],
+            'average_rating': sum(ratings[p] for p in court) / len(court),
+            'rubbers': rubbers,
+        })
+    return result
+
+def spread(courts: Sequence[Dict]) -> Dict[str, float]:
+    """How far predictions stray from an even 0.5 across every rubber"""
+    expected = [rubber['pair1_expected'] for court in courts for rubber in court['rubbers']]
+    deviations = [abs(e - 0.5) for e in expected]
+    return {
+        'rubbers': len(expected),
+        'max_deviation': max(deviations, default=0.0),
+        'rms_deviation': math.sqrt(sum(d * d for d in deviations) / len(deviations)) if deviations else 0.0,
+    }
+
+def print_schedule(courts: Sequence[Dict]):
+    for court in courts:
+        print(f"\n=== Court {court['court']} (avg {court['average_rating']:.0f}) ===")
+        for rubber in court['rubbers']:
+            pair1, pair2 = ' & '.join(rubber['pair1']), ' & '.join(rubber['pair2'])
+            out = f"  (out: {rubber['sitting_out']})" if rubber['sitting_out'] else ''
+            print(f"  {pair1:<32} vs {pair2:<32} {rubber['pair1_expected']:.3f}{out}")
+    stats = spread(courts)
+    print(f"\n{stats['rubbers']} rubbers: max |expected - 0.5| {stats['max_deviation']:.3f}, "
+          f"RMS {stats['rms_deviation']:.3f}")
+
+def run_benchmark(sizes: Sequence[int], trials: int, seed: int = 0, large: int = 40):
+    """Compare solve() with brute_force() on small leagues, then time solve() on a large one"""
+    rng = random.Random(seed)
+    print(f"{'Players':>7} {'Layout':<12} {'Trials':>6} {'Optimal':>8} {'Worst gap':>10} "
+          f"{'Heuristic':>10} {'Brute force':>12}")
+    print("-" * 72)
+    for n in sizes:
+        layout = court_layout(n)
+        optimal, worst_gap, heuristic_time, brute_time = 0, 0.0, 0.0, 0.0
+        for _ in range(trials):
+            ratings = [rng.gauss(1100, 150) for _ in range(n)]
+            start = time.perf_counter()
+            _, cost = solve(ratings, layout, seed=rng.randrange(2 ** 32))
+            heuristic_time += time.perf_counter() - start
+            start = time.perf_counter()
+            _, exact = brute_force(ratings, layout)
+            brute_time += time.perf_counter() - start
+            gap = (cost - exact) / exact if exact > 0 else 0.0
+            optimal += gap < 1e-9
+            worst_gap = max(worst_gap, gap)
+        print(f"{n:>7} {'-'.join(map(str, layout)):<12} {trials:>6} {optimal:>8} {worst_gap:>10.2%} "
+              f"{heuristic_time / trials * 1000:>8.1f}ms {brute_time / trials * 1000:>10.1f}ms")
+
+    ratings = [rng.gauss(1100, 150) for _ in range(large)]
+    start = time.perf_counter()
+    _, cost = solve(ratings)
+    ladder = total_cost(ratings, ladder_courts(ratings, court_layout(large)))
+    print(f"\n{large} players: cost {cost:.4f} (ladder split {ladder:.4f}) in {time.perf_counter() - start:.3f}s")
+
+def load_ratings(args) -> Dict[str, float]:
+    """{name: rating} from --ratings, --season-id or the Starting ELO 2 demo players"""
+    if args.ratings:
+        with open(args.ratings) as f:
+            return {name: float(rating) for name, rating in json.load(f).items()}
+    if args.season_id:
+        from elo_db import connection
+        from elo_impact import CURRENT_RATINGS_SQL
+        with connection(args.dsn) as conn, conn.cursor() as cur:
+            cur.execute(CURRENT_RATINGS_SQL, (args.season_id,))
+            return {name: float(rating) for _, name, rating in cur.fetchall() if rating is not None}
+    from elo_simulation import STARTING_ELO_2
+    return {name: float(rating) for name, rating in STARTING_ELO_2.items()}
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Assign available players to balanced courts and pairings")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--ratings', help="JSON file of {name: rating} (default: the Starting ELO 2 players)")
+    source.add_argument('--season-id', help="Use current ratings from this season")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--exclude', action='append', default=[], metavar='NAME', help="Unavailable player (repeatable)")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help="Local search restarts")
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT, help="Seconds before stopping early")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help="Also write the schedule as JSON")
+    parser.add_argument('--benchmark', action='store_true', help="Compare with brute force on small inputs instead")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        run_benchmark(sizes=(8, 9, 12, 13), trials=10, seed=args.seed)
+        return 0
+
+    ratings_by_name = load_ratings(args)
+    missing = [name for name in args.exclude if name not in ratings_by_name]
+    if missing:
+        print(f"⚠️  Not in the player list: {', '.join(missing)}")
+    names = [name for name in ratings_by_name if name not in set(args.exclude)]
+    ratings = [ratings_by_name[name] for name in names]
+
+    try:
+        layout = court_layout(len(names))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+    start = time.perf_counter()
+    courts, cost = solve(ratings, layout, args.iterations, args.time_limit, args.seed)
+    elapsed = time.perf_counter() - start
+    ladder = total_cost(ratings, ladder_courts(ratings, layout))
+
+    result = schedule(names, ratings, courts)
+    print(f"🎾 {len(names)} players on {len(layout)} courts ({'-'.join(map(str, layout))})")
+    print_schedule(result)
+    print(f"Cost {cost:.4f} vs {ladder:.4f} for a straight ladder split, found in {elapsed:.3f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'courts': result, 'spread': spread(result)}, f, indent=2)
+        print(f"📄 Schedule written to {args.json}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Pipelined full ELO recompute
+Streams fixtures, computes ratings and writes elo_history in overlapping asyncio stages joined by bounded queues
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Sequence
+
+from elo_db import (ORDERED_RESULTS_SQL, POOL_MAX, connection, fetch_season_players,
+                    fixture_results)
+from elo_engine import FixtureBatch, RatingStore, replay_season
+from elo_history_writer import DEFAULT_BATCH_SIZE, copy_history_rows, history_rows, update_final_ratings
+from elo_incremental import Checkpoint, fixture_key, save_checkpoint
+from elo_metrics import Metrics, add_arguments, report
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_QUEUE_SIZE = 4
+
+class StageStats:
+    """Work done by one stage; busy excludes time spent waiting on its queues"""
+
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.busy = 0.0
+
+    def add(self, items: int, seconds: float):
+        self.items += items
+        self.busy += seconds
+
+    @property
+    def rate(self) -> float:
+        return self.items / self.busy if self.busy > 0 else float('inf')
+
+    def __str__(self) -> str:
+        return f"{self.name:<8} {self.items:>8} {self.unit:<8} {self.busy:>7.2f}s busy  {self.rate:>10,.0f} {self.unit}/s"
+
+@asynccontextmanager
+async def borrowed(dsn: Optional[str], metrics: Optional[Metrics] = None):
+    """elo_db.connection() for async code: pool calls, commit and rollback run off the event loop"""
+    manager = connection(dsn, metrics)
+    conn = await asyncio.to_thread(manager.__enter__)
+    try:
+        yield conn
+    except BaseException as e:
+        if not await asyncio.to_thread(manager.__exit__, type(e), e, e.__traceback__):
+            raise
+    else:
+        await asyncio.to_thread(manager.__exit__, None, None, None)
+
+async def run_stages(*stages):
+    """Run stages together; the first failure cancels the rest so none waits forever on a queue"""
+    tasks = [asyncio.create_task(stage) for stage in stages]
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for task in done:
+        task.result()
+
+async def read_stage(conn, season_id: str, store: RatingStore, chunk_size: int,
+                     out: asyncio.Queue, stats: StageStats, metrics: Metrics):
+    """Stream fixtures through a server-side cursor, chunk_size at a time"""
+    # A named cursor keeps the result set on the server, so memory stays flat
+    cur = conn.cursor(name=f"elo_fixtures_{season_id.replace('-', '')}")
+    cur.itersize = chunk_size
+    try:
+        start = time.perf_counter()
+        await asyncio.to_thread(cur.execute, ORDERED_RESULTS_SQL, (season_id,))
+        stats.add(0, time.perf_counter() - start)
+        while True:
+            start = time.perf_counter()
+            rows = await asyncio.to_thread(cur.fetchmany, chunk_size)
+            if not rows:
+                break
+            batch = FixtureBatch.from_rows(store, fixture_results(rows))
+            for fixture_id, reason in batch.skipped:
+                metrics.skip(fixture_id, reason)
+            stats.add(len(batch), time.perf_counter() - start)
+            # Blocks while the queue is full: backpressure from the slower stages
+            await out.put(batch)
+    finally:
+        await asyncio.to_thread(cur.close)
+    await out.put(None)
+
+async def compute_stage(store: RatingStore, k_factor: int, season_player_ids: Sequence[str],
+                        inp: asyncio.Queue, out: asyncio.Queue, applied: List[list], stats: StageStats):
+    """Replay each chunk from the ratings the previous chunk left behind"""
+    while (batch := await inp.get()) is not None:
+        start = time.perf_counter()
+        result = replay_season(store, batch, k_factor)
+        rows = list(history_rows(batch, result, season_player_ids))
+        changes = result.pair_changes()
+        for f in range(len(batch)):
+            applied.append(fixture_key(batch, f, store.keys) + [changes[2 * f], changes[2 * f + 1]])
+        stats.add(len(batch), time.perf_counter() - start)
+        await out.put(rows)
+    await out.put(None)
+
+async def write_stage(conn, inp: asyncio.Queue, batch_size: int, stats: StageStats):
+    """COPY each chunk's history rows while later chunks are still being read and computed"""
+    cur = conn.cursor()
+    while (rows := await inp.get()) is not None:
+        start = time.perf_counter()
+        written = await asyncio.to_thread(copy_history_rows, cur, rows, batch_size)
+        stats.add(written, time.perf_counter() - start)
+
+async def pipeline_season(dsn: Optional[str], season: Dict, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                          queue_size: int = DEFAULT_QUEUE_SIZE, batch_size: int = DEFAULT_BATCH_SIZE,
+                          metrics: Optional[Metrics] = None) -> Dict:
+    """
+    Recompute one season's history from scratch through the three stages
+
+    Reads run on one pooled connection and writes on another. Every write,
+    including the final ratings and a fresh checkpoint for later incremental
+    runs, is one transaction that commits only if all stages succeed. Stage
+    busy times go to metrics as the fetch, compute and write phases.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    season_id, k_factor = season['id'], season['k_factor']
+    start = time.perf_counter()
+    async with borrowed(dsn, metrics) as reader, borrowed(dsn, metrics) as writer:
+        reader_cur, writer_cur = reader.cursor(), writer.cursor()
+
+        # The reader's transaction doesn't see the writer's uncommitted delete,
+        # so starting ratings still come from the existing first history rows
+        players = await asyncio.to_thread(fetch_season_players, reader_cur, season_id)
+        store = RatingStore()
+        for player in players:
+            store.intern(player.player_id, player.starting_elo)
+        season_player_ids = [player.season_player_id for player in players]
+        start_ratings = store.to_dict()
+
+        await asyncio.to_thread(writer_cur.execute, """
+            DELETE FROM elo_history
+            WHERE season_player_id IN (SELECT id FROM season_players WHERE season_id = %s)
+        """, (season_id,))
+
+        fixtures, computed = asyncio.Queue(queue_size), asyncio.Queue(queue_size)
+        applied: List[list] = []
+        stages = [StageStats('read', 'fixtures'), StageStats('compute', 'fixtures'), StageStats('write', 'rows')]
+        await run_stages(
+            read_stage(reader, season_id, store, chunk_size, fixtures, stages[0], metrics),
+            compute_stage(store, k_factor, season_player_ids, fixtures, computed, applied, stages[1]),
+            write_stage(writer, computed, batch_size, stages[2]),
+        )
+
+        final_ratings = dict(zip(season_player_ids, store.ratings))
+        await asyncio.to_thread(update_final_ratings, writer_cur, final_ratings, batch_size)
+        checkpoint = Checkpoint(season_id, k_factor, start_ratings, store.to_dict(), applied)
+        await asyncio.to_thread(save_checkpoint, writer_cur, checkpoint)
+
+    for phase, stage in zip(('fetch', 'compute', 'write'), stages):
+        metrics.add(phase, stage.busy)
+    metrics.count('matches_processed', len(applied))
+    metrics.count('rows_written', stages[2].items)
+    return {
+        'fixtures': len(applied),
+        'rows_written': stages[2].items,
+        'stages': stages,
+        'seconds': time.perf_counter() - start,
+    }
+
+def bottleneck(stages: Sequence[StageStats]) -> StageStats:
+    """The busiest stage bounds the pipeline's wall-clock time"""
+    return max(stages, key=lambda stage: stage.busy)
+
+async def pipeline_seasons(dsn: Optional[str], seasons: List[Dict], concurrency: int = 2,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE, queue_size: int = DEFAULT_QUEUE_SIZE,
+                           batch_size: int = DEFAULT_BATCH_SIZE, metrics: Optional[Metrics] = None) -> bool:
+    """Recompute several seasons, concurrency at a time, printing stage throughput for each"""
+    if 2 * concurrency > POOL_MAX:
+        raise ValueError(f"{concurrency} concurrent seasons need {2 * concurrency} connections; "
+                         f"raise ELO_DB_POOL_MAX (currently {POOL_MAX})")
+    limit = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one(season: Dict):
+        nonlocal failures
+        async with limit:
+            try:
+                stats = await pipeline_season(dsn, season, chunk_size, queue_size, batch_size, metrics)
+            except Exception as e:
+                failures += 1
+                print(f"❌ {season['name']}: {e}")
+                return
+        wall = stats['seconds']
+        serial = sum(stage.busy for stage in stats['stages'])
+        print(f"✅ {season['name']}: {stats['fixtures']} fixtures, {stats['rows_written']} rows in {wall:.2f}s "
+              f"(stages sum to {serial:.2f}s, bottleneck: {bottleneck(stats['stages']).name})")
+        for stage in stats['stages']:
+            print(f"     {stage}")
+
+    # Largest seasons first so a big one doesn't start last
+    queue = sorted(seasons, key=lambda season: season['result_count'], reverse=True)
+    await asyncio.gather(*(one(season) for season in queue))
+    return failures == 0
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from replay_all_seasons import discover_seasons
+
+    parser = argparse.ArgumentParser(description="Recompute ELO history with overlapping read, compute and write stages")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--season', action='append', dest='seasons', metavar='SEASON_ID',
+                        help="Only recompute this season (repeatable; default every ELO-enabled season)")
+    parser.add_argument('--concurrency', type=int, default=max(1, POOL_MAX // 2),
+                        help="Seasons in flight at once; each uses two connections")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Fixtures per fetch")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Chunks buffered between stages before the upstream stage waits")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="elo_history rows per COPY")
+    parser.add_argument('--yes', action='store_true', help="Don't ask for confirmation")
+    add_arguments(parser, profile=False)
+    args = parser.parse_args(argv)
+
+    seasons = discover_seasons(args.dsn, args.seasons)
+    if not seasons:
+        print("No ELO-enabled seasons found")
+        return 0
+    print(f"⚠️  ELO history for {len(seasons)} season(s) will be cleared and rebuilt")
+    if not args.yes and input("Continue? (y/N): ").lower() != 'y':
+        print("Cancelled")
+        return 0
+
+    metrics = Metrics('Pipelined recompute')
+    ok = asyncio.run(pipeline_seasons(args.dsn, seasons, args.concurrency, args.chunk_size,
+                                      args.queue_size, args.batch_size, metrics))
+    report(metrics, args.metrics)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Server-side ELO replay
+Deploys replay_season_elo() from its migration, runs it per season, and checks it against elo_engine on synthetic leagues
+"""
+
+import argparse
+import io
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from elo_benchmark import SyntheticSeason, generate_league
+from elo_engine import DEFAULT_K_FACTOR, replay_season
+from elo_history_writer import copy_line, history_rows
+from migration_runner import MIGRATIONS_DIR, Migration, apply_migrations
+
+FUNCTION_MIGRATION = MIGRATIONS_DIR / '20261017_replay_season_elo_function.sql'
+
+REPLAY_SQL = "SELECT fixtures_replayed, fixtures_skipped, history_rows FROM {schema}replay_season_elo(%s, %s)"
+
+# Just the columns replay_season_elo and the Python backdate read or write.
+# Temp tables shadow the real ones for this session and vanish with the
+# transaction, so the check runs on any Postgres and never touches real data.
+SCRATCH_TABLES_SQL = """
+    CREATE TEMP TABLE seasons (id UUID PRIMARY KEY, name TEXT, elo_k_factor INTEGER, elo_enabled BOOLEAN DEFAULT TRUE,
+                               start_date DATE) ON COMMIT DROP;
+    CREATE TEMP TABLE profiles (id UUID PRIMARY KEY, name TEXT) ON COMMIT DROP;
+    CREATE TEMP TABLE season_players (id UUID PRIMARY KEY, season_id UUID, player_id UUID,
+                                      elo_rating INTEGER) ON COMMIT DROP;
+    CREATE TEMP TABLE matches (id UUID PRIMARY KEY, season_id UUID, week_number INTEGER) ON COMMIT DROP;
+    CREATE TEMP TABLE match_fixtures (id UUID PRIMARY KEY, match_id UUID, pair1_player1_id UUID,
+                                      pair1_player2_id UUID, pair2_player1_id UUID, pair2_player2_id UUID) ON COMMIT DROP;
+    CREATE TEMP TABLE match_results (fixture_id UUID PRIMARY KEY, pair1_score INTEGER, pair2_score INTEGER,
+                                     created_at TIMESTAMPTZ) ON COMMIT DROP;
+    CREATE TEMP TABLE elo_history (
+        id BIGSERIAL,
+        season_player_id UUID NOT NULL,
+        match_fixture_id UUID NOT NULL,
+        old_rating INTEGER,
+        new_rating INTEGER,
+        rating_change INTEGER,
+        k_factor INTEGER,
+        opponent_avg_rating INTEGER,
+        expected_score DOUBLE PRECISION,
+        actual_score DOUBLE PRECISION,
+        created_at TIMESTAMPTZ
+    ) ON COMMIT DROP;
+    CREATE INDEX ON elo_history (season_player_id);
+    CREATE TEMP TABLE elo_replay_checkpoints (season_id UUID PRIMARY KEY, last_created_at TIMESTAMPTZ,
+                                              last_fixture_id UUID, state JSONB NOT NULL,
+                                              updated_at TIMESTAMPTZ) ON COMMIT DROP;
+"""
+
+SEASON_HISTORY_SQL = """
+    SELECT eh.season_player_id, eh.match_fixture_id, eh.old_rating, eh.new_rating, eh.rating_change,
+           eh.k_factor, eh.opponent_avg_rating, eh.expected_score, eh.actual_score, eh.created_at
+    FROM elo_history eh
+    JOIN season_players sp ON eh.season_player_id = sp.id
+    WHERE sp.season_id = %s
+"""
+
+def deploy(conn, dry_run: bool = False) -> bool:
+    """Create or update replay_season_elo through the migration runner; True if it changed"""
+    return bool(apply_migrations(conn, [Migration(FUNCTION_MIGRATION)], allow_changed=True, dry_run=dry_run))
+
+def server_replay(cur, season_id: str, k_factor: Optional[int] = None, schema: str = '') -> Dict[str, int]:
+    """
+    Replay one season inside the database
+
+    One round trip: the function reads results, rewrites elo_history and
+    season_players.elo_rating, and drops the season's incremental
+    checkpoint. The caller owns the transaction.
+    """
+    cur.execute(REPLAY_SQL.format(schema=schema), (season_id, k_factor))
+    replayed, skipped, rows = cur.fetchone()
+    return {'replayed': replayed, 'skipped': skipped, 'rows_written': rows}
+
+def install_scratch(cur):
+    """Temp tables plus a pg_temp copy of the function, for the comparison harness"""
+    cur.execute(SCRATCH_TABLES_SQL)
+    for line, statement in Migration(FUNCTION_MIGRATION).statements:
+        if statement.lstrip().upper().startswith('CREATE OR REPLACE FUNCTION'):
+            cur.execute(statement.replace('CREATE OR REPLACE FUNCTION replay_season_elo',
+                                          'CREATE FUNCTION pg_temp.replay_season_elo', 1))
+
+def _copy(cur, table: str, columns: Sequence[str], rows):
+    buffer = io.StringIO(''.join(copy_line(row) for row in rows))
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+def load_season(cur, season: SyntheticSeason, season_id: str, k_factor: int):
+    """Write a synthetic season into the scratch tables; player IDs derive from the store keys"""
+    keys = season.store.keys
+    player_ids = [str(uuid.uuid5(uuid.NAMESPACE_OID, key)) for key in keys]
+    batch = season.batch
+    match_ids = {week: str(uuid.uuid5(uuid.NAMESPACE_OID, f"{season.name} week {week}")) for week in set(batch.weeks)}
+
+    _copy(cur, 'seasons', ('id', 'name', 'elo_k_factor'), [(season_id, season.name, k_factor)])
+    _copy(cur, 'profiles', ('id', 'name'), zip(player_ids, keys))
+    _copy(cur, 'season_players', ('id', 'season_id', 'player_id', 'elo_rating'),
+          ((sp_id, season_id, pid, int(rating))
+           for sp_id, pid, rating in zip(season.season_player_ids, player_ids, season.store.ratings)))
+    _copy(cur, 'matches', ('id', 'season_id', 'week_number'),
+          ((match_id, season_id, week) for week, match_id in match_ids.items()))
+    _copy(cur, 'match_fixtures', ('id', 'match_id', 'pair1_player1_id', 'pair1_player2_id', 'pair2_player1_id',
+                                  'pair2_player2_id'),
+          ((fixture_id, match_ids[batch.weeks[f]], *(player_ids[batch.players[4 * f + slot]] for slot in range(4)))
+           for f, fixture_id in enumerate(batch.fixture_ids)))
+    _copy(cur, 'match_results', ('fixture_id', 'pair1_score', 'pair2_score', 'created_at'),
+          ((fixture_id, batch.scores[2 * f], batch.scores[2 * f + 1], batch.created_at[f].isoformat())
+           for f, fixture_id in enumerate(batch.fixture_ids)))
+
+def reference_rows(season: SyntheticSeason, k_factor: int) -> Dict[Tuple[str, str], Tuple]:
+    """elo_engine's history rows for a season, keyed by (season player, fixture)"""
+    result = replay_season(season.store.copy(), season.batch, k_factor)
+    return {(row[0], str(row[1])): row for row in history_rows(season.batch, result, season.season_player_ids)}
+
+def compare_rows(expected: Dict[Tuple[str, str], Tuple], stored: Sequence[Tuple]) -> Tuple[int, float, List[str]]:
+    """
+    Diff stored elo_history rows against the reference
+
+    Integer columns must match exactly. Returns (mismatched rows, largest
+    expected/actual score difference, a few example descriptions).
+    """
+    mismatches, max_float_diff, examples = 0, 0.0, []
+    seen = set()
+    for row in stored:
+        key = (str(row[0]), str(row[1]))
+        seen.add(key)
+        reference = expected.get(key)
+        if reference is None:
+            mismatches += 1
+            examples.append(f"unexpected row {key}")
+            continue
+        max_float_diff = max(max_float_diff, abs(row[7] - reference[7]), abs(row[8] - reference[8]))
+        if tuple(row[2:7]) != tuple(reference[2:7]) or row[9] != reference[9]:
+            mismatches += 1
+            examples.append(f"{key}: stored {tuple(row[2:7])}, engine {tuple(reference[2:7])}")
+    for key in expected.keys() - seen:
+        mismatches += 1
+        examples.append(f"missing row {key}")
+    return mismatches, max_float_diff, examples[:5]
+
+def compare(dsn: Optional[str], seasons: Sequence[SyntheticSeason], k_factor: int = DEFAULT_K_FACTOR,
+            repeat: int = 3) -> Dict:
+    """
+    Replay synthetic seasons both ways in scratch tables and compare rows and wall time
+
+    For each season the server function and the Python backdate
+    (elo_incremental.incremental_backdate: fetch, replay, COPY, UPDATE)
+    each run `repeat` times; the best total of each is reported. The rows
+    each leaves behind are diffed against elo_engine. Everything is rolled back.
+    """
+    from elo_db import connection
+    from elo_incremental import incremental_backdate
+
+    season_ids = [str(uuid.uuid5(uuid.NAMESPACE_OID, season.name)) for season in seasons]
+    report = {'fixtures': sum(len(season.batch) for season in seasons), 'server_seconds': 0.0,
+              'python_seconds': 0.0, 'mismatches': {'server': 0, 'python': 0}, 'max_float_diff': 0.0,
+              'final_rating_mismatches': 0, 'examples': []}
+    with connection(dsn) as conn:
+        try:
+            with conn.cursor() as cur:
+                install_scratch(cur)
+                for season, season_id in zip(seasons, season_ids):
+                    load_season(cur, season, season_id, k_factor)
+                cur.execute("ANALYZE")
+
+                for engine in ('server', 'python'):
+                    best = float('inf')
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        for season_id in season_ids:
+                            if engine == 'server':
+                                server_replay(cur, season_id, schema='pg_temp.')
+                            else:
+                                cur.execute("DELETE FROM elo_replay_checkpoints WHERE season_id = %s", (season_id,))
+                                incremental_backdate(cur, season_id, k_factor=k_factor)
+                        best = min(best, time.perf_counter() - start)
+                    report[f"{engine}_seconds"] = best
+
+                    for season, season_id in zip(seasons, season_ids):
+                        cur.execute(SEASON_HISTORY_SQL, (season_id,))
+                        mismatches, float_diff, examples = compare_rows(reference_rows(season, k_factor),
+                                                                        cur.fetchall())
+                        report['mismatches'][engine] += mismatches
+                        report['max_float_diff'] = max(report['max_float_diff'], float_diff)
+                        report['examples'].extend(f"{engine} {season.name} {example}" for example in examples)
+
+                        cur.execute("SELECT id, elo_rating FROM season_players WHERE season_id = %s", (season_id,))
+                        stored = {str(sp_id): rating for sp_id, rating in cur.fetchall()}
+                        store = season.store.copy()
+                        replay_season(store, season.batch, k_factor)
+                        report['final_rating_mismatches'] += sum(
+                            stored[sp_id] != int(rating) for sp_id, rating in zip(season.season_player_ids, store.ratings))
+                # Plans prepared against the temp tables mustn't outlive them
+                cur.execute("DEALLOCATE ALL")
+        finally:
+            conn.prepared.clear()
+            conn.rollback()
+    return report
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Deploy, run and verify the server-side ELO replay function")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    deploy_cmd = commands.add_parser('deploy', help=f"Apply {FUNCTION_MIGRATION.name} (again if it changed)")
+    deploy_cmd.add_argument('--dry-run', action='store_true')
+    replay = commands.add_parser('replay', help="Rebuild seasons' ELO history in the database")
+    replay.add_argument('--season', action='append', dest='seasons', metavar='SEASON_ID', required=True)
+    replay.add_argument('--k-factor', type=int, help="Override the season's K-factor")
+    check = commands.add_parser('compare', help="Check the function against elo_engine on a synthetic league "
+                                                "(scratch temp tables, nothing is committed)")
+    check.add_argument('--players', type=int, default=40, help="Players per season")
+    check.add_argument('--weeks', type=int, default=20, help="Weeks per season")
+    check.add_argument('--rubbers', type=int, default=3, help="Rubbers per match (group of four)")
+    check.add_argument('--seasons', type=int, default=5)
+    check.add_argument('--seed', type=int, default=0)
+    check.add_argument('--repeat', type=int, default=3, help="Runs of each engine; the best is reported")
+    args = parser.parse_args(argv)
+
+    from elo_db import connection
+    if args.command == 'deploy':
+        with connection(args.dsn) as conn:
+            changed = deploy(conn, args.dry_run)
+        print(f"✅ replay_season_elo {'deployed' if changed else 'already up to date'}")
+        return 0
+
+    if args.command == 'replay':
+        for season_id in args.seasons:
+            start = time.perf_counter()
+            with connection(args.dsn) as conn, conn.cursor() as cur:
+                stats = server_replay(cur, season_id, args.k_factor)
+            print(f"✅ {season_id}: {stats['replayed']} fixtures replayed, {stats['skipped']} skipped, "
+                  f"{stats['rows_written']} rows in {time.perf_counter() - start:.2f}s")
+        return 0
+
+    seasons = generate_league(args.players, args.weeks, args.rubbers, args.seasons, args.seed)
+    report = compare(args.dsn, seasons, repeat=args.repeat)
+    fixtures = report['fixtures']
+    print(f"🎾 {args.seasons} synthetic seasons, {fixtures:,} fixtures, {4 * fixtures:,} history rows")
+    for engine in ('server', 'python'):
+        seconds = report[f"{engine}_seconds"]
+        print(f"  {engine:<7} {seconds:>8.3f}s  {fixtures / seconds:>10,.0f} fixtures/s  "
+              f"{report['mismatches'][engine]} mismatched rows")
+    print(f"  speed-up {report['python_seconds'] / report['server_seconds']:.2f}x, "
+          f"largest score difference {report['max_float_diff']:.3g}, "
+          f"{report['final_rating_mismatches']} final rating mismatches")
+    for example in report['examples'][:10]:
+        print(f"  ❌ {example}")
+    ok = not any(report['mismatches'].values()) and not report['final_rating_mismatches']
+    print("✅ Server replay matches elo_engine" if ok else "❌ Server replay differs from elo_engine")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
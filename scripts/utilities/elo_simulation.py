@@ -4,10 +4,15 @@ ELO Simulation for Winter 25 Season
 Compares two different starting ELO scenarios
 """
 
-import math
-from typing import Dict, List, Tuple
+import argparse
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
+from elo_engine import RATING_MODELS, FixtureBatch, RatingStore, replay_with_model
+from elo_metrics import Metrics, add_arguments, profiled, report
+from elo_snapshot import Snapshot
+from name_resolver import NameResolver, print_report
+
 # Starting ELO values from user's request
 STARTING_ELO_1 = {
     "Sid Abraham": 1400,
@@ -57,10 +62,11 @@ STARTING_ELO_2 = {
     "Samuel Best": 1070
 }
 
-# Name mapping for database inconsistencies
+# Manual aliases for spellings the resolver can't work out on its own.
+# Whitespace, case and unique first names ("Jon" -> "Jon Best") are handled by NameResolver.
 NAME_MAPPING = {
-    "Sid Abraham ": "Sid Abraham",  # Remove trailing space
-    "Jon": "Jon Best",  # Map Jon to Jon Best
+    "Mike": "Michael Brennan",  # Short name used in the ladder CSV exports
+    "Shealgh": "Shelagh",  # Typo in the ladder CSV export
 }
 
 # Match results data from database
@@ -125,72 +131,51 @@ MATCH_RESULTS = [
     {"week": 6, "pair1": ["Mark A", "Mark B"], "pair2": ["Shelagh", "Joanne"], "pair1_score": 7, "pair2_score": 3},
 ]
 
-def calculate_expected_score(rating_a: float, rating_b: float) -> float:
-    """Calculate expected score using ELO formula"""
-    return 1.0 / (1.0 + math.pow(10, (rating_b - rating_a) / 400))
-
-def update_elo(old_rating: float, actual_score: float, expected_score: float, k_factor: int = 32) -> float:
-    """Update ELO rating based on match result"""
-    return old_rating + k_factor * (actual_score - expected_score)
+NAME_RESOLVER = NameResolver({name: name for name in STARTING_ELO_1}, NAME_MAPPING)
 
 def normalize_name(name: str) -> str:
-    """Normalize player names for consistency"""
-    name = name.strip()
-    return NAME_MAPPING.get(name, name)
+    """Normalize player names for consistency (raises UnresolvedNameError for unknown or ambiguous names)"""
+    return NAME_RESOLVER(name)
 
-def run_elo_simulation(starting_elos: Dict[str, int], scenario_name: str) -> Dict[str, float]:
-    """Run complete ELO simulation for a season"""
+def run_elo_simulation(starting_elos: Dict[str, int], scenario_name: str, verbose: bool = False,
+                       metrics: Optional[Metrics] = None, model: str = 'elo') -> Dict[str, float]:
+    """Run complete ELO simulation for a season; verbose prints every match, model picks a RATING_MODELS entry"""
+    metrics = metrics if metrics is not None else Metrics()
     print(f"\n=== {scenario_name} ===")
     print("Starting ELO ratings:")
     for name, rating in sorted(starting_elos.items()):
         print(f"  {name}: {rating}")
     
-    # Initialize current ratings
-    current_ratings = starting_elos.copy()
+    # Report names that can't be resolved and leave those matches out
+    resolutions = NAME_RESOLVER.resolve_many(name for match in MATCH_RESULTS for name in match["pair1"] + match["pair2"])
+    print_report(resolutions.values())
+    matches = [match for match in MATCH_RESULTS
+               if all(resolutions[name].resolved for name in match["pair1"] + match["pair2"])]
+    if len(matches) < len(MATCH_RESULTS):
+        print(f"⚠️  Skipping {len(MATCH_RESULTS) - len(matches)} matches with unresolved player names")
+    metrics.count('matches_skipped', len(MATCH_RESULTS) - len(matches))
     
-    # Process each match
-    for i, match in enumerate(MATCH_RESULTS):
-        week = match["week"]
-        pair1 = [normalize_name(name) for name in match["pair1"]]
-        pair2 = [normalize_name(name) for name in match["pair2"]]
-        pair1_score = match["pair1_score"]
-        pair2_score = match["pair2_score"]
-        
-        # Calculate pair average ratings
-        pair1_avg = sum(current_ratings[name] for name in pair1) / len(pair1)
-        pair2_avg = sum(current_ratings[name] for name in pair2) / len(pair2)
-        
-        # Calculate expected scores
-        pair1_expected = calculate_expected_score(pair1_avg, pair2_avg)
-        pair2_expected = 1.0 - pair1_expected
-        
-        # Calculate actual scores (normalized to 0-1)
-        total_games = pair1_score + pair2_score
-        if total_games > 0:
-            pair1_actual = pair1_score / total_games
-            pair2_actual = pair2_score / total_games
-        else:
-            pair1_actual = 0.5  # Draw
-            pair2_actual = 0.5
-        
-        # Update ratings for each player
-        for name in pair1:
-            old_rating = current_ratings[name]
-            new_rating = update_elo(old_rating, pair1_actual, pair1_expected)
-            current_ratings[name] = new_rating
-        
-        for name in pair2:
-            old_rating = current_ratings[name]
-            new_rating = update_elo(old_rating, pair2_actual, pair2_expected)
-            current_ratings[name] = new_rating
+    # Pack the season into the engine's arrays and replay it in one pass
+    with metrics.phase('compute'):
+        store = RatingStore.from_dict(starting_elos)
+        batch = FixtureBatch.from_matches(store, matches, resolve=normalize_name)
+        result = replay_with_model(model, store, batch)
+    metrics.count('matches_processed', len(batch))
+    print(f"Replayed {len(batch)} matches")
+    
+    if verbose:
+        for i, match in enumerate(matches):
+            pair1 = [normalize_name(name) for name in match["pair1"]]
+            pair2 = [normalize_name(name) for name in match["pair2"]]
         
-        # Print match summary
-        print(f"\nWeek {week}, Match {i+1}: {pair1} vs {pair2}")
-        print(f"  Score: {pair1_score}-{pair2_score}")
-        print(f"  Pair averages: {pair1_avg:.0f} vs {pair2_avg:.0f}")
-        print(f"  Expected: {pair1_expected:.3f} vs {pair2_expected:.3f}")
-        print(f"  Actual: {pair1_actual:.3f} vs {pair2_actual:.3f}")
+            # Print match summary
+            print(f"\nWeek {match['week']}, Match {i+1}: {pair1} vs {pair2}")
+            print(f"  Score: {match['pair1_score']}-{match['pair2_score']}")
+            print(f"  Pair averages: {result.pair_avgs[2*i]:.0f} vs {result.pair_avgs[2*i+1]:.0f}")
+            print(f"  Expected: {result.pair_expected[2*i]:.3f} vs {result.pair_expected[2*i+1]:.3f}")
+            print(f"  Actual: {result.actual[2*i]:.3f} vs {result.actual[2*i+1]:.3f}")
     
+    current_ratings = store.to_dict()
     return current_ratings
 
 def print_final_table(ratings: Dict[str, float], scenario_name: str):
@@ -238,22 +223,42 @@ def compare_scenarios(scenario1: Dict[str, float], scenario2: Dict[str, float]):
         print(f"{name:<20} {rank:<10} {rating1:.0f}{'':<7} {rank2[name]:<10} {rating2:.0f}{'':<7} {rank_change:<10} {rating_change}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare starting ELO scenarios for Winter 25")
+    parser.add_argument('--snapshot', help="Also replay from the starting ratings in an elo_snapshot.py file")
+    parser.add_argument('--verbose', action='store_true', help="Print every match, not just the tables")
+    parser.add_argument('--model', choices=RATING_MODELS, default='elo',
+                        help="Rating model to replay with (default elo; see elo_glicko.py)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    metrics = Metrics('ELO simulation')
+    
     print("ELO SIMULATION: Winter 25 Season Results")
     print("=" * 50)
     
-    # Run both scenarios
-    scenario1_results = run_elo_simulation(STARTING_ELO_1, "Starting ELO 1")
-    scenario2_results = run_elo_simulation(STARTING_ELO_2, "Starting ELO 2")
+    with profiled(args.profile, args.profile_output):
+        if args.snapshot:
+            with metrics.phase('fetch'), Snapshot(args.snapshot) as snapshot:
+                # Profile names may differ from the scenario names ("Jon" vs "Jon Best")
+                snapshot_elo = {NAME_RESOLVER.resolve(name).key or name: rating
+                                for name, rating in snapshot.ratings_by_name().items()}
+            snapshot_results = run_elo_simulation(snapshot_elo, "Snapshot", args.verbose, metrics, args.model)
+            print_final_table(snapshot_results, "Snapshot")
+        
+        # Run both scenarios
+        scenario1_results = run_elo_simulation(STARTING_ELO_1, "Starting ELO 1", args.verbose, metrics, args.model)
+        scenario2_results = run_elo_simulation(STARTING_ELO_2, "Starting ELO 2", args.verbose, metrics, args.model)
+    
+        # Print final tables
+        print_final_table(scenario1_results, "Starting ELO 1")
+        print_final_table(scenario2_results, "Starting ELO 2")
     
-    # Print final tables
-    print_final_table(scenario1_results, "Starting ELO 1")
-    print_final_table(scenario2_results, "Starting ELO 2")
+        # Compare scenarios
+        compare_scenarios(scenario1_results, scenario2_results)
     
-    # Compare scenarios
-    compare_scenarios(scenario1_results, scenario2_results)
+        print(f"\n=== KEY INSIGHTS ===")
+        print("• Starting ELO 1 has wider rating spreads (900-1400)")
+        print("• Starting ELO 2 has narrower rating spreads (1070-1200)")
+        print("• Both scenarios processed the same match results")
+        print("• Rating differences show impact of starting values on final rankings")
     
-    print(f"\n=== KEY INSIGHTS ===")
-    print("• Starting ELO 1 has wider rating spreads (900-1400)")
-    print("• Starting ELO 2 has narrower rating spreads (1070-1200)")
-    print("• Both scenarios processed the same match results")
-    print("• Rating differences show impact of starting values on final rankings")
\ No newline at end of file
+    report(metrics, args.metrics)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Binary snapshots of a season's ELO state
+Players, fixtures and elo_history in fixed-width columns that load with mmap in milliseconds
+
+File layout (little-endian):
+    header      magic b'ELOSNAP1', version u32, section count u32, metadata length u64
+    sections    per section: name 32s, typecode 1s, 7 pad bytes, offset u64, item count u64
+    metadata    UTF-8 JSON (season, player names, creation time)
+    data        each section's items, 8-byte aligned
+
+UUIDs are interned to int32 indices: every other section refers to players
+and fixtures by position. Numeric sections are plain C arrays, so
+memoryview.cast or numpy.frombuffer can read them without copying. The
+history columns mirror elo_history's integer (int4) and double precision
+columns; a NULL is stored as NULL_INT or NaN.
+"""
+
+import argparse
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+import uuid
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from elo_engine import FixtureBatch, RatingStore
+
+MAGIC = b'ELOSNAP1'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQ')
+SECTION = struct.Struct('<32sc7xQQ')
+# elo_history's rating columns are int4, so they fit 'i' exactly; INT_MIN stands in for NULL
+NULL_INT = -2 ** 31
+
+# Section name -> array typecode ('B' sections hold 16-byte UUIDs)
+SECTIONS = {
+    'player_uuid': 'B',
+    'season_player_uuid': 'B',
+    'start_rating': 'd',
+    'rating': 'd',
+    'fixture_uuid': 'B',
+    'fixture_players': 'i',   # 4 player indices per fixture
+    'fixture_scores': 'i',    # pair1, pair2 games per fixture
+    'fixture_created_us': 'q',
+    'fixture_week': 'i',      # -1 when unknown
+    'history_player': 'i',
+    'history_fixture': 'i',   # -1 when the fixture isn't in the snapshot
+    'history_old_rating': 'i',
+    'history_new_rating': 'i',
+    'history_rating_change': 'i',
+    'history_k_factor': 'i',
+    'history_opponent_avg': 'i',
+    'history_expected': 'd',
+    'history_actual': 'd',
+    'history_created_us': 'q',
+}
+
+SNAPSHOT_PLAYERS_SQL = """
+    SELECT sp.id, sp.player_id, p.name,
+           COALESCE(first_eh.old_rating, sp.elo_rating) AS starting_elo,
+           sp.elo_rating
+    FROM season_players sp
+    JOIN profiles p ON sp.player_id = p.id
+    LEFT JOIN LATERAL (
+        SELECT eh.old_rating
+        FROM elo_history eh
+        WHERE eh.season_player_id = sp.id
+        ORDER BY eh.created_at, eh.match_fixture_id
+        LIMIT 1
+    ) first_eh ON TRUE
+    WHERE sp.season_id = %s
+    ORDER BY p.name
+"""
+
+SNAPSHOT_HISTORY_SQL = """
+    SELECT eh.season_player_id, eh.match_fixture_id, eh.old_rating, eh.new_rating,
+           eh.rating_change, eh.k_factor, eh.opponent_avg_rating,
+           eh.expected_score, eh.actual_score, eh.created_at
+    FROM elo_history eh
+    JOIN season_players sp ON eh.season_player_id = sp.id
+    WHERE sp.season_id = %s
+    ORDER BY eh.created_at, eh.match_fixture_id, eh.season_player_id
+"""
+
+def to_micros(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return round(value.timestamp() * 1_000_000)
+    return int(value)
+
+def from_micros(micros: int) -> datetime:
+    return datetime.fromtimestamp(micros / 1_000_000, timezone.utc)
+
+def uuid_bytes(values: Iterable) -> array:
+    data = array('B')
+    for value in values:
+        data.frombytes(uuid.UUID(str(value)).bytes)
+    return data
+
+def write_snapshot(path: str, season: Dict, players: Sequence[Tuple], batch: FixtureBatch,
+                   history: Iterable[Tuple] = ()) -> int:
+    """
+    Write a snapshot file
+
+    players: (season_player_id, player_id, name, start_rating, rating) rows,
+    in the same order as the store the batch was built against.
+    history: elo_history rows as selected by SNAPSHOT_HISTORY_SQL. Rows for
+    season players missing from players (e.g. whose profile was deleted)
+    are left out; returns how many were.
+    """
+    if array('i').itemsize != 4:
+        raise RuntimeError("Snapshots store int32 columns; this platform's C int is not 32 bits")
+    season_player_index = {str(row[0]): i for i, row in enumerate(players)}
+    fixture_index = {str(fixture_id): i for i, fixture_id in enumerate(batch.fixture_ids)}
+
+    columns = {name: array(typecode) for name, typecode in SECTIONS.items()}
+    columns['player_uuid'] = uuid_bytes(row[1] for row in players)
+    columns['season_player_uuid'] = uuid_bytes(row[0] for row in players)
+    columns['start_rating'] = array('d', (float(row[3]) for row in players))
+    columns['rating'] = array('d', (float(row[4]) for row in players))
+    columns['fixture_uuid'] = uuid_bytes(batch.fixture_ids)
+    columns['fixture_players'] = array('i', batch.players)
+    columns['fixture_scores'] = array('i', batch.scores)
+    columns['fixture_created_us'] = array('q', (to_micros(value) for value in batch.created_at))
+    columns['fixture_week'] = array('i', (-1 if week is None else week for week in batch.weeks))
+
+    skipped = 0
+    for (season_player_id, fixture_id, old_rating, new_rating, rating_change, k_factor,
+         opponent_avg, expected, actual, created_at) in history:
+        player = season_player_index.get(str(season_player_id))
+        if player is None:
+            skipped += 1
+            continue
+        columns['history_player'].append(player)
+        columns['history_fixture'].append(fixture_index.get(str(fixture_id), -1))
+        columns['history_old_rating'].append(NULL_INT if old_rating is None else old_rating)
+        columns['history_new_rating'].append(NULL_INT if new_rating is None else new_rating)
+        columns['history_rating_change'].append(NULL_INT if rating_change is None else rating_change)
+        columns['history_k_factor'].append(NULL_INT if k_factor is None else k_factor)
+        columns['history_opponent_avg'].append(NULL_INT if opponent_avg is None else opponent_avg)
+        columns['history_expected'].append(math.nan if expected is None else float(expected))
+        columns['history_actual'].append(math.nan if actual is None else float(actual))
+        columns['history_created_us'].append(to_micros(created_at))
+
+    metadata = json.dumps({
+        'season': season,
+        'names': [row[2] for row in players],
+        'created_at': datetime.now(timezone.utc).isoformat(),
+    }).encode('utf-8')
+
+    if sys.byteorder != 'little':
+        for data in columns.values():
+            data.byteswap()
+
+    offset = HEADER.size + SECTION.size * len(columns) + len(metadata)
+    table = []
+    for name, data in columns.items():
+        offset += -offset % 8
+        table.append((name, data, offset))
+        offset += len(data) * data.itemsize
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(columns), len(metadata)))
+        for name, data, offset in table:
+            f.write(SECTION.pack(name.encode('ascii'), data.typecode.encode('ascii'), offset, len(data)))
+        f.write(metadata)
+        for name, data, offset in table:
+            f.write(b'\0' * (offset - f.tell()))
+            data.tofile(f)
+    os.replace(tmp_path, path)
+    return skipped
+
+class Snapshot:
+    """
+    A memory-mapped snapshot; columns are zero-copy memoryviews into the file
+
+    Use as a context manager, or call close(), before the file is replaced.
+    """
+
+    def __init__(self, path: str):
+        if sys.byteorder != 'little':
+            raise RuntimeError("Snapshots are little-endian; memory-mapping needs a little-endian host")
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, version, n_sections, metadata_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} ELO snapshot")
+
+        self.columns: Dict[str, memoryview] = {}
+        position = HEADER.size
+        for _ in range(n_sections):
+            name, typecode, offset, count = SECTION.unpack_from(self._mmap, position)
+            position += SECTION.size
+            typecode = typecode.decode('ascii')
+            size = count * array(typecode).itemsize
+            self.columns[name.rstrip(b'\0').decode('ascii')] = self._view[offset:offset + size].cast(typecode)
+        self.metadata = json.loads(bytes(self._view[position:position + metadata_len]))
+
+    def close(self):
+        # Views must be released before the mmap can close
+        for column in getattr(self, 'columns', {}).values():
+            column.release()
+        self.columns = {}
+        if getattr(self, '_view', None) is not None:
+            self._view.release()
+            self._view = None
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def season(self) -> Dict:
+        return self.metadata['season']
+
+    @property
+    def names(self) -> List[str]:
+        return self.metadata['names']
+
+    def uuids(self, column: str) -> List[str]:
+        data = self.columns[column]
+        return [str(uuid.UUID(bytes=bytes(data[i:i + 16]))) for i in range(0, len(data), 16)]
+
+    @property
+    def player_ids(self) -> List[str]:
+        return self.uuids('player_uuid')
+
+    @property
+    def season_player_ids(self) -> List[str]:
+        return self.uuids('season_player_uuid')
+
+    def store(self, ratings: str = 'start_rating') -> RatingStore:
+        """A RatingStore keyed by player UUID, from the starting or current ratings"""
+        store = RatingStore()
+        store.keys = self.player_ids
+        store.index = {key: i for i, key in enumerate(store.keys)}
+        store.ratings = array('d', self.columns[ratings])
+        return store
+
+    def batch(self) -> FixtureBatch:
+        """The season's fixtures, in replay order, indexed against store()"""
+        batch = FixtureBatch()
+        batch.players = array('i', self.columns['fixture_players'])
+        batch.scores = array('i', self.columns['fixture_scores'])
+        batch.fixture_ids = self.uuids('fixture_uuid')
+        batch.created_at = [from_micros(micros) for micros in self.columns['fixture_created_us']]
+        batch.weeks = [None if week < 0 else week for week in self.columns['fixture_week']]
+        return batch
+
+    def players_by_id(self, ratings: str = 'rating') -> Dict[str, Dict]:
+        """{player_id: {'name', 'elo', 'season_player_id'}}, as elo_calculator_helper uses"""
+        return {
+            player_id: {'name': name, 'elo': elo, 'season_player_id': season_player_id}
+            for player_id, name, elo, season_player_id
+            in zip(self.player_ids, self.names, self.columns[ratings], self.season_player_ids)
+        }
+
+    def ratings_by_name(self, ratings: str = 'start_rating') -> Dict[str, float]:
+        return dict(zip(self.names, self.columns[ratings]))
+
+def snapshot_from_db(cur, season_id: str, path: str) -> Dict[str, int]:
+    """Query one season and write its snapshot; returns item counts"""
+    cur.execute("SELECT id, name, COALESCE(elo_k_factor, 32) FROM seasons WHERE id = %s", (season_id,))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError(f"Season {season_id} not found")
+    season = {'id': str(row[0]), 'name': row[1], 'k_factor': row[2]}
+
+    # Imported here so reading snapshots never needs psycopg2
+    from elo_db import fetch_ordered_results
+
+    cur.execute(SNAPSHOT_PLAYERS_SQL, (season_id,))
+    players = cur.fetchall()
+    store = RatingStore()
+    for season_player_id, player_id, name, starting_elo, elo_rating in players:
+        store.intern(str(player_id), starting_elo)
+
+    batch = FixtureBatch.from_rows(store, fetch_ordered_results(cur, season_id))
+
+    cur.execute(SNAPSHOT_HISTORY_SQL, (season_id,))
+    history = cur.fetchall()
+
+    skipped = write_snapshot(path, season, players, batch, history)
+    return {'players': len(players), 'fixtures': len(batch), 'history': len(history) - skipped,
+            'history_skipped': skipped}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or inspect binary ELO snapshots")
+    commands = parser.add_subparsers(dest='command', required=True)
+    create = commands.add_parser('create', help="Snapshot a season from the database")
+    create.add_argument('--season-id', required=True)
+    create.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    create.add_argument('-o', '--output', required=True, help="Snapshot file to write")
+    show = commands.add_parser('show', help="Summarise a snapshot file")
+    show.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'create':
+        from elo_db import connection
+        with connection(args.dsn) as conn, conn.cursor() as cur:
+            counts = snapshot_from_db(cur, args.season_id, args.output)
+        print(f"✅ Wrote {args.output}: {counts['players']} players, {counts['fixtures']} fixtures, "
+              f"{counts['history']} history rows")
+        if counts['history_skipped']:
+            print(f"⚠️  Left out {counts['history_skipped']} history rows for season players no longer in the season")
+    else:
+        start = time.perf_counter()
+        with Snapshot(args.path) as snapshot:
+            loaded = time.perf_counter() - start
+            print(f"Season: {snapshot.season.get('name')} ({snapshot.season.get('id')})")
+            print(f"Players: {len(snapshot.names)}, fixtures: {len(snapshot.columns['fixture_scores']) // 2}, "
+                  f"history rows: {len(snapshot.columns['history_player'])}")
+            print(f"Opened in {loaded * 1000:.2f} ms")
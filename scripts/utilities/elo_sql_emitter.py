@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Bulk SQL emitter for elo_history backfills
+Streams rows to a file as batched multi-row INSERTs or a COPY data file for psql's \\copy, or runs the INSERTs with bound parameters
+"""
+
+import itertools
+import math
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Sequence, TextIO, Tuple
+
+from elo_history_writer import DEFAULT_BATCH_SIZE, ELO_HISTORY_COLUMNS, copy_line
+
+OUTPUT_FORMATS = ('insert', 'copy')
+
+# Quoted values are cast to their column type, so a malformed ID or
+# timestamp fails the statement instead of being stored as text
+ELO_HISTORY_TYPES = {
+    'season_player_id': 'uuid',
+    'match_fixture_id': 'uuid',
+    'created_at': 'timestamptz',
+}
+
+def sql_literal(value) -> str:
+    """Render a value as a standard-conforming SQL literal"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value) if math.isfinite(value) else f"'{value!r}'"
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    text = str(value)
+    if '\0' in text:
+        raise ValueError("SQL literals cannot contain NUL characters")
+    return "'" + text.replace("'", "''") + "'"
+
+def _batches(rows: Iterable[Sequence], batch_size: int) -> Iterator[List[Sequence]]:
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _insert_prefix(table: str, columns: Sequence[str]) -> str:
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES\n"
+
+def insert_statements(rows: Iterable[Sequence], table: str = 'elo_history',
+                      columns: Sequence[str] = ELO_HISTORY_COLUMNS,
+                      types: Dict[str, str] = ELO_HISTORY_TYPES,
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Tuple[str, List]]:
+    """
+    Yield (sql, params) per batch for cursor.execute: one multi-row INSERT with %s placeholders
+
+    The statement text only depends on the batch length, so the driver
+    sends values separately and nothing is quoted by hand.
+    """
+    placeholders = '(' + ', '.join(f"%s::{types[column]}" if column in types else '%s'
+                                   for column in columns) + ')'
+    prefix = _insert_prefix(table, columns)
+    for batch in _batches(rows, batch_size):
+        sql = prefix + ',\n'.join([placeholders] * len(batch))
+        yield sql, [value for row in batch for value in row]
+
+def execute_inserts(cur, rows: Iterable[Sequence], table: str = 'elo_history',
+                    columns: Sequence[str] = ELO_HISTORY_COLUMNS,
+                    types: Dict[str, str] = ELO_HISTORY_TYPES,
+                    batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Run insert_statements() on cur, leaving the transaction to the caller; returns rows written"""
+    written = 0
+    for sql, params in insert_statements(rows, table, columns, types, batch_size):
+        cur.execute(sql, params)
+        written += len(params) // len(columns)
+    return written
+
+def write_insert_file(out: TextIO, rows: Iterable[Sequence], table: str = 'elo_history',
+                      columns: Sequence[str] = ELO_HISTORY_COLUMNS,
+                      types: Dict[str, str] = ELO_HISTORY_TYPES,
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Stream rows to a SQL script: one transaction, one multi-row INSERT per batch
+
+    Values go through sql_literal and, where typed, a cast. Only one
+    batch is held in memory at a time. Returns the number of rows written.
+    """
+    casts = [f"::{types[column]}" if column in types else '' for column in columns]
+    prefix = _insert_prefix(table, columns)
+    written = 0
+    out.write("BEGIN;\n\n")
+    for batch in _batches(rows, batch_size):
+        out.write(prefix)
+        out.write(',\n'.join(
+            '(' + ', '.join(sql_literal(value) + cast for value, cast in zip(row, casts)) + ')'
+            for row in batch))
+        out.write(";\n\n")
+        written += len(batch)
+    out.write("COMMIT;\n")
+    return written
+
+def write_copy_file(out: TextIO, rows: Iterable[Sequence]) -> int:
+    """Stream rows in COPY text format; returns the number of rows written"""
+    written = 0
+    for row in rows:
+        out.write(copy_line(row))
+        written += 1
+    return written
+
+def copy_command(path: str, table: str = 'elo_history', columns: Sequence[str] = ELO_HISTORY_COLUMNS) -> str:
+    """The psql meta-command that loads a write_copy_file() output"""
+    return f"\\copy {table} ({', '.join(columns)}) FROM {sql_literal(path)}"
+
+def emit(path: str, rows: Iterable[Sequence], output_format: str = 'insert',
+         batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Write elo_history rows to path in the given format; returns the row count"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    with open(path, 'w', encoding='utf-8', newline='\n') as out:
+        if output_format == 'copy':
+            return write_copy_file(out, rows)
+        return write_insert_file(out, rows, batch_size=batch_size)
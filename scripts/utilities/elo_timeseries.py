@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Local rating-history time series for profile and trophy views
+Append-only columnar copy of elo_history with a (season player, time) index, refreshed incrementally
+
+Directory layout:
+    manifest.json   version, row count, season players, per-season generation and fingerprint
+    <column>.col    one little-endian C array per column, appended to on every refresh
+    index.col       row positions sorted by season player, then created_at, then fixture
+    offsets.col     where each season player's run starts in index.col (one extra end entry)
+
+Rows are never rewritten. When a season's history changes other than by
+new rows at the end (a full backdate, an edited result), its rows are
+appended again under a new generation and the old generation simply
+drops out of the index; compact() reclaims the space.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+import uuid
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from elo_snapshot import from_micros, to_micros
+
+VERSION = 1
+MANIFEST = 'manifest.json'
+
+# Column -> array typecode ('B' holds 16-byte fixture UUIDs)
+COLUMNS = {
+    'season_player': 'i',   # index into the manifest's season_players
+    'generation': 'i',
+    'created_us': 'q',
+    'old_rating': 'i',
+    'new_rating': 'i',
+    'rating_change': 'i',
+    'fixture_uuid': 'B',
+}
+UUID_SIZE = 16
+
+# Every season with history: row count, latest row and a fingerprint of its content
+SEASON_SUMMARY_SQL = """
+    SELECT sp.season_id, COUNT(*), MAX(eh.created_at),
+           md5(string_agg(eh.season_player_id::text || eh.match_fixture_id::text || eh.new_rating::text, ','
+                          ORDER BY eh.created_at, eh.match_fixture_id, eh.season_player_id))
+    FROM elo_history eh
+    JOIN season_players sp ON eh.season_player_id = sp.id
+    GROUP BY sp.season_id
+"""
+
+# The same fingerprint over a season's rows up to a point: if it still
+# matches what was loaded, everything since then is a pure append
+SEASON_PREFIX_SQL = """
+    SELECT COUNT(*),
+           md5(string_agg(eh.season_player_id::text || eh.match_fixture_id::text || eh.new_rating::text, ','
+                          ORDER BY eh.created_at, eh.match_fixture_id, eh.season_player_id))
+    FROM elo_history eh
+    JOIN season_players sp ON eh.season_player_id = sp.id
+    WHERE sp.season_id = %s AND eh.created_at <= %s
+"""
+
+SEASON_ROWS_SQL = """
+    SELECT eh.season_player_id, sp.player_id, eh.match_fixture_id, eh.created_at,
+           eh.old_rating, eh.new_rating, eh.rating_change
+    FROM elo_history eh
+    JOIN season_players sp ON eh.season_player_id = sp.id
+    WHERE sp.season_id = %s AND (%s::timestamptz IS NULL OR eh.created_at > %s)
+    ORDER BY eh.created_at, eh.match_fixture_id, eh.season_player_id
+"""
+
+def _empty_manifest() -> Dict:
+    return {'version': VERSION, 'rows': 0, 'season_players': [], 'seasons': {}}
+
+def load_manifest(path: str) -> Dict:
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return _empty_manifest()
+    if manifest.get('version') != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} rating time-series store")
+    return manifest
+
+def _write_manifest(path: str, manifest: Dict):
+    tmp_path = os.path.join(path, f"{MANIFEST}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(path, MANIFEST))
+
+def _row_width(column: str) -> int:
+    return array(COLUMNS[column]).itemsize * (UUID_SIZE if column == 'fixture_uuid' else 1)
+
+def _read_column(path: str, column: str, rows: int) -> array:
+    data = array(COLUMNS[column])
+    count = rows * (UUID_SIZE if column == 'fixture_uuid' else 1)
+    if count:
+        with open(os.path.join(path, f"{column}.col"), 'rb') as f:
+            data.fromfile(f, count)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+def _append_columns(path: str, rows: int, columns: Dict[str, array]):
+    """Append to every column file, first cutting off anything past the manifest's row count"""
+    for column, data in columns.items():
+        file_path = os.path.join(path, f"{column}.col")
+        with open(file_path, 'ab') as f:
+            # A refresh that died before its manifest was written leaves a tail nobody indexed
+            f.truncate(rows * _row_width(column))
+            if sys.byteorder != 'little':
+                data = array(data.typecode, data)
+                data.byteswap()
+            data.tofile(f)
+
+def _write_array(path: str, name: str, data: array):
+    if sys.byteorder != 'little':
+        data = array(data.typecode, data)
+        data.byteswap()
+    tmp_path = os.path.join(path, f"{name}.col.tmp")
+    with open(tmp_path, 'wb') as f:
+        data.tofile(f)
+    os.replace(tmp_path, os.path.join(path, f"{name}.col"))
+
+def build_index(path: str, manifest: Dict):
+    """Sort the live rows (current generation of each season) by season player, time and fixture"""
+    rows = manifest['rows']
+    season_player = _read_column(path, 'season_player', rows)
+    generation = _read_column(path, 'generation', rows)
+    created = _read_column(path, 'created_us', rows)
+    fixtures = _read_column(path, 'fixture_uuid', rows)
+
+    live = [manifest['seasons'][season_id]['generation'] for _, _, season_id in manifest['season_players']]
+    positions = [i for i in range(rows) if generation[i] == live[season_player[i]]]
+    positions.sort(key=lambda i: (season_player[i], created[i], fixtures[UUID_SIZE * i:UUID_SIZE * (i + 1)]))
+
+    offsets = array('i', [0] * (len(manifest['season_players']) + 1))
+    for i in positions:
+        offsets[season_player[i] + 1] += 1
+    for p in range(1, len(offsets)):
+        offsets[p] += offsets[p - 1]
+
+    _write_array(path, 'index', array('i', positions))
+    _write_array(path, 'offsets', offsets)
+
+def refresh(path: str, cur) -> Dict[str, int]:
+    """
+    Bring the store up to date with elo_history
+
+    Seasons whose fingerprint is unchanged are skipped. If a season's rows
+    up to the last load still fingerprint the same, only newer rows are
+    fetched and appended; otherwise the whole season is appended again as
+    a new generation. Returns counts of seasons skipped, appended and
+    reloaded, and rows added.
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest = load_manifest(path)
+    season_players = manifest['season_players']
+    sp_index = {sp_id: i for i, (sp_id, _, _) in enumerate(season_players)}
+    columns = {column: array(typecode) for column, typecode in COLUMNS.items()}
+    counts = {'skipped': 0, 'appended': 0, 'reloaded': 0, 'removed': 0, 'rows': 0}
+
+    cur.execute(SEASON_SUMMARY_SQL)
+    summary = {str(season_id): (count, latest, fingerprint) for season_id, count, latest, fingerprint in cur.fetchall()}
+
+    for season_id, (count, latest, fingerprint) in summary.items():
+        stored = manifest['seasons'].get(season_id)
+        if stored is not None and stored['fingerprint'] == fingerprint:
+            counts['skipped'] += 1
+            continue
+
+        since = None
+        if stored is not None:
+            cur.execute(SEASON_PREFIX_SQL, (season_id, from_micros(stored['latest_us'])))
+            prefix_count, prefix_fingerprint = cur.fetchone()
+            if prefix_count == stored['count'] and prefix_fingerprint == stored['fingerprint']:
+                since = from_micros(stored['latest_us'])
+        if since is None:
+            generation = stored['generation'] + 1 if stored is not None else 0
+            counts['reloaded' if stored is not None else 'appended'] += 1
+        else:
+            generation = stored['generation']
+            counts['appended'] += 1
+
+        cur.execute(SEASON_ROWS_SQL, (season_id, since, since))
+        for season_player_id, player_id, fixture_id, created_at, old_rating, new_rating, rating_change in cur.fetchall():
+            season_player_id = str(season_player_id)
+            p = sp_index.get(season_player_id)
+            if p is None:
+                p = sp_index[season_player_id] = len(season_players)
+                season_players.append([season_player_id, str(player_id), season_id])
+            columns['season_player'].append(p)
+            columns['generation'].append(generation)
+            columns['created_us'].append(to_micros(created_at))
+            columns['old_rating'].append(old_rating)
+            columns['new_rating'].append(new_rating)
+            columns['rating_change'].append(rating_change)
+            columns['fixture_uuid'].frombytes(uuid.UUID(str(fixture_id)).bytes)
+
+        manifest['seasons'][season_id] = {'generation': generation, 'count': count,
+                                          'latest_us': to_micros(latest), 'fingerprint': fingerprint}
+
+    # Seasons whose history was deleted outright drop out of the index
+    for season_id, stored in manifest['seasons'].items():
+        if season_id not in summary and stored['count']:
+            manifest['seasons'][season_id] = {'generation': stored['generation'] + 1, 'count': 0,
+                                              'latest_us': 0, 'fingerprint': None}
+            counts['removed'] += 1
+
+    added = len(columns['season_player'])
+    if added:
+        _append_columns(path, manifest['rows'], columns)
+        manifest['rows'] += added
+    counts['rows'] = added
+    if added or counts['reloaded'] or counts['removed'] or not os.path.exists(os.path.join(path, 'index.col')):
+        build_index(path, manifest)
+    _write_manifest(path, manifest)
+    return counts
+
+def compact(path: str) -> Tuple[int, int]:
+    """Rewrite the store with only live rows, in index order; returns (rows before, rows after)"""
+    manifest = load_manifest(path)
+    before = manifest['rows']
+    with RatingSeries(path) as series:
+        positions = list(series.index)
+    columns = {column: _read_column(path, column, before) for column in COLUMNS}
+    for column, data in columns.items():
+        if column == 'fixture_uuid':
+            kept = array('B')
+            for i in positions:
+                kept.extend(data[UUID_SIZE * i:UUID_SIZE * (i + 1)])
+        else:
+            kept = array(data.typecode, (data[i] for i in positions))
+        _write_array(path, column, kept)
+    manifest['rows'] = len(positions)
+    build_index(path, manifest)
+    _write_manifest(path, manifest)
+    return before, len(positions)
+
+class RatingSeries:
+    """
+    Read side of the store: memory-mapped columns and per-season-player range queries
+
+    Dates may be datetimes or epoch microseconds. Queries binary-search one
+    season player's run of the index, so they cost O(log n) plus the rows
+    in range. Use as a context manager, or call close().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.manifest = load_manifest(path)
+        self.season_players = self.manifest['season_players']
+        self._sp_index = {sp_id: i for i, (sp_id, _, _) in enumerate(self.season_players)}
+        self._maps = []
+        rows = self.manifest['rows']
+        self.columns = {column: self._map(column, rows * (UUID_SIZE if column == 'fixture_uuid' else 1))
+                        for column in COLUMNS}
+        self.index = self._map('index', None)
+        self.offsets = self._map('offsets', None)
+
+    def _map(self, name: str, count: Optional[int]) -> memoryview:
+        typecode = COLUMNS.get(name, 'i')
+        file_path = os.path.join(self.path, f"{name}.col")
+        size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        if count is not None:
+            size = count * array(typecode).itemsize
+        if size == 0:
+            return memoryview(array(typecode))
+        with open(file_path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(data)
+        return memoryview(data)[:size].cast(typecode)
+
+    def close(self):
+        # Views must be released before the maps can close
+        for view in [*self.columns.values(), self.index, self.offsets]:
+            view.release()
+        self.columns = {}
+        for data in self._maps:
+            data.close()
+        self._maps = []
+
+    def __enter__(self) -> 'RatingSeries':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def season_player_ids(self, player_id: str) -> List[str]:
+        """A player's season_player IDs, one per season they have history in"""
+        return [sp_id for sp_id, pid, _ in self.season_players if pid == player_id]
+
+    def _span(self, season_player_id: str, start=None, end=None) -> Tuple[int, int]:
+        """Index positions [lo, hi) of one season player's rows with start < created_at <= end"""
+        p = self._sp_index.get(season_player_id)
+        if p is None or p + 1 >= len(self.offsets):
+            return 0, 0
+        lo, hi = self.offsets[p], self.offsets[p + 1]
+        created, index = self.columns['created_us'], self.index
+        key = lambda position: created[position]
+        if start is not None:
+            lo = bisect_right(index, to_micros(start), lo, hi, key=key)
+        if end is not None:
+            hi = bisect_right(index, to_micros(end), lo, hi, key=key)
+        return lo, hi
+
+    def history(self, season_player_id: str, start=None, end=None) -> List[Tuple]:
+        """(created_at, old_rating, new_rating, rating_change, fixture_id) rows in time order"""
+        lo, hi = self._span(season_player_id, start, end)
+        c = self.columns
+        fixtures = c['fixture_uuid']
+        return [(from_micros(c['created_us'][i]), c['old_rating'][i], c['new_rating'][i], c['rating_change'][i],
+                 str(uuid.UUID(bytes=bytes(fixtures[UUID_SIZE * i:UUID_SIZE * (i + 1)]))))
+                for i in self.index[lo:hi]]
+
+    def rating_at(self, season_player_id: str, when) -> Optional[int]:
+        """Rating after the last result at or before when; the starting rating before any; None if no history"""
+        lo, hi = self._span(season_player_id)
+        if lo == hi:
+            return None
+        position = self._span(season_player_id, end=when)[1]
+        if position == lo:
+            return self.columns['old_rating'][self.index[lo]]
+        return self.columns['new_rating'][self.index[position - 1]]
+
+    def _extreme(self, season_player_id: str, start, end, best) -> Optional[Dict]:
+        lo, hi = self._span(season_player_id, start, end)
+        if lo == hi:
+            return None
+        positions = self.index[lo:hi]
+        new_rating = self.columns['new_rating']
+        i = best(positions, key=lambda position: new_rating[position])
+        # The rating held before the first result in range counts too
+        first = positions[0]
+        before = self.columns['old_rating'][first]
+        if best((before, new_rating[i])) == before and before != new_rating[i]:
+            return {'rating': before, 'at': from_micros(self.columns['created_us'][first]), 'before_result': True}
+        return {'rating': new_rating[i], 'at': from_micros(self.columns['created_us'][i]), 'before_result': False}
+
+    def peak(self, season_player_id: str, start=None, end=None) -> Optional[Dict]:
+        """Highest rating held in (start, end]: {'rating', 'at', 'before_result'}"""
+        return self._extreme(season_player_id, start, end, max)
+
+    def low(self, season_player_id: str, start=None, end=None) -> Optional[Dict]:
+        """Lowest rating held in (start, end], as for peak"""
+        return self._extreme(season_player_id, start, end, min)
+
+    def streaks(self, season_player_id: str, start=None, end=None) -> Dict[str, int]:
+        """
+        Longest runs of rating gains and losses in (start, end], and the run at the end
+
+        current is positive for a run of gains and negative for losses; a
+        result with no rating change ends both.
+        """
+        lo, hi = self._span(season_player_id, start, end)
+        change = self.columns['rating_change']
+        longest_win = longest_loss = run = 0
+        for position in self.index[lo:hi]:
+            delta = change[position]
+            if delta > 0:
+                run = run + 1 if run > 0 else 1
+                longest_win = max(longest_win, run)
+            elif delta < 0:
+                run = run - 1 if run < 0 else -1
+                longest_loss = max(longest_loss, -run)
+            else:
+                run = 0
+        return {'longest_win': longest_win, 'longest_loss': longest_loss, 'current': run}
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain and query a local rating-history time-series store")
+    parser.add_argument('--dir', default='elo_timeseries', help="Store directory (default ./elo_timeseries)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    refresh_cmd = commands.add_parser('refresh', help="Pull new or changed elo_history rows")
+    refresh_cmd.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    commands.add_parser('compact', help="Drop rows from superseded generations")
+    query = commands.add_parser('query', help="Range queries for one player")
+    who = query.add_mutually_exclusive_group(required=True)
+    who.add_argument('--season-player', help="season_players.id")
+    who.add_argument('--player', help="profiles.id; queries each of their seasons")
+    query.add_argument('--at', type=datetime.fromisoformat, help="Also show the rating at this date/time")
+    query.add_argument('--since', type=datetime.fromisoformat)
+    query.add_argument('--until', type=datetime.fromisoformat)
+    args = parser.parse_args(argv)
+
+    if args.command == 'refresh':
+        from elo_db import connection
+        start = time.perf_counter()
+        with connection(args.dsn) as conn, conn.cursor() as cur:
+            counts = refresh(args.dir, cur)
+        print(f"✅ {counts['rows']} rows added: {counts['appended']} seasons appended, "
+              f"{counts['reloaded']} reloaded, {counts['removed']} removed, {counts['skipped']} unchanged "
+              f"({time.perf_counter() - start:.2f}s)")
+    elif args.command == 'compact':
+        before, after = compact(args.dir)
+        print(f"✅ Compacted {before} rows to {after}")
+    else:
+        with RatingSeries(args.dir) as series:
+            season_players = [args.season_player] if args.season_player else series.season_player_ids(args.player)
+            for sp_id in season_players:
+                start = time.perf_counter()
+                peak = series.peak(sp_id, args.since, args.until)
+                low = series.low(sp_id, args.since, args.until)
+                streaks = series.streaks(sp_id, args.since, args.until)
+                at = series.rating_at(sp_id, args.at) if args.at else None
+                elapsed = time.perf_counter() - start
+                if peak is None:
+                    print(f"{sp_id}: no history in range")
+                    continue
+                print(f"{sp_id}: peak {peak['rating']} ({peak['at']:%Y-%m-%d}), low {low['rating']} ({low['at']:%Y-%m-%d}), "
+                      f"longest win streak {streaks['longest_win']}, loss streak {streaks['longest_loss']}, "
+                      f"current {streaks['current']:+d}")
+                if args.at:
+                    print(f"  rating at {args.at}: {at}")
+                print(f"  ({elapsed * 1000:.3f} ms)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+ELO rating-model grid search
+Sweeps K-factor, draw handling and score normalisation, scoring each setting by predictive log-loss
+"""
+
+import argparse
+import csv
+import itertools
+import math
+import os
+import pickle
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from elo_engine import DEFAULT_K_FACTOR, FixtureBatch, RatingStore, actual_scores
+
+DEFAULT_K_FACTORS = (8, 16, 24, 32, 40, 48, 64)
+DRAW_RULES = ('score', 'skip')
+NORMALISATION_RULES = ('proportion', 'win-loss', 'smoothed')
+
+# Predictions of exactly 0 or 1 would make the log-loss infinite
+LOG_LOSS_EPSILON = 1e-15
+
+def normalise_scores(rule: str, pair1_score: int, pair2_score: int) -> Tuple[float, float]:
+    """Turn a games score into the actual scores used for the rating update"""
+    if rule == 'proportion':
+        # Production rule: pair1_score / total_games, 0-0 counts as 0.5
+        return actual_scores(pair1_score, pair2_score)
+    if rule == 'win-loss':
+        if pair1_score == pair2_score:
+            return 0.5, 0.5
+        return (1.0, 0.0) if pair1_score > pair2_score else (0.0, 1.0)
+    if rule == 'smoothed':
+        # Laplace-smoothed proportion: pulls lopsided scores like 8-0 away from 1.0
+        total_games = pair1_score + pair2_score + 2
+        return (pair1_score + 1) / total_games, (pair2_score + 1) / total_games
+    raise ValueError(f"Unknown normalisation rule: {rule}")
+
+class SeasonArrays:
+    """
+    One season's fixtures, preprocessed once and shared by every grid point
+
+    target holds the stored actual_score (pair1 share of games) each
+    prediction is scored against; updates holds the per-rule pair1/pair2
+    actual scores used to move ratings; draws flags level scores.
+    """
+
+    def __init__(self, name: str, start_ratings: array, batch: FixtureBatch):
+        self.name = name
+        self.start_ratings = start_ratings
+        self.players = batch.players
+        self.target = array('d')
+        self.draws = array('b')
+        self.updates: Dict[str, array] = {rule: array('d') for rule in NORMALISATION_RULES}
+
+        scores = batch.scores
+        for f in range(len(batch)):
+            pair1_score, pair2_score = scores[2 * f], scores[2 * f + 1]
+            self.target.append(actual_scores(pair1_score, pair2_score)[0])
+            self.draws.append(pair1_score == pair2_score)
+            for rule in NORMALISATION_RULES:
+                self.updates[rule].extend(normalise_scores(rule, pair1_score, pair2_score))
+
+    def __len__(self) -> int:
+        return len(self.target)
+
+def evaluate(seasons: Sequence[SeasonArrays], k_factor: float, draw_rule: str, normalisation: str) -> Dict:
+    """
+    Replay every season under one setting and score each pre-match prediction
+
+    The expected score is computed before the fixture's own result is
+    applied, so it is a genuine prediction of that fixture.
+    """
+    pow_ = math.pow
+    log = math.log
+    total_loss = 0.0
+    total_sq = 0.0
+    n_predictions = 0
+    skip_draws = draw_rule == 'skip'
+
+    for season in seasons:
+        ratings = list(season.start_ratings)
+        players = iter(season.players)
+        updates = iter(season.updates[normalisation])
+        for a, b, c, d, pair1_update, pair2_update, target, draw in zip(
+                players, players, players, players, updates, updates, season.target, season.draws):
+            pair1_expected = 1.0 / (1.0 + pow_(10, ((ratings[c] + ratings[d]) / 2 - (ratings[a] + ratings[b]) / 2) / 400))
+            p = min(max(pair1_expected, LOG_LOSS_EPSILON), 1.0 - LOG_LOSS_EPSILON)
+            total_loss -= target * log(p) + (1.0 - target) * log(1.0 - p)
+            total_sq += (pair1_expected - target) ** 2
+            n_predictions += 1
+
+            if draw and skip_draws:
+                continue
+            pair1_change = k_factor * (pair1_update - pair1_expected)
+            pair2_change = k_factor * (pair2_update - (1.0 - pair1_expected))
+            ratings[a] += pair1_change
+            ratings[b] += pair1_change
+            ratings[c] += pair2_change
+            ratings[d] += pair2_change
+
+    return {
+        'k_factor': k_factor,
+        'draw_rule': draw_rule,
+        'normalisation': normalisation,
+        'log_loss': total_loss / n_predictions if n_predictions else float('nan'),
+        'brier': total_sq / n_predictions if n_predictions else float('nan'),
+        'predictions': n_predictions,
+    }
+
+# Worker processes receive the preprocessed seasons once, via the pool
+# initializer, and keep them for every grid point they evaluate
+_worker_seasons: List[SeasonArrays] = []
+
+def _init_worker(seasons: List[SeasonArrays]):
+    global _worker_seasons
+    _worker_seasons = seasons
+
+def _evaluate_point(point: Tuple[float, str, str]) -> Dict:
+    return evaluate(_worker_seasons, *point)
+
+def load_sample_batches() -> List[Tuple[str, RatingStore, FixtureBatch, int]]:
+    """The Winter 25 MATCH_RESULTS literal, starting from STARTING_ELO_2, as (name, store, batch, k_factor)"""
+    from elo_simulation import MATCH_RESULTS, STARTING_ELO_2, normalize_name
+
+    store = RatingStore.from_dict(STARTING_ELO_2)
+    batch = FixtureBatch.from_matches(store, MATCH_RESULTS, resolve=normalize_name)
+    return [('Winter 25 (sample)', store, batch, DEFAULT_K_FACTOR)]
+
+def load_db_batches(dsn: Optional[str], season_ids: Optional[Sequence[str]] = None) -> List[Tuple[str, RatingStore, FixtureBatch, int]]:
+    """Every ELO-enabled season, with starting ratings as the backdater derives them, as (name, store, batch, k_factor)"""
+    from elo_db import connection
+    from elo_model import load_season_model
+    from replay_all_seasons import discover_seasons
+
+    seasons = []
+    with connection(dsn) as conn, conn.cursor() as cur:
+        for season in discover_seasons(dsn, season_ids):
+            model = load_season_model(cur, season['id'])
+            seasons.append((season['name'], model.store, model.batch, season['k_factor']))
+    return seasons
+
+def load_sample_seasons() -> List[SeasonArrays]:
+    return [SeasonArrays(name, array('d', store.ratings), batch) for name, store, batch, _ in load_sample_batches()]
+
+def load_db_seasons(dsn: Optional[str], season_ids: Optional[Sequence[str]] = None) -> List[SeasonArrays]:
+    return [SeasonArrays(name, array('d', store.ratings), batch) for name, store, batch, _ in load_db_batches(dsn, season_ids)]
+
+def load_seasons(source: str, dsn: Optional[str], cache: Optional[str], refresh: bool) -> List[SeasonArrays]:
+    """Load preprocessed seasons, reusing the on-disk cache when it was built from the same source"""
+    # With no --dsn the connection comes from the environment, so that is what the cache is keyed on
+    origin = {'source': source, 'dsn': (dsn or os.environ.get('DATABASE_URL')) if source == 'db' else None}
+    if cache and os.path.exists(cache) and not refresh:
+        with open(cache, 'rb') as f:
+            cached = pickle.load(f)
+        # Caches from before the origin was recorded are plain lists and are rebuilt
+        if isinstance(cached, dict) and cached.get('origin') == origin:
+            return cached['seasons']
+
+    seasons = load_sample_seasons() if source == 'sample' else load_db_seasons(dsn)
+    if cache:
+        with open(cache, 'wb') as f:
+            pickle.dump({'origin': origin, 'seasons': seasons}, f)
+    return seasons
+
+def grid_search(seasons: List[SeasonArrays], k_factors: Sequence[float], draw_rules: Sequence[str],
+                normalisations: Sequence[str], workers: int = 1) -> List[Dict]:
+    """Evaluate every combination, best (lowest log-loss) first"""
+    grid = list(itertools.product(k_factors, draw_rules, normalisations))
+    if workers <= 1:
+        results = [evaluate(seasons, *point) for point in grid]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(seasons,)) as pool:
+            results = list(pool.map(_evaluate_point, grid, chunksize=max(1, len(grid) // (4 * workers))))
+    return sorted(results, key=lambda row: row['log_loss'])
+
+def _csv_list(cast):
+    return lambda value: [cast(item) for item in value.split(',') if item]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid-search ELO K-factor and scoring rules by predictive log-loss")
+    parser.add_argument('--source', choices=('db', 'sample'), default='db',
+                        help="Replay every ELO-enabled season from the database, or the MATCH_RESULTS sample")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--k-factors', type=_csv_list(float), default=list(DEFAULT_K_FACTORS),
+                        help="Comma-separated K-factors to try")
+    parser.add_argument('--draw-rules', type=_csv_list(str), default=list(DRAW_RULES),
+                        help=f"Comma-separated draw rules ({', '.join(DRAW_RULES)})")
+    parser.add_argument('--normalisations', type=_csv_list(str), default=list(NORMALISATION_RULES),
+                        help=f"Comma-separated score normalisation rules ({', '.join(NORMALISATION_RULES)})")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument('--cache', help="Pickle file for preprocessed fixtures, reused across runs")
+    parser.add_argument('--refresh', action='store_true', help="Rebuild the fixture cache")
+    parser.add_argument('--output', default='elo_tuning_results.csv', help="Results table (CSV)")
+    args = parser.parse_args()
+
+    for rule in args.draw_rules:
+        if rule not in DRAW_RULES:
+            parser.error(f"Unknown draw rule: {rule}")
+    for rule in args.normalisations:
+        if rule not in NORMALISATION_RULES:
+            parser.error(f"Unknown normalisation rule: {rule}")
+
+    start = time.perf_counter()
+    seasons = load_seasons(args.source, args.dsn, args.cache, args.refresh)
+    n_fixtures = sum(len(season) for season in seasons)
+    print(f"Loaded {len(seasons)} seasons, {n_fixtures} fixtures in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    results = grid_search(seasons, args.k_factors, args.draw_rules, args.normalisations, args.workers)
+    print(f"Evaluated {len(results)} settings in {time.perf_counter() - start:.2f}s")
+
+    print(f"\n{'K':>5} {'Draws':<6} {'Normalisation':<14} {'Log-loss':>9} {'Brier':>8}")
+    print("-" * 46)
+    for row in results[:10]:
+        print(f"{row['k_factor']:>5g} {row['draw_rule']:<6} {row['normalisation']:<14} "
+              f"{row['log_loss']:>9.5f} {row['brier']:>8.5f}")
+
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"\n📄 Full results written to {args.output}")
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Verify stored ELO history against fresh replays
+Recomputes every season under the Python float rules and the app's rounded-integer rules, in parallel, and reports where elo_history drifts
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from elo_db import connection, fetch_seasons
+from elo_engine import DEFAULT_K_FACTOR, FixtureBatch, RatingStore, calculate_expected_score, replay_season
+from elo_metrics import Metrics, add_arguments, report
+from elo_model import SeasonModel, load_season_model
+
+# float: the backdate scripts keep float ratings and write int() truncations
+# rounded: eloCalculator.js keeps integer ratings and Math.round()s each pair's change
+RULES = ('float', 'rounded')
+# The app clamps ratings after every update
+MIN_RATING, MAX_RATING = 500, 3000
+STREAM_CHUNK_SIZE = 5000
+
+# Same order as the replay: history rows carry their result's created_at
+STORED_HISTORY_SQL = """
+    SELECT eh.season_player_id, eh.match_fixture_id, eh.old_rating, eh.new_rating, eh.rating_change
+    FROM elo_history eh
+    JOIN season_players sp ON eh.season_player_id = sp.id
+    WHERE sp.season_id = %s
+    ORDER BY eh.season_player_id, eh.created_at, eh.match_fixture_id
+"""
+
+FINAL_RATINGS_SQL = "SELECT id, elo_rating FROM season_players WHERE season_id = %s"
+
+def js_round(value: float) -> int:
+    """Math.round: halves go up, including negative ones (-2.5 -> -2)"""
+    return math.floor(value + 0.5)
+
+def float_rows(store: RatingStore, batch: FixtureBatch, k_factor: int) -> Tuple[List[Tuple[int, int, int]], List[int]]:
+    """(old, new, change) per batch slot and final ratings, truncated as the history writer does"""
+    result = replay_season(store, batch, k_factor)
+    rows = [(int(old), int(new), int(delta))
+            for old, new, delta in zip(result.old_ratings, result.new_ratings, result.deltas)]
+    return rows, [int(rating) for rating in store.ratings]
+
+def rounded_rows(store: RatingStore, batch: FixtureBatch, k_factor: int) -> Tuple[List[Tuple[int, int, int]], List[int]]:
+    """
+    (old, new, change) per batch slot and final ratings under calculateTeamEloChange
+
+    Ratings stay integers: each pair's change is rounded on its own (so the
+    two changes need not cancel) and new ratings are clamped to 500-3000.
+    A 0-0 result scores 0.5 each, as in the Python replays.
+    """
+    ratings = [int(rating) for rating in store.ratings]
+    players = batch.players
+    scores = batch.scores
+    rows = []
+    for f in range(len(batch)):
+        p = 4 * f
+        pair1_avg = (ratings[players[p]] + ratings[players[p + 1]]) / 2
+        pair2_avg = (ratings[players[p + 2]] + ratings[players[p + 3]]) / 2
+        pair1_score, pair2_score = scores[2 * f], scores[2 * f + 1]
+        total_games = pair1_score + pair2_score
+        pair1_actual = pair1_score / total_games if total_games else 0.5
+        pair2_actual = pair2_score / total_games if total_games else 0.5
+        pair1_change = js_round(k_factor * (pair1_actual - calculate_expected_score(pair1_avg, pair2_avg)))
+        pair2_change = js_round(k_factor * (pair2_actual - calculate_expected_score(pair2_avg, pair1_avg)))
+        # Every player's update uses the ratings from before the fixture
+        for slot in range(p, p + 4):
+            idx = players[slot]
+            change = pair1_change if slot < p + 2 else pair2_change
+            old_rating = ratings[idx]
+            new_rating = max(MIN_RATING, min(MAX_RATING, old_rating + change))
+            rows.append((old_rating, new_rating, change))
+        for slot in range(p, p + 4):
+            ratings[players[slot]] = rows[slot][1]
+    return rows, ratings
+
+RULE_REPLAYS = {'float': float_rows, 'rounded': rounded_rows}
+
+def expected_series(model: SeasonModel, rows: Sequence[Tuple[int, int, int]]) -> Dict[str, List[Tuple]]:
+    """Recomputed history per season player: [(fixture_id, old, new, change), ...] in replay order"""
+    fixture_ids = model.batch.fixture_ids
+    offsets, slots = model.player_offsets, model.player_slots
+    return {sp_id: [(fixture_ids[slot // 4], *rows[slot]) for slot in slots[offsets[idx]:offsets[idx + 1]]]
+            for idx, sp_id in enumerate(model.season_player_ids)}
+
+def divergence(position: int, kind: str, stored: Optional[Tuple], expected: Optional[Tuple]) -> Dict:
+    return {
+        'position': position,
+        'kind': kind,
+        'fixture_id': str((stored or expected)[0]),
+        'stored': list(stored[1:]) if stored else None,
+        'expected': list(expected[1:]) if expected else None,
+    }
+
+def compare_stream(rows, expected: Dict[str, Dict[str, List[Tuple]]]) -> Tuple[int, Dict[str, Dict[str, Dict]]]:
+    """
+    Walk stored history rows (ordered by season player, then replay order) against each rule
+
+    Returns the number of rows read and, per rule, the first divergence of
+    every season player that has one: 'value' when old/new/change differ,
+    'fixture' when the rows are for different fixtures, 'extra' for stored
+    rows past the end of the replay and 'missing' for replayed fixtures
+    with no stored row.
+    """
+    first: Dict[str, Dict[str, Dict]] = {rule: {} for rule in expected}
+    positions: Dict[str, int] = {}
+    count = 0
+    for season_player_id, fixture_id, old_rating, new_rating, rating_change in rows:
+        count += 1
+        season_player_id = str(season_player_id)
+        stored = (str(fixture_id), old_rating, new_rating, rating_change)
+        position = positions.get(season_player_id, 0)
+        positions[season_player_id] = position + 1
+        for rule, series in expected.items():
+            if season_player_id in first[rule]:
+                continue
+            player_series = series.get(season_player_id, ())
+            if position >= len(player_series):
+                first[rule][season_player_id] = divergence(position, 'extra', stored, None)
+                continue
+            recomputed = player_series[position]
+            if recomputed[0] != stored[0]:
+                first[rule][season_player_id] = divergence(position, 'fixture', stored, recomputed)
+            elif recomputed[1:] != stored[1:]:
+                first[rule][season_player_id] = divergence(position, 'value', stored, recomputed)
+
+    for rule, series in expected.items():
+        for season_player_id, player_series in series.items():
+            position = positions.get(season_player_id, 0)
+            if season_player_id not in first[rule] and position < len(player_series):
+                first[rule][season_player_id] = divergence(position, 'missing', None, player_series[position])
+    return count, first
+
+def verify_season(cur, season_id: str, k_factor: int = DEFAULT_K_FACTOR, rules: Sequence[str] = RULES,
+                  chunk_size: int = STREAM_CHUNK_SIZE, metrics: Optional[Metrics] = None) -> Dict:
+    """
+    Replay one season under each rule and diff it against elo_history and season_players
+
+    Stored history is streamed through a server-side cursor, so only the
+    recomputed series are held in memory. Starting ratings are the ones the
+    backdates use (first elo_history old_rating, else season_players).
+    Nothing is written.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    with metrics.phase('fetch'):
+        model = load_season_model(cur, season_id)
+        cur.execute(FINAL_RATINGS_SQL, (season_id,))
+        stored_final = {str(sp_id): rating for sp_id, rating in cur.fetchall()}
+
+    with metrics.phase('compute'):
+        store, batch = model.store, model.batch
+        for fixture_id, reason in batch.skipped:
+            metrics.skip(fixture_id, reason)
+
+        expected, final = {}, {}
+        for rule in rules:
+            rows, ratings = RULE_REPLAYS[rule](store.copy(), batch, k_factor)
+            expected[rule] = expected_series(model, rows)
+            final[rule] = dict(zip(model.season_player_ids, ratings))
+
+    with metrics.phase('compare'):
+        stream = cur.connection.cursor(name=f"elo_verify_{season_id.replace('-', '')}")
+        stream.itersize = chunk_size
+        try:
+            stream.execute(STORED_HISTORY_SQL, (season_id,))
+            stored_rows, first = compare_stream(stream, expected)
+        finally:
+            stream.close()
+
+    summary = {'season_id': season_id, 'fixtures': len(batch), 'skipped': len(batch.skipped),
+              'stored_rows': stored_rows, 'expected_rows': 4 * len(batch), 'rules': {}}
+    for rule in rules:
+        ratings = {sp_id: {'stored': stored_final.get(sp_id), 'expected': rating}
+                   for sp_id, rating in final[rule].items() if stored_final.get(sp_id) != rating}
+        summary['rules'][rule] = {
+            'ok': not first[rule] and not ratings,
+            'players_diverged': len(first[rule]),
+            'first_divergence': first[rule],
+            'final_rating_mismatches': ratings,
+        }
+    metrics.count('fixtures_verified', len(batch))
+    metrics.count('history_rows_read', stored_rows)
+    return summary
+
+def verify_one_season(dsn: Optional[str], season: Dict, rules: Sequence[str]) -> Dict:
+    """Worker: verify a single season on its own read-only connection"""
+    start = time.perf_counter()
+    metrics = Metrics(season['name'])
+    with connection(dsn, metrics) as conn, conn.cursor() as cur:
+        cur.execute("SET TRANSACTION READ ONLY")
+        result = verify_season(cur, season['id'], season['k_factor'], rules, metrics=metrics)
+    result['name'] = season['name']
+    result['seconds'] = time.perf_counter() - start
+    result['metrics'] = metrics.as_dict()
+    return result
+
+def verify_all_seasons(dsn: Optional[str], seasons: List[Dict], workers: int, rules: Sequence[str],
+                       metrics: Optional[Metrics] = None) -> List[Dict]:
+    """Verify seasons on a process pool, largest first, printing a line as each one finishes"""
+    metrics = metrics if metrics is not None else Metrics()
+    queue = sorted(seasons, key=lambda season: season['result_count'], reverse=True)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(verify_one_season, dsn, season, rules): season for season in queue}
+        for done, future in enumerate(as_completed(futures), 1):
+            season = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                metrics.count('seasons_failed')
+                print(f"[{done}/{len(queue)}] ❌ {season['name']}: {e}")
+                results.append({'season_id': season['id'], 'name': season['name'], 'error': str(e)})
+                continue
+            metrics.merge(result.pop('metrics'))
+            verdicts = ", ".join(f"{rule} {'✅' if r['ok'] else '❌ ' + str(r['players_diverged']) + ' players'}"
+                                 for rule, r in result['rules'].items())
+            print(f"[{done}/{len(queue)}] {season['name']}: {result['fixtures']} fixtures, "
+                  f"{result['stored_rows']} stored rows - {verdicts} ({result['seconds']:.2f}s)")
+            results.append(result)
+    return results
+
+def print_divergences(results: List[Dict], rule: str, limit: int = 10):
+    """First divergent fixture per player for seasons that fail the rule"""
+    for result in results:
+        rule_result = result.get('rules', {}).get(rule)
+        if rule_result is None or rule_result['ok']:
+            continue
+        print(f"\n{result['name']} ({rule} rules): {rule_result['players_diverged']} players diverge, "
+              f"{len(rule_result['final_rating_mismatches'])} final ratings differ")
+        divergences = sorted(rule_result['first_divergence'].items(), key=lambda item: item[1]['position'])
+        for season_player_id, d in divergences[:limit]:
+            print(f"  {season_player_id}  #{d['position']:<4} {d['kind']:<8} fixture {d['fixture_id']}  "
+                  f"stored {d['stored']} expected {d['expected']}")
+        if len(divergences) > limit:
+            print(f"  ... and {len(divergences) - limit} more")
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check stored ELO history against replays under float and rounded rules")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--season', action='append', dest='seasons', metavar='SEASON_ID',
+                        help="Only verify this season (repeatable)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument('--rules', choices=RULES + ('both',), default='both',
+                        help="Which replay rules to check (default both)")
+    parser.add_argument('--expect', choices=RULES + ('either',), default='either',
+                        help="Exit 1 unless every season matches this rule (default: either rule)")
+    parser.add_argument('--report', metavar='PATH', help="Write the full divergence report as JSON")
+    parser.add_argument('--limit', type=int, default=10, help="Divergent players to print per season")
+    add_arguments(parser, profile=False)
+    args = parser.parse_args(argv)
+
+    rules = RULES if args.rules == 'both' else (args.rules,)
+    if args.expect != 'either' and args.expect not in rules:
+        parser.error(f"--expect {args.expect} needs --rules {args.expect} or both")
+
+    with connection(args.dsn) as conn, conn.cursor() as cur:
+        seasons = [season._asdict() for season in fetch_seasons(cur)]
+    if args.seasons:
+        seasons = [season for season in seasons if season['id'] in set(args.seasons)]
+    if not seasons:
+        print("No ELO-enabled seasons found")
+        return 0
+
+    print(f"🔍 Verifying {len(seasons)} seasons under {' and '.join(rules)} rules")
+    metrics = Metrics(f"Verification of {len(seasons)} seasons")
+    workers = max(1, min(args.workers, len(seasons)))
+    results = verify_all_seasons(args.dsn, seasons, workers, rules, metrics)
+
+    for rule in rules:
+        print_divergences(results, rule, args.limit)
+
+    expected_rules = rules if args.expect == 'either' else (args.expect,)
+    failing = [result for result in results
+               if 'error' in result or not any(result['rules'][rule]['ok'] for rule in expected_rules)]
+    print(f"\n📊 {len(results) - len(failing)}/{len(results)} seasons match "
+          f"{'either rule set' if args.expect == 'either' else args.expect + ' rules'}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"📄 Report written to {args.report}")
+    report(metrics, args.metrics)
+    return 1 if failing else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Streaming reader for the ladder fixture CSV exports
+Turns "Beta Double Ladder - Fixtures.csv"-style files into engine fixtures without loading the whole file
+"""
+
+import argparse
+import csv
+import itertools
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from elo_engine import DEFAULT_K_FACTOR, FixtureBatch, RatingStore, replay_season
+from elo_simulation import NAME_RESOLVER, STARTING_ELO_2, normalize_name, print_final_table
+from name_resolver import print_report
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# One row per rubber: players A+B play C+D, with a score per player
+PLAYER_COLUMNS = ('Player A', 'Player B', 'Player C', 'Player D')
+SCORE_COLUMNS = ('Player A Score', 'Player B Score', 'Player C Score', 'Player D Score')
+
+def read_row_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Tuple[int, Dict[str, str]]]]:
+    """Yield (line number, row) lists of up to chunk_size rows, reading the file lazily"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        numbered = ((reader.line_num, row) for row in reader)
+        while True:
+            chunk = list(itertools.islice(numbered, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+def parse_rows(chunks: Iterable[List], path: str = '') -> Iterator[Dict]:
+    """Turn raw CSV rows into fixtures with raw player names and pair scores"""
+    for chunk in chunks:
+        for line_num, row in chunk:
+            if not any((value or '').strip() for value in row.values()):
+                continue
+            try:
+                names = [row[column] for column in PLAYER_COLUMNS]
+                a, b, c, d = (int(row[column]) for column in SCORE_COLUMNS)
+                date = datetime.strptime(row['Date'].strip(), '%m/%d/%Y').date()
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"{path}:{line_num}: unreadable fixture row ({e})") from None
+            if a != b or c != d:
+                raise ValueError(f"{path}:{line_num}: partners have different scores ({a}/{b} vs {c}/{d})")
+            yield {
+                'date': date,
+                'court': row.get('Court'),
+                'names': names,
+                'pair1_score': a,
+                'pair2_score': c,
+            }
+
+def resolve_names(fixtures: Iterable[Dict], resolve: Callable[[str], str] = normalize_name) -> Iterator[Dict]:
+    """
+    Map raw names to canonical player names and add week numbers
+
+    Weeks count distinct match dates in file order, which matches the
+    week numbering used by MATCH_RESULTS.
+    """
+    resolved: Dict[str, str] = {}
+    last_date = None
+    week = 0
+    for i, fixture in enumerate(fixtures):
+        names = []
+        for raw in fixture.pop('names'):
+            name = resolved.get(raw)
+            if name is None:
+                name = resolved[raw] = resolve(raw)
+            names.append(name)
+        if fixture['date'] != last_date:
+            last_date = fixture['date']
+            week += 1
+        fixture.update({
+            'fixture_id': i,
+            'week': week,
+            'pair1': names[:2],
+            'pair2': names[2:],
+        })
+        yield fixture
+
+def iter_csv_fixtures(path: str, resolve: Callable[[str], str] = normalize_name,
+                      chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict]:
+    """Stream MATCH_RESULTS-style fixture dicts from a ladder CSV export"""
+    return resolve_names(parse_rows(read_row_chunks(path, chunk_size), path), resolve)
+
+def load_csv_batch(store: RatingStore, paths: Iterable[str], initial_rating: Optional[float] = None,
+                   resolve: Callable[[str], str] = normalize_name,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> FixtureBatch:
+    """
+    Stream one or more CSV exports straight into a FixtureBatch
+
+    Players missing from the store are added at initial_rating; with no
+    initial_rating an unknown player raises KeyError.
+    """
+    batch = FixtureBatch()
+    for path in paths:
+        for fixture in iter_csv_fixtures(path, resolve, chunk_size):
+            players = [store.intern(name, initial_rating) for name in fixture['pair1'] + fixture['pair2']]
+            batch.add(players, fixture['pair1_score'], fixture['pair2_score'],
+                      fixture_id=f"{path}:{fixture['fixture_id']}", created_at=fixture['date'],
+                      week=fixture['week'])
+    return batch
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay ladder fixture CSV exports through the ELO engine")
+    parser.add_argument('paths', nargs='+', help="Fixture CSV files, replayed in the order given")
+    parser.add_argument('--initial-rating', type=float, default=1200,
+                        help="Starting rating for players not in Starting ELO 2 (default 1200)")
+    parser.add_argument('--k-factor', type=int, default=DEFAULT_K_FACTOR)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="CSV rows parsed per chunk")
+    args = parser.parse_args()
+
+    def resolve_or_keep(raw: str) -> str:
+        # Unresolved names become new players at --initial-rating and are reported below
+        resolution = NAME_RESOLVER.resolve(raw)
+        return resolution.key if resolution.resolved else raw.strip()
+
+    start = time.perf_counter()
+    store = RatingStore.from_dict(STARTING_ELO_2)
+    batch = load_csv_batch(store, args.paths, args.initial_rating, resolve_or_keep, args.chunk_size)
+    loaded = time.perf_counter() - start
+    replay_season(store, batch, args.k_factor)
+    elapsed = time.perf_counter() - start
+
+    print_report(NAME_RESOLVER.cache.values())
+    print(f"Loaded {len(batch)} fixtures from {len(args.paths)} file(s) in {loaded:.3f}s, replayed in {elapsed - loaded:.3f}s")
+    print_final_table(store.to_dict(), "CSV Replay")
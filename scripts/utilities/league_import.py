@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Bulk importer for pasted league match results
+Parses league result texts on a process pool and writes matches, fixtures and league_match_rubbers in one transaction per file
+"""
+
+import argparse
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from elo_metrics import Metrics, add_arguments, report
+from name_resolver import NameResolver, Resolution, describe
+
+DEFAULT_CLUB = 'Cawood'
+# The admin modal only imports the first three pairs a side
+MAX_PAIRS = 3
+TEXT_SUFFIXES = ('.txt', '.text')
+# Names matched any other way (first name only, fuzzy) need --accept-fuzzy or an alias
+ACCEPTED_STATUSES = ('exact', 'alias')
+
+# Same patterns as src/utils/leagueTextParser.js
+HEADER_PREFIX_RE = re.compile(r'^Fixtures\s*-\s*')
+TEAMS_RE = re.compile(r'^(.+?)\s+vs?\s+(.+)$', re.IGNORECASE)
+DATE_TIME_RE = re.compile(r'(\d{1,2}\s+\w+\s+\d{4})\s*-\s*(\d{1,2}:\d{2})')
+SCORE_RE = re.compile(r'(\d+)\s*-\s*(\d+)')
+NAME_GAP_RE = re.compile(r'\s{4,}|\t+')
+GF_GA_RE = re.compile(r'GF\s*GA.*$')
+# A file may hold several pastes; each starts at its "Fixtures - Home v Away" line
+PASTE_START_RE = re.compile(r'^\s*Fixtures\s*-', re.MULTILINE)
+
+PLAYERS_SQL = """
+    SELECT id, name FROM profiles
+    WHERE name IS NOT NULL AND role IN ('player', 'admin') AND status = 'approved'
+"""
+PLAYER_CACHE_SQL = "SELECT parsed_name, matched_player_id FROM player_match_cache"
+# Locks the season so concurrent imports can't hand out the same week numbers
+SEASON_SQL = "SELECT name, season_type FROM seasons WHERE id = %s FOR UPDATE"
+LAST_WEEK_SQL = "SELECT COALESCE(MAX(week_number), 0) FROM matches WHERE season_id = %s"
+IMPORTED_SQL = """
+    SELECT 1
+    FROM matches m
+    JOIN match_fixtures mf ON mf.match_id = m.id
+    WHERE m.season_id = %s AND m.match_date = %s
+      AND mf.match_type = 'league' AND mf.team = %s AND mf.opponent_club = %s
+    LIMIT 1
+"""
+FIND_EXTERNAL_SQL = """
+    SELECT ep.id, ep.name, ep.club_name
+    FROM external_players ep
+    JOIN (VALUES %s) AS v(name, club_name) ON ep.name = v.name AND ep.club_name = v.club_name
+"""
+INSERT_EXTERNAL_SQL = "INSERT INTO external_players (name, club_name) VALUES %s RETURNING id, name, club_name"
+INSERT_MATCHES_SQL = "INSERT INTO matches (season_id, week_number, match_date) VALUES %s RETURNING id, week_number"
+INSERT_FIXTURES_SQL = """
+    INSERT INTO match_fixtures (match_id, court_number, game_number, player1_id, player2_id, player3_id, player4_id,
+                                match_type, team, opponent_club)
+    VALUES %s
+    RETURNING id, match_id
+"""
+INSERT_RUBBERS_SQL = """
+    INSERT INTO league_match_rubbers (match_fixture_id, rubber_number, cawood_player1_id, cawood_player2_id,
+                                      opponent_player1_id, opponent_player2_id, cawood_games_won, opponent_games_won)
+    VALUES %s
+"""
+
+class Pair(NamedTuple):
+    player1: str
+    player2: str
+
+class Rubber(NamedTuple):
+    home_score: int
+    away_score: int
+
+class LeagueMatch(NamedTuple):
+    """One pasted match, as parseLeagueMatchFromText returns it"""
+    match_date: date
+    match_time: str
+    home_team: str
+    away_team: str
+    home_pairs: List[Pair]
+    away_pairs: List[Pair]
+    scoring_matrix: List[List[Rubber]]
+
+    def club_side(self, club: str = DEFAULT_CLUB) -> Tuple[bool, str, str]:
+        """(club is home, club team, opponent team); the away side when neither team names the club"""
+        if club.lower() in self.home_team.lower():
+            return True, self.home_team, self.away_team
+        return False, self.away_team, self.home_team
+
+    def rubbers(self, club: str = DEFAULT_CLUB) -> List[Tuple[Pair, Pair, int, int]]:
+        """(club pair, opponent pair, club games, opponent games) in the modal's rubber order"""
+        club_is_home = self.club_side(club)[0]
+        club_pairs, opponent_pairs = ((self.home_pairs, self.away_pairs) if club_is_home
+                                      else (self.away_pairs, self.home_pairs))
+        rubbers = []
+        for i, club_pair in enumerate(club_pairs[:MAX_PAIRS]):
+            for j, opponent_pair in enumerate(opponent_pairs[:MAX_PAIRS]):
+                # The matrix is [home pair][away pair]
+                row, column = (i, j) if club_is_home else (j, i)
+                if row < len(self.scoring_matrix) and column < len(self.scoring_matrix[row]):
+                    rubber = self.scoring_matrix[row][column]
+                    games = ((rubber.home_score, rubber.away_score) if club_is_home
+                             else (rubber.away_score, rubber.home_score))
+                    rubbers.append((club_pair, opponent_pair, *games))
+        return rubbers
+
+def parse_teams(line: str) -> Tuple[str, str]:
+    match = TEAMS_RE.match(HEADER_PREFIX_RE.sub('', line))
+    if not match:
+        raise ValueError("Could not parse team names from header")
+    return match.group(1).strip(), match.group(2).strip()
+
+def parse_date_time(line: str) -> Tuple[date, str]:
+    match = DATE_TIME_RE.search(line)
+    if not match:
+        raise ValueError("Could not parse date and time")
+    for pattern in ('%d %B %Y', '%d %b %Y'):
+        try:
+            return datetime.strptime(match.group(1), pattern).date(), match.group(2)
+        except ValueError:
+            pass
+    raise ValueError("Invalid date format")
+
+def parse_away_pairs(lines: Sequence[str], start: int, home_team: str) -> List[Pair]:
+    """Away names run from the line after the away team header to the "GF GA" line"""
+    players = []
+    for line in lines[start:]:
+        if SCORE_RE.search(line):
+            break
+        if line.startswith(home_team):
+            line = line[len(home_team):].strip()
+        cleaned = GF_GA_RE.sub('', line).strip()
+        names = [name.strip() for name in NAME_GAP_RE.split(cleaned) if name.strip()]
+        players.extend(name for name in names if len(name) > 1)
+        if not names and cleaned and 'GF' not in cleaned and 'GA' not in cleaned:
+            players.append(cleaned)
+        if 'GF' in line and 'GA' in line:
+            break
+    return [Pair(players[i], players[i + 1]) for i in range(0, len(players) - 1, 2)]
+
+def parse_home_rows(lines: Sequence[str]) -> Tuple[List[Pair], List[List[Rubber]]]:
+    """A home pair is a name line followed by "name  a - b  c - d  e - f ..." """
+    pairs, matrix = [], []
+    for i, line in enumerate(lines):
+        scores = SCORE_RE.findall(line)
+        if len(scores) < 3 or i == 0:
+            continue
+        player1, player2 = lines[i - 1], SCORE_RE.split(line, 1)[0].strip()
+        if player1 and player2:
+            pairs.append(Pair(player1, player2))
+            matrix.append([Rubber(int(home), int(away)) for home, away in scores[:3]])
+    return pairs, matrix
+
+def parse_league_text(text: str) -> LeagueMatch:
+    """Parse one pasted match; raises ValueError with the browser parser's messages"""
+    lines = [line.strip() for line in text.strip().split('\n') if line.strip()]
+    if len(lines) < 5:
+        raise ValueError("Not enough lines in the text - please paste the complete match data")
+
+    home_team, away_team = parse_teams(lines[0])
+    match_date, match_time = parse_date_time(lines[1])
+    data = lines[2:]
+    try:
+        away_header = data.index(away_team)
+    except ValueError:
+        raise ValueError(f"Could not find away team header ({away_team})") from None
+
+    away_pairs = parse_away_pairs(data, away_header + 1, home_team)
+    home_pairs, matrix = parse_home_rows(data)
+    return LeagueMatch(match_date, match_time, home_team, away_team, home_pairs, away_pairs, matrix)
+
+def split_pastes(text: str) -> List[str]:
+    """Split a file holding several pasted matches at their "Fixtures -" header lines"""
+    starts = [match.start() for match in PASTE_START_RE.finditer(text)]
+    if not starts:
+        return [text] if text.strip() else []
+    if text[:starts[0]].strip():
+        starts.insert(0, 0)
+    return [text[start:end] for start, end in zip(starts, starts[1:] + [len(text)])]
+
+def parse_source(source: str, text: Optional[str] = None) -> Tuple[str, List[LeagueMatch], List[str]]:
+    """Worker: parse every paste in one file (or given text); returns (source, matches, errors)"""
+    if text is None:
+        with open(source, encoding='utf-8-sig') as f:
+            text = f.read()
+    matches, errors = [], []
+    for n, paste in enumerate(split_pastes(text), 1):
+        try:
+            matches.append(parse_league_text(paste))
+        except ValueError as e:
+            errors.append(f"paste {n}: {e}")
+    return source, matches, errors
+
+def parse_sources(sources: Sequence[Tuple[str, Optional[str]]], workers: int) -> List[Tuple[str, List[LeagueMatch], List[str]]]:
+    """Parse sources on a process pool, keeping input order"""
+    if workers <= 1 or len(sources) <= 1:
+        return [parse_source(*source) for source in sources]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(parse_source, *zip(*sources), chunksize=max(1, len(sources) // (4 * workers))))
+
+def collect_sources(paths: Iterable[str]) -> List[Tuple[str, Optional[str]]]:
+    """Files and the text files in directories, sorted; "-" reads stdin"""
+    sources = []
+    for path in paths:
+        if path == '-':
+            sources.append(('<stdin>', sys.stdin.read()))
+        elif os.path.isdir(path):
+            sources.extend((os.path.join(path, name), None) for name in sorted(os.listdir(path))
+                           if name.lower().endswith(TEXT_SUFFIXES))
+        else:
+            sources.append((path, None))
+    return sources
+
+def load_resolver(cur) -> NameResolver:
+    """Approved players and admins, with confirmed player_match_cache spellings as aliases"""
+    cur.execute(PLAYERS_SQL)
+    players = {str(player_id): name for player_id, name in cur.fetchall()}
+    cur.execute(PLAYER_CACHE_SQL)
+    aliases = {parsed_name: players[str(player_id)] for parsed_name, player_id in cur.fetchall()
+               if str(player_id) in players}
+    return NameResolver(players, aliases)
+
+def external_player_ids(cur, names: Iterable[Tuple[str, str]], known: Dict[Tuple[str, str], str]) -> Dict[Tuple[str, str], str]:
+    """Find or create external_players for (name, club) pairs; known caches them across files"""
+    from psycopg2.extras import execute_values
+
+    wanted = [key for key in dict.fromkeys(names) if key not in known]
+    if wanted:
+        for player_id, name, club in execute_values(cur, FIND_EXTERNAL_SQL, wanted, fetch=True):
+            known.setdefault((name, club), str(player_id))
+        missing = [key for key in wanted if key not in known]
+        if missing:
+            for player_id, name, club in execute_values(cur, INSERT_EXTERNAL_SQL, missing, fetch=True):
+                known[(name, club)] = str(player_id)
+    return known
+
+def describe_guess(resolution: Resolution) -> str:
+    return f"Unconfirmed {resolution.status} match {resolution.raw!r} -> {resolution.name!r} ({resolution.score:.2f})"
+
+def import_matches(cur, season_id: str, matches: Sequence[LeagueMatch], resolver: NameResolver,
+                   externals: Dict[Tuple[str, str], str], club: str = DEFAULT_CLUB, dry_run: bool = False,
+                   accept_fuzzy: bool = False) -> Dict[str, int]:
+    """
+    Write one file's matches; raises ValueError, leaving the caller to roll back, if any club name won't resolve
+
+    Only exact and alias matches are trusted; first-name and fuzzy matches
+    count as unresolved unless accept_fuzzy is set.
+
+    Matches already imported (same date, team and opponent) are skipped, so
+    rerunning a backfill is harmless. New matches take the next week
+    numbers in date order, as the modal does one paste at a time.
+    """
+    from psycopg2.extras import execute_values
+
+    cur.execute(SEASON_SQL, (season_id,))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError(f"Season {season_id} not found")
+    if row[1] != 'league':
+        raise ValueError(f"Season {row[0]!r} is a {row[1]} season; league matches only import into league seasons")
+
+    pending = []
+    for match in sorted(matches, key=lambda match: (match.match_date, match.match_time)):
+        club_is_home, club_team, opponent = match.club_side(club)
+        team = '2nds' if '2' in club_team else '1sts'
+        cur.execute(IMPORTED_SQL, (season_id, match.match_date, team, opponent))
+        if cur.fetchone() is None:
+            pending.append((match, team, opponent))
+    counts = {'matches': len(pending), 'skipped': len(matches) - len(pending), 'rubbers': 0}
+    if not pending:
+        return counts
+
+    resolutions = resolver.resolve_many(name for match, _, _ in pending for pair, *_ in match.rubbers(club)
+                                        for name in pair)
+    guesses = [resolution for resolution in resolutions.values()
+               if resolution.key is not None and resolution.status not in ACCEPTED_STATUSES]
+    unresolved = [resolution for resolution in resolutions.values() if resolution.key is None]
+    if unresolved or (guesses and not accept_fuzzy):
+        raise ValueError('; '.join([describe(resolution) for resolution in unresolved]
+                                   + ([] if accept_fuzzy else [describe_guess(resolution) for resolution in guesses])))
+    for resolution in guesses:
+        print(f"ℹ️  Accepted {resolution.status} match {resolution.raw!r} -> {resolution.name!r} ({resolution.score:.2f})")
+
+    rubbers = [(match, team, opponent, match.rubbers(club)) for match, team, opponent in pending]
+    counts['rubbers'] = sum(len(match_rubbers) for *_, match_rubbers in rubbers)
+    if dry_run:
+        return counts
+
+    externals = external_player_ids(cur, ((name, opponent) for _, _, opponent, match_rubbers in rubbers
+                                          for _, pair, _, _ in match_rubbers for name in pair), externals)
+
+    cur.execute(LAST_WEEK_SQL, (season_id,))
+    first_week = cur.fetchone()[0] + 1
+    match_ids = dict((week, match_id) for match_id, week in execute_values(
+        cur, INSERT_MATCHES_SQL, [(season_id, first_week + i, match.match_date) for i, (match, *_) in enumerate(rubbers)],
+        fetch=True))
+
+    fixtures = []
+    for i, (match, team, opponent, match_rubbers) in enumerate(rubbers):
+        # match_fixtures needs four players; league rubbers carry the real pairings
+        club_ids = list(dict.fromkeys(resolutions[name].key for club_pair, *_ in match_rubbers for name in club_pair))
+        club_ids += [club_ids[0]] * (4 - len(club_ids)) if club_ids else []
+        if not club_ids:
+            raise ValueError(f"No {club} players found for {match.home_team} v {match.away_team}")
+        fixtures.append((match_ids[first_week + i], 1, 1, *club_ids[:4], 'league', team, opponent))
+    fixture_ids = dict((match_id, fixture_id) for fixture_id, match_id in execute_values(
+        cur, INSERT_FIXTURES_SQL, fixtures, fetch=True))
+
+    rows = []
+    for i, (match, team, opponent, match_rubbers) in enumerate(rubbers):
+        fixture_id = fixture_ids[match_ids[first_week + i]]
+        for number, (club_pair, opponent_pair, club_games, opponent_games) in enumerate(match_rubbers, 1):
+            rows.append((fixture_id, number,
+                         resolutions[club_pair.player1].key, resolutions[club_pair.player2].key,
+                         externals[(opponent_pair.player1, opponent)], externals[(opponent_pair.player2, opponent)],
+                         club_games, opponent_games))
+    execute_values(cur, INSERT_RUBBERS_SQL, rows)
+    return counts
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import pasted league results into a league season")
+    parser.add_argument('paths', nargs='+', help="Text files, directories of .txt files, or - for stdin")
+    parser.add_argument('--season-id', required=True, help="League season to import into")
+    parser.add_argument('--club', default=DEFAULT_CLUB, help=f"Our club's name as it appears in team names (default: {DEFAULT_CLUB})")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Parse and resolve names, listing any that need confirming, but write nothing")
+    parser.add_argument('--accept-fuzzy', action='store_true',
+                        help="Import first-name and fuzzy name matches instead of failing the file")
+    add_arguments(parser, profile=False)
+    args = parser.parse_args(argv)
+    metrics = Metrics('League import')
+
+    sources = collect_sources(args.paths)
+    if not sources:
+        print("❌ No league result files found")
+        return 1
+    with metrics.phase('parse'):
+        parsed = parse_sources(sources, max(1, min(args.workers, len(sources))))
+    metrics.count('files', len(parsed))
+
+    from elo_db import connection
+    with connection(args.dsn) as conn, conn.cursor() as cur:
+        resolver = load_resolver(cur)
+
+    failed = 0
+    externals: Dict[Tuple[str, str], str] = {}
+    for source, matches, errors in parsed:
+        for error in errors:
+            print(f"⚠️  {source}: {error}")
+        metrics.count('parse_errors', len(errors))
+        if not matches:
+            continue
+        # External players created in a file that rolls back mustn't stay cached
+        file_externals = dict(externals)
+        try:
+            # One transaction per file: a bad file leaves nothing behind
+            with metrics.phase('write'), connection(args.dsn, metrics) as conn, conn.cursor() as cur:
+                counts = import_matches(cur, args.season_id, matches, resolver, file_externals, args.club,
+                                        args.dry_run, args.accept_fuzzy)
+        except ValueError as e:
+            failed += 1
+            print(f"❌ {source}: {e}")
+            continue
+        externals.update(file_externals)
+        print(f"✅ {source}: {counts['matches']} matches, {counts['rubbers']} rubbers"
+              + (f", {counts['skipped']} already imported" if counts['skipped'] else ""))
+        for name, n in counts.items():
+            metrics.count(f"{name}_dry_run" if args.dry_run else name, n)
+
+    report(metrics, args.metrics)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
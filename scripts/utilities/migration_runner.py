@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Transactional migration runner for supabase/migrations
+Splits each file with a SQL tokenizer and applies every pending file in one transaction, recording it in a ledger
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / 'supabase' / 'migrations'
+
+LEDGER_SQL = """
+    CREATE TABLE IF NOT EXISTS migration_ledger (
+        filename TEXT PRIMARY KEY,
+        checksum TEXT NOT NULL,
+        statements INTEGER NOT NULL,
+        duration_ms INTEGER NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    ALTER TABLE migration_ledger ENABLE ROW LEVEL SECURITY;
+"""
+
+# Any constant works; it only has to be the same for every runner
+ADVISORY_LOCK_ID = 7_305_164_211
+
+TOKEN_RE = re.compile(r"""
+      (?P<line_comment>--[^\n]*)
+    | (?P<block_comment>/\*)
+    | (?P<dollar>(?<![\w$])\$(?:[A-Za-z_][A-Za-z_0-9]*)?\$)
+    | (?P<escape_string>(?<![\w$])[eE]'(?:[^'\\]|\\.|'')*')
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<identifier>"(?:[^"]|"")*")
+    | (?P<unterminated>(?<![\w$])[eE]'|['"])
+    | (?P<semicolon>;)
+""", re.VERBOSE | re.DOTALL)
+
+# A file's own BEGIN/COMMIT would end the runner's transaction early
+TRANSACTION_CONTROL_RE = re.compile(
+    r'^(BEGIN|COMMIT|END|ROLLBACK|ABORT|START\s+TRANSACTION)(\s+(WORK|TRANSACTION))?\s*;?$', re.IGNORECASE)
+NON_TRANSACTIONAL_RE = re.compile(
+    r'^(VACUUM|CREATE\s+DATABASE|DROP\s+DATABASE)\b|\bCONCURRENTLY\b', re.IGNORECASE)
+
+class MigrationError(Exception):
+    """A migration that can't be split, planned or applied"""
+
+def _line_of(text: str, pos: int) -> int:
+    return text.count('\n', 0, pos) + 1
+
+def _block_comment_end(text: str, pos: int) -> int:
+    """End of a /* */ comment starting at pos; PostgreSQL block comments nest"""
+    depth = 0
+    while True:
+        opening = text.find('/*', pos)
+        closing = text.find('*/', pos)
+        if closing < 0:
+            return -1
+        if 0 <= opening < closing:
+            depth += 1
+            pos = opening + 2
+        else:
+            depth -= 1
+            pos = closing + 2
+            if depth == 0:
+                return pos
+
+def split_statements(sql: str, source: str = '<sql>') -> Iterator[Tuple[int, str]]:
+    """
+    Yield (line number, statement) for each top-level statement
+
+    Semicolons inside strings, quoted identifiers, dollar-quoted bodies and
+    comments don't end a statement. Comments before a statement are dropped,
+    and so are statements that are only comments.
+    """
+    pos = 0
+    start: Optional[int] = None
+
+    def code_at(index: int):
+        nonlocal start
+        if start is None:
+            start = index
+
+    while True:
+        match = TOKEN_RE.search(sql, pos)
+        end = match.start() if match else len(sql)
+        gap = sql[pos:end]
+        if gap.strip():
+            code_at(pos + len(gap) - len(gap.lstrip()))
+        if not match:
+            break
+
+        kind = match.lastgroup
+        if kind == 'line_comment':
+            pos = match.end()
+        elif kind == 'block_comment':
+            pos = _block_comment_end(sql, match.start())
+            if pos < 0:
+                raise MigrationError(f"{source}:{_line_of(sql, match.start())}: unterminated /* comment")
+        elif kind == 'dollar':
+            tag = match.group()
+            closing = sql.find(tag, match.end())
+            if closing < 0:
+                raise MigrationError(f"{source}:{_line_of(sql, match.start())}: unterminated {tag} quote")
+            code_at(match.start())
+            pos = closing + len(tag)
+        elif kind == 'unterminated':
+            raise MigrationError(f"{source}:{_line_of(sql, match.start())}: unterminated quoted string")
+        elif kind == 'semicolon':
+            if start is not None:
+                yield _line_of(sql, start), sql[start:match.end()]
+            start = None
+            pos = match.end()
+        else:
+            code_at(match.start())
+            pos = match.end()
+
+    if start is not None:
+        yield _line_of(sql, start), sql[start:].rstrip()
+
+class Migration:
+    """One SQL file, identified by its path relative to the migrations directory"""
+
+    def __init__(self, path: Path, root: Path = MIGRATIONS_DIR):
+        self.path = path
+        try:
+            self.name = path.resolve().relative_to(root.resolve()).as_posix()
+        except ValueError:
+            self.name = path.name
+        data = path.read_bytes()
+        self.checksum = hashlib.sha256(data).hexdigest()
+        self.sql = data.decode('utf-8-sig')
+        self._statements: Optional[List[Tuple[int, str]]] = None
+
+    @property
+    def statements(self) -> List[Tuple[int, str]]:
+        """Statements to run, with the file's own transaction control removed"""
+        if self._statements is None:
+            statements = []
+            for line, statement in split_statements(self.sql, self.name):
+                if TRANSACTION_CONTROL_RE.match(statement.strip()):
+                    continue
+                if NON_TRANSACTIONAL_RE.search(statement):
+                    raise MigrationError(f"{self.name}:{line}: statement can't run inside a transaction")
+                statements.append((line, statement))
+            self._statements = statements
+        return self._statements
+
+def discover(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """Top-level .sql files in filename order; subdirectories such as applied/ are ignored"""
+    return [Migration(path, directory) for path in sorted(directory.glob('*.sql'))]
+
+def applied_checksums(cur) -> Dict[str, str]:
+    cur.execute("SELECT filename, checksum FROM migration_ledger")
+    return dict(cur.fetchall())
+
+def plan(migrations: Sequence[Migration], applied: Dict[str, str]) -> Tuple[List[Migration], List[Migration]]:
+    """Split migrations into (pending, changed since they were applied)"""
+    pending = [m for m in migrations if m.name not in applied]
+    changed = [m for m in migrations if m.name in applied and applied[m.name] != m.checksum]
+    return pending, changed
+
+def record(cur, migration: Migration, duration_ms: int):
+    cur.execute("""
+        INSERT INTO migration_ledger (filename, checksum, statements, duration_ms)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (filename) DO UPDATE
+        SET checksum = EXCLUDED.checksum,
+            statements = EXCLUDED.statements,
+            duration_ms = EXCLUDED.duration_ms,
+            applied_at = NOW()
+    """, (migration.name, migration.checksum, len(migration.statements), duration_ms))
+
+def apply_migrations(conn, migrations: Sequence[Migration], allow_changed: bool = False,
+                     baseline: bool = False, dry_run: bool = False) -> List[Migration]:
+    """
+    Apply every pending migration in a single transaction
+
+    Files already in the ledger with the same checksum are skipped. A file
+    whose checksum changed aborts the run unless allow_changed is set, in
+    which case it is applied again. With baseline, pending files are only
+    recorded, for databases where they were applied by hand. Any failure
+    rolls back every file in the run. Returns the migrations applied.
+    """
+    # Split everything up front so a syntax problem fails before any SQL runs
+    for migration in migrations:
+        migration.statements
+
+    with conn.cursor() as cur:
+        try:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (ADVISORY_LOCK_ID,))
+            cur.execute(LEDGER_SQL)
+            pending, changed = plan(migrations, applied_checksums(cur))
+            if changed and not allow_changed:
+                names = ', '.join(m.name for m in changed)
+                raise MigrationError(f"Applied migrations have changed since they ran: {names}")
+            to_apply = [m for m in migrations if m in pending or m in changed]
+
+            for migration in to_apply:
+                start = time.perf_counter()
+                if not (baseline or dry_run):
+                    for line, statement in migration.statements:
+                        try:
+                            cur.execute(statement)
+                        except Exception as e:
+                            raise MigrationError(f"{migration.name}:{line}: {str(e).strip()}") from e
+                duration_ms = round((time.perf_counter() - start) * 1000)
+                record(cur, migration, duration_ms)
+                action = 'recorded' if baseline else 'would apply' if dry_run else 'applied'
+                print(f"  ✓ {migration.name} ({len(migration.statements)} statements, {action} in {duration_ms} ms)")
+        except Exception:
+            conn.rollback()
+            raise
+
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    return to_apply
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply pending supabase/migrations files in one transaction")
+    parser.add_argument('files', nargs='*', type=Path,
+                        help="Apply these files instead of every top-level file in --dir")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--dir', type=Path, default=MIGRATIONS_DIR, help="Migrations directory")
+    parser.add_argument('--dry-run', action='store_true', help="Split and plan, then roll back without running SQL")
+    parser.add_argument('--baseline', action='store_true',
+                        help="Record pending files as applied without running them")
+    parser.add_argument('--allow-changed', action='store_true',
+                        help="Re-apply files whose checksum changed since they ran")
+    args = parser.parse_args(argv)
+
+    migrations = [Migration(path, args.dir) for path in args.files] if args.files else discover(args.dir)
+
+    import psycopg2
+    from elo_db import connection
+    start = time.perf_counter()
+    try:
+        with connection(args.dsn) as conn:
+            applied = apply_migrations(conn, migrations, args.allow_changed, args.baseline, args.dry_run)
+    except (MigrationError, psycopg2.Error) as e:
+        # Advisory lock and ledger failures abort the same transaction as a failing file
+        print(f"❌ {e}")
+        print("Rolled back: no migrations were applied")
+        return 1
+
+    skipped = len(migrations) - len(applied)
+    print(f"✅ {len(applied)} applied, {skipped} already up to date ({time.perf_counter() - start:.2f}s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Player name resolver for CSV imports and pasted league text
+Matches raw names to profiles through aliases, exact and first-name lookups and a trigram index
+"""
+
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+DEFAULT_MIN_SCORE = 0.6
+DEFAULT_MARGIN = 0.1
+
+# Fuzzy matches are only suggestions: a caller has to confirm them before the key is used
+RESOLVED_STATUSES = ('exact', 'alias', 'first-name')
+
+class UnresolvedNameError(KeyError):
+    """Raised when a name is unknown or matches more than one player"""
+
+class Resolution:
+    """
+    How one raw name was resolved: status is exact, alias, first-name, fuzzy, ambiguous or unknown
+
+    A fuzzy resolution carries the suggested key and name but is not
+    resolved; callers that accept guesses check for status 'fuzzy' themselves.
+    """
+
+    def __init__(self, raw: str, status: str, key: Optional[Hashable] = None, name: Optional[str] = None,
+                 score: float = 0.0, candidates: Optional[List[Tuple[str, float]]] = None):
+        self.raw = raw
+        self.status = status
+        self.key = key
+        self.name = name
+        self.score = score
+        self.candidates = candidates or []
+
+    @property
+    def resolved(self) -> bool:
+        return self.key is not None and self.status in RESOLVED_STATUSES
+
+    def __repr__(self) -> str:
+        return f"Resolution({self.raw!r} -> {self.name!r}, {self.status}, {self.score:.2f})"
+
+def clean_name(name: str) -> str:
+    """Collapse whitespace and case for comparison"""
+    return re.sub(r'\s+', ' ', name).strip().casefold()
+
+def surname(cleaned: str) -> Optional[str]:
+    """Last word of a cleaned multi-word name, None for a single word"""
+    words = cleaned.split(' ')
+    return words[-1] if len(words) > 1 else None
+
+def trigrams(name: str) -> List[str]:
+    padded = f"  {name} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+class NameResolver:
+    """
+    Trigram index over player names, built once and queried many times
+
+    players maps a key (profile id, or the name itself offline) to a display
+    name. aliases maps raw spellings to display names and always wins, so
+    NAME_MAPPING-style overrides keep working. Trigram matches must keep
+    the raw name's surname, and a multi-word name never matches a one-word
+    profile (or the reverse), so "Ben Jones" is not taken for "Ben". Every
+    resolution is cached, so a large import only pays for each distinct
+    spelling once.
+    """
+
+    def __init__(self, players: Dict[Hashable, str], aliases: Optional[Dict[str, str]] = None,
+                 min_score: float = DEFAULT_MIN_SCORE, margin: float = DEFAULT_MARGIN):
+        self.min_score = min_score
+        self.margin = margin
+        self.keys: List[Hashable] = list(players)
+        self.names: List[str] = [players[key] for key in self.keys]
+        self.cache: Dict[str, Resolution] = {}
+
+        self.by_clean: Dict[str, List[int]] = defaultdict(list)
+        self.by_first_name: Dict[str, List[int]] = defaultdict(list)
+        self.by_trigram: Dict[str, List[int]] = defaultdict(list)
+        self.trigram_counts: List[int] = []
+        self.surnames: List[Optional[str]] = []
+        for i, name in enumerate(self.names):
+            cleaned = clean_name(name)
+            self.surnames.append(surname(cleaned))
+            self.by_clean[cleaned].append(i)
+            if cleaned:
+                self.by_first_name[cleaned.split(' ')[0]].append(i)
+            grams = set(trigrams(cleaned))
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.by_trigram[gram].append(i)
+
+        self.aliases: Dict[str, int] = {}
+        for raw, target in (aliases or {}).items():
+            matches = self.by_clean.get(clean_name(target), [])
+            if len(matches) == 1:
+                self.aliases[clean_name(raw)] = matches[0]
+
+    @classmethod
+    def from_profiles(cls, cur, aliases: Optional[Dict[str, str]] = None, **kwargs) -> 'NameResolver':
+        """Index every profile name, keyed by profile id"""
+        cur.execute("SELECT id, name FROM profiles WHERE name IS NOT NULL")
+        return cls({profile_id: name for profile_id, name in cur.fetchall()}, aliases, **kwargs)
+
+    def _result(self, raw: str, status: str, i: int, score: float = 1.0) -> Resolution:
+        return Resolution(raw, status, self.keys[i], self.names[i], score)
+
+    def _ambiguous(self, raw: str, indices: Iterable[int], score: float = 1.0) -> Resolution:
+        candidates = [(self.names[i], score) for i in indices]
+        return Resolution(raw, 'ambiguous', score=score, candidates=candidates)
+
+    def _lookup(self, raw: str) -> Resolution:
+        cleaned = clean_name(raw)
+        if cleaned in self.aliases:
+            return self._result(raw, 'alias', self.aliases[cleaned])
+
+        exact = self.by_clean.get(cleaned, [])
+        if len(exact) == 1:
+            return self._result(raw, 'exact', exact[0])
+        if len(exact) > 1:
+            return self._ambiguous(raw, exact)
+
+        # "Jon" -> "Jon Best", but "Mark" with "Mark A" and "Mark B" is ambiguous
+        if ' ' not in cleaned:
+            first = self.by_first_name.get(cleaned, [])
+            if len(first) == 1:
+                return self._result(raw, 'first-name', first[0])
+            if len(first) > 1:
+                return self._ambiguous(raw, first)
+
+        grams = set(trigrams(cleaned))
+        shared = Counter(i for gram in grams for i in self.by_trigram.get(gram, ()))
+        scored = sorted(((2 * count / (len(grams) + self.trigram_counts[i]), i) for i, count in shared.items()),
+                        reverse=True)
+        last = surname(cleaned)
+        scored = [(score, i) for score, i in scored if self.surnames[i] == last]
+        if not scored or scored[0][0] < self.min_score:
+            candidates = [(self.names[i], score) for score, i in scored[:3]]
+            return Resolution(raw, 'unknown', score=scored[0][0] if scored else 0.0, candidates=candidates)
+
+        best_score, best = scored[0]
+        close = [(self.names[i], score) for score, i in scored if best_score - score < self.margin]
+        if len(close) > 1:
+            return Resolution(raw, 'ambiguous', score=best_score, candidates=close)
+        return Resolution(raw, 'fuzzy', self.keys[best], self.names[best], best_score, close)
+
+    def resolve(self, raw: str) -> Resolution:
+        """Resolve one raw name (cached)"""
+        resolution = self.cache.get(raw)
+        if resolution is None:
+            resolution = self.cache[raw] = self._lookup(raw)
+        return resolution
+
+    def resolve_many(self, raws: Iterable[str]) -> Dict[str, Resolution]:
+        """Resolve a batch of raw names, each distinct spelling once"""
+        return {raw: self.resolve(raw) for raw in dict.fromkeys(raws)}
+
+    def issues(self) -> List[Resolution]:
+        """Every fuzzy, ambiguous or unknown name seen so far"""
+        return [resolution for resolution in self.cache.values() if not resolution.resolved]
+
+    def __call__(self, raw: str) -> Hashable:
+        """Resolve to a player key, for use as a resolve= callback; raises UnresolvedNameError"""
+        resolution = self.resolve(raw)
+        if not resolution.resolved:
+            raise UnresolvedNameError(describe(resolution))
+        return resolution.key
+
+def describe(resolution: Resolution) -> str:
+    """One-line report for an unresolved name"""
+    candidates = ', '.join(f"{name} ({score:.2f})" for name, score in resolution.candidates)
+    label = {'ambiguous': 'Ambiguous', 'fuzzy': 'Unconfirmed'}.get(resolution.status, 'Unknown')
+    return f"{label} name {resolution.raw!r}" + (f": candidates {candidates}" if candidates else "")
+
+def print_report(resolutions: Iterable[Resolution]):
+    """Print unresolved names, fuzzy guesses included"""
+    for resolution in resolutions:
+        if not resolution.resolved:
+            print(f"⚠️  {describe(resolution)}")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Replay ELO for every season in one go
+Discovers ELO-enabled seasons and backdates them in parallel, one connection per worker process
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence
+
+from elo_db import connection, fetch_seasons
+from elo_history_writer import DEFAULT_BATCH_SIZE
+from elo_incremental import incremental_backdate
+from elo_metrics import Metrics, add_arguments, report
+
+def discover_seasons(dsn: Optional[str] = None, season_ids: Optional[Sequence[str]] = None) -> List[Dict]:
+    """List ELO-enabled seasons with their K-factor and number of results"""
+    with connection(dsn) as conn, conn.cursor() as cur:
+        seasons = [season._asdict() for season in fetch_seasons(cur)]
+
+    if season_ids:
+        wanted = set(season_ids)
+        seasons = [season for season in seasons if season['id'] in wanted]
+    return seasons
+
+# Each season stores its own starting ratings (season_players.elo_rating or
+# the first elo_history row), so replaying one season never reads another
+# season's output and every season can run in its own process.
+def replay_one_season(dsn: Optional[str], season: Dict, batch_size: int, incremental: bool) -> Dict:
+    """
+    Worker: backdate a single season in one transaction and commit it
+
+    Each worker process keeps its own pool, so later seasons on the same
+    worker reuse its warm connection and prepared statements. The season's
+    metrics come back as a dict under 'metrics' for the parent to merge.
+    """
+    start = time.perf_counter()
+    metrics = Metrics(season['name'])
+    with connection(dsn, metrics) as conn, conn.cursor() as cur:
+        if not incremental:
+            cur.execute("DELETE FROM elo_replay_checkpoints WHERE season_id = %s", (season['id'],))
+        stats = incremental_backdate(cur, season['id'], batch_size, season['k_factor'], metrics)
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['metrics'] = metrics.as_dict()
+    return stats
+
+def replay_all_seasons(dsn: Optional[str], seasons: List[Dict], workers: int,
+                       batch_size: int = DEFAULT_BATCH_SIZE, incremental: bool = False,
+                       metrics: Optional[Metrics] = None) -> bool:
+    """Replay seasons on a process pool, printing progress as each one finishes"""
+    metrics = metrics if metrics is not None else Metrics()
+    # Largest seasons first so a big one doesn't start last and hold up the run
+    queue = sorted(seasons, key=lambda season: season['result_count'], reverse=True)
+    start = time.perf_counter()
+    failures = 0
+    total_rows = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(replay_one_season, dsn, season, batch_size, incremental): season
+            for season in queue
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            season = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                failures += 1
+                metrics.count('seasons_failed')
+                print(f"[{done}/{len(queue)}] ❌ {season['name']}: {e}")
+                continue
+            total_rows += stats['rows_written']
+            metrics.merge(stats['metrics'])
+            print(f"[{done}/{len(queue)}] ✅ {season['name']}: "
+                  f"kept {stats['kept']}, replayed {stats['replayed']}, removed {stats['removed']} fixtures, "
+                  f"{stats['rows_written']} rows in {stats['seconds']:.2f}s")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n📊 {len(queue) - failures}/{len(queue)} seasons replayed, "
+          f"{total_rows} ELO history rows in {elapsed:.2f}s using {workers} workers")
+    return failures == 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay ELO history for every ELO-enabled season")
+    parser.add_argument('--dsn', help="Postgres connection string (default: $DATABASE_URL, then PG* variables)")
+    parser.add_argument('--season', action='append', dest='seasons', metavar='SEASON_ID',
+                        help="Only replay this season (repeatable)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"elo_history rows per COPY batch (default {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Apply only results added or changed since each season's last run")
+    parser.add_argument('--yes', action='store_true', help="Don't ask for confirmation")
+    add_arguments(parser, profile=False)
+    args = parser.parse_args()
+
+    seasons = discover_seasons(args.dsn, args.seasons)
+    if not seasons:
+        print("No ELO-enabled seasons found")
+        return 0
+
+    print("🎾 ELO Replay for All Seasons")
+    print("=" * 50)
+    for season in seasons:
+        print(f"  {season['name']:<30} {season['result_count']:>6} results  K={season['k_factor']}")
+    print()
+    if not args.incremental:
+        print("⚠️  Existing ELO history for these seasons will be cleared and rebuilt")
+
+    if not args.yes and input("Continue? (y/N): ").lower() != 'y':
+        print("Cancelled")
+        return 0
+
+    workers = max(1, min(args.workers, len(seasons)))
+    # Phase times are summed over the worker processes
+    metrics = Metrics(f"Replay of {len(seasons)} seasons")
+    ok = replay_all_seasons(args.dsn, seasons, workers, args.batch_size, args.incremental, metrics)
+    report(metrics, args.metrics)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
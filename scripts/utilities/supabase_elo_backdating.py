@@ -4,22 +4,17 @@ ELO Backdating using Supabase MCP Tools
 This approach uses the existing Supabase connection instead of psycopg2
 """
 
-import math
+import argparse
 import json
+import uuid
 from typing import Dict, List, Tuple
 
 WINTER_25_SEASON_ID = 'e45aade8-c31f-40e6-834e-a125a078fcff'
 
-def calculate_expected_score(rating_a: float, rating_b: float) -> float:
-    """Calculate expected score using ELO formula"""
-    return 1.0 / (1.0 + math.pow(10, (rating_b - rating_a) / 400))
-
-def update_elo(old_rating: float, actual_score: float, expected_score: float, k_factor: int = 32) -> float:
-    """Update ELO rating based on match result"""
-    return old_rating + k_factor * (actual_score - expected_score)
-
-def print_sql_for_manual_execution():
+def print_sql_for_manual_execution(season_id: str = WINTER_25_SEASON_ID):
     """Generate SQL statements that can be run manually via Claude's MCP tools"""
+    # Validate before the ID is pasted into SQL text
+    season_id = str(uuid.UUID(season_id))
     
     print("🎾 ELO BACKDATING SQL GENERATOR")
     print("=" * 50)
@@ -32,7 +27,7 @@ def print_sql_for_manual_execution():
 DELETE FROM elo_history 
 WHERE season_player_id IN (
     SELECT id FROM season_players 
-    WHERE season_id = '{WINTER_25_SEASON_ID}'
+    WHERE season_id = '{season_id}'
 );
 """)
     
@@ -54,7 +49,7 @@ SELECT
 FROM match_fixtures mf
 JOIN matches m ON mf.match_id = m.id
 JOIN match_results mr ON mf.id = mr.fixture_id
-WHERE m.season_id = '{WINTER_25_SEASON_ID}'
+WHERE m.season_id = '{season_id}'
     AND mf.pair1_player1_id IS NOT NULL
     AND mf.pair1_player2_id IS NOT NULL
     AND mf.pair2_player1_id IS NOT NULL
@@ -69,7 +64,11 @@ ORDER BY mr.created_at, mf.id;
     print("4. This will create the complete ELO history for Winter 25")
 
 def main():
-    print_sql_for_manual_execution()
+    parser = argparse.ArgumentParser(description="Print ELO backdating SQL for one season")
+    parser.add_argument('--season-id', default=WINTER_25_SEASON_ID,
+                        help="Season to generate SQL for (default Winter 25)")
+    args = parser.parse_args()
+    print_sql_for_manual_execution(args.season_id)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
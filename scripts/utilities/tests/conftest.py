@@ -0,0 +1,115 @@
+"""
+Shared fixtures for the ELO utility tests
+Database tests run in a throwaway schema and are skipped unless DATABASE_URL is set
+"""
+
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Just the columns the utilities read and write
+SCHEMA_SQL = """
+    CREATE TABLE seasons (
+        id uuid PRIMARY KEY, name text, elo_k_factor integer, elo_enabled boolean DEFAULT true, start_date date
+    );
+    CREATE TABLE profiles (id uuid PRIMARY KEY, name text);
+    CREATE TABLE season_players (id uuid PRIMARY KEY, season_id uuid, player_id uuid, elo_rating integer);
+    CREATE TABLE matches (id uuid PRIMARY KEY, season_id uuid, week_number integer);
+    CREATE TABLE match_fixtures (
+        id uuid PRIMARY KEY, match_id uuid,
+        pair1_player1_id uuid, pair1_player2_id uuid, pair2_player1_id uuid, pair2_player2_id uuid
+    );
+    CREATE TABLE match_results (
+        fixture_id uuid PRIMARY KEY, pair1_score integer, pair2_score integer, created_at timestamptz
+    );
+    CREATE TABLE elo_history (
+        id bigserial PRIMARY KEY, season_player_id uuid NOT NULL, match_fixture_id uuid NOT NULL,
+        old_rating integer, new_rating integer, rating_change integer, k_factor integer,
+        opponent_avg_rating integer, expected_score double precision, actual_score double precision,
+        created_at timestamptz
+    );
+    CREATE TABLE elo_replay_checkpoints (
+        season_id uuid PRIMARY KEY, last_created_at timestamptz, last_fixture_id uuid,
+        state jsonb NOT NULL, updated_at timestamptz
+    );
+"""
+
+@pytest.fixture
+def pg_cursor():
+    """A cursor whose search_path is a fresh schema holding SCHEMA_SQL; dropped afterwards"""
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        pytest.skip("DATABASE_URL is not set")
+    psycopg2 = pytest.importorskip('psycopg2')
+    from elo_db import PreparingConnection
+
+    schema = f"elo_test_{uuid.uuid4().hex[:12]}"
+    # The pool's connection class, so the prepared-statement paths are exercised
+    conn = psycopg2.connect(dsn, connection_factory=PreparingConnection)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE SCHEMA {schema}")
+            cur.execute(f"SET search_path TO {schema}")
+            cur.execute(SCHEMA_SQL)
+            yield cur
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+class SeasonBuilder:
+    """Inserts a season with players and results through a test cursor"""
+
+    def __init__(self, cur, n_players: int = 8, k_factor: int = 32, seed: int = 1):
+        import random
+
+        self.cur = cur
+        self.random = random.Random(seed)
+        self.season_id = self._uuid()
+        self.match_id = self._uuid()
+        self.player_ids = [self._uuid() for _ in range(n_players)]
+        self.season_player_ids = {}
+        self.start = datetime(2025, 9, 1, tzinfo=timezone.utc)
+        self.fixtures = 0
+        cur.execute("INSERT INTO seasons (id, name, elo_k_factor, start_date) VALUES (%s, 'Test', %s, '2025-09-01')",
+                    (self.season_id, k_factor))
+        cur.execute("INSERT INTO matches (id, season_id, week_number) VALUES (%s, %s, 1)",
+                    (self.match_id, self.season_id))
+        for i, player_id in enumerate(self.player_ids):
+            season_player_id = self.season_player_ids[player_id] = self._uuid()
+            cur.execute("INSERT INTO profiles (id, name) VALUES (%s, %s)", (player_id, f"Player {i:02d}"))
+            cur.execute("INSERT INTO season_players (id, season_id, player_id, elo_rating) VALUES (%s, %s, %s, %s)",
+                        (season_player_id, self.season_id, player_id, 1000 + self.random.randint(0, 400)))
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self.random.getrandbits(128)))
+
+    def add_results(self, count: int):
+        """Add count fixtures with random players and scores, a minute apart; returns their IDs"""
+        fixture_ids = []
+        for _ in range(count):
+            fixture_id = self._uuid()
+            players = self.random.sample(self.player_ids, 4)
+            pair1_score = self.random.randint(0, 9)
+            self.cur.execute("""
+                INSERT INTO match_fixtures (id, match_id, pair1_player1_id, pair1_player2_id,
+                                            pair2_player1_id, pair2_player2_id)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (fixture_id, self.match_id, *players))
+            self.cur.execute("INSERT INTO match_results VALUES (%s, %s, %s, %s)",
+                             (fixture_id, pair1_score, 9 - pair1_score,
+                              self.start + timedelta(minutes=self.fixtures)))
+            self.fixtures += 1
+            fixture_ids.append(fixture_id)
+        return fixture_ids
+
+@pytest.fixture
+def season(pg_cursor):
+    return SeasonBuilder(pg_cursor)
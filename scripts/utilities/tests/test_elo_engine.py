@@ -0,0 +1,84 @@
+"""The array-backed engine against the per-match loop it replaced"""
+
+import random
+
+import pytest
+
+import elo_simulation
+from elo_engine import FixtureBatch, RatingStore, calculate_expected_score, replay_season, update_elo
+
+def legacy_replay(starting_ratings, matches, k_factor=32):
+    """The original elo_simulation loop, recording what it printed; returns (ratings, per-player rows)"""
+    current_ratings = starting_ratings.copy()
+    rows = []
+    for match in matches:
+        pair1 = match["pair1"]
+        pair2 = match["pair2"]
+        pair1_avg = sum(current_ratings[name] for name in pair1) / len(pair1)
+        pair2_avg = sum(current_ratings[name] for name in pair2) / len(pair2)
+        pair1_expected = calculate_expected_score(pair1_avg, pair2_avg)
+        pair2_expected = 1.0 - pair1_expected
+        total_games = match["pair1_score"] + match["pair2_score"]
+        if total_games > 0:
+            pair1_actual = match["pair1_score"] / total_games
+            pair2_actual = match["pair2_score"] / total_games
+        else:
+            pair1_actual = 0.5
+            pair2_actual = 0.5
+        for pair, actual, expected, opponent_avg in ((pair1, pair1_actual, pair1_expected, pair2_avg),
+                                                     (pair2, pair2_actual, pair2_expected, pair1_avg)):
+            for name in pair:
+                old_rating = current_ratings[name]
+                current_ratings[name] = update_elo(old_rating, actual, expected, k_factor)
+                rows.append((old_rating, current_ratings[name], opponent_avg, expected, actual))
+    return current_ratings, rows
+
+def random_season(seed, n_players=16, n_fixtures=3000):
+    rng = random.Random(seed)
+    names = [f"Player {i}" for i in range(n_players)]
+    ratings = {name: 900 + rng.randint(0, 600) for name in names}
+    matches = []
+    for week in range(n_fixtures):
+        players = rng.sample(names, 4)
+        # A few 0-0 fixtures exercise the draw branch
+        pair1_score, pair2_score = (0, 0) if week % 97 == 0 else (rng.randint(0, 9), rng.randint(0, 9))
+        matches.append({"week": week // 20, "pair1": players[:2], "pair2": players[2:],
+                        "pair1_score": pair1_score, "pair2_score": pair2_score})
+    return ratings, matches
+
+def engine_replay(starting_ratings, matches, k_factor=32):
+    store = RatingStore.from_dict(starting_ratings)
+    batch = FixtureBatch.from_matches(store, matches)
+    result = replay_season(store, batch, k_factor)
+    rows = []
+    for slot in range(4 * len(batch)):
+        side = slot // 2
+        rows.append((result.old_ratings[slot], result.new_ratings[slot], result.pair_avgs[side ^ 1],
+                     result.pair_expected[side], result.actual[side]))
+    return store, result, rows
+
+@pytest.mark.parametrize('seed, k_factor', [(1, 32), (2, 24), (3, 40)])
+def test_replay_is_bit_identical_to_legacy_loop(seed, k_factor):
+    starting_ratings, matches = random_season(seed)
+    legacy_ratings, legacy_rows = legacy_replay(starting_ratings, matches, k_factor)
+    store, _, rows = engine_replay(starting_ratings, matches, k_factor)
+    assert store.to_dict() == legacy_ratings
+    assert rows == legacy_rows
+
+def test_pair_changes_rebuild_final_ratings():
+    starting_ratings, matches = random_season(4, n_fixtures=500)
+    store, result, _ = engine_replay(starting_ratings, matches)
+    rebuilt = [float(starting_ratings[name]) for name in starting_ratings]
+    changes = result.pair_changes()
+    players = result.batch.players
+    for slot, idx in enumerate(players):
+        rebuilt[idx] += changes[slot // 2]
+    assert rebuilt == list(store.ratings)
+
+def test_run_elo_simulation_matches_legacy():
+    matches = [{**match, "pair1": [elo_simulation.normalize_name(name) for name in match["pair1"]],
+                "pair2": [elo_simulation.normalize_name(name) for name in match["pair2"]]}
+               for match in elo_simulation.MATCH_RESULTS]
+    for starting_ratings in (elo_simulation.STARTING_ELO_1, elo_simulation.STARTING_ELO_2):
+        expected, _ = legacy_replay(starting_ratings, matches)
+        assert elo_simulation.run_elo_simulation(starting_ratings, "test") == expected
@@ -0,0 +1,62 @@
+"""COPY and the prepared INSERT must store the same elo_history rows"""
+
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import elo_db
+from elo_db import insert_history_rows
+from elo_history_writer import ELO_HISTORY_COLUMNS, copy_history_rows, copy_line, update_final_ratings
+
+SELECT_SQL = f"SELECT {', '.join(ELO_HISTORY_COLUMNS)} FROM elo_history ORDER BY id"
+
+def tricky_rows(count=11):
+    """NULLs, awkward floats and sub-second timestamps in other zones"""
+    floats = [1 / 3, 0.1 + 0.2, 5e-324, 1e300, math.inf, -0.0, None]
+    created_at = datetime(2025, 3, 30, 0, 59, 59, 999999, tzinfo=timezone(timedelta(hours=-5)))
+    for i in range(count):
+        yield (
+            f"00000000-0000-4000-8000-{i:012d}",
+            f"00000000-0000-4000-9000-{i // 4:012d}",
+            1000 + i, None if i == 2 else 1010 + i, -(2 ** 31) if i == 4 else 10, 32,
+            None if i == 3 else 1200,
+            floats[i % len(floats)],
+            floats[(i + 3) % len(floats)],
+            None if i == 6 else created_at + timedelta(microseconds=i),
+        )
+
+def stored(cur):
+    cur.execute(SELECT_SQL)
+    rows = [tuple(str(value) if column.endswith('_id') else value
+                  for column, value in zip(ELO_HISTORY_COLUMNS, row)) for row in cur.fetchall()]
+    cur.execute("TRUNCATE elo_history")
+    return rows
+
+def test_copy_line_escapes_text_and_nulls():
+    assert copy_line(('a\tb\\c\nd\re', None, 1.5, 7)) == 'a\\tb\\\\c\\nd\\re\t\\N\t1.5\t7\n'
+
+@pytest.mark.parametrize('prepare', [True, False])
+def test_copy_matches_insert(pg_cursor, monkeypatch, prepare):
+    monkeypatch.setattr(elo_db, 'PREPARE_STATEMENTS', prepare)
+    expected = list(tricky_rows())
+
+    assert insert_history_rows(pg_cursor, tricky_rows(), page_size=4) == len(expected)
+    assert ('elo_insert_history' in pg_cursor.connection.prepared) == prepare
+    inserted = stored(pg_cursor)
+    assert copy_history_rows(pg_cursor, tricky_rows(), batch_size=4) == len(expected)
+    copied = stored(pg_cursor)
+
+    assert copied == inserted == expected
+
+def test_update_final_ratings(pg_cursor, season):
+    ids = list(season.season_player_ids.values())
+    final = {season_player_id: 1000.9 + i for i, season_player_id in enumerate(ids[:5])}
+    pg_cursor.execute("SELECT id::text, elo_rating FROM season_players")
+    before = dict(pg_cursor.fetchall())
+
+    update_final_ratings(pg_cursor, final, page_size=2)
+
+    pg_cursor.execute("SELECT id::text, elo_rating FROM season_players")
+    after = dict(pg_cursor.fetchall())
+    assert after == {**before, **{season_player_id: int(rating) for season_player_id, rating in final.items()}}
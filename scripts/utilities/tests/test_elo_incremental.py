@@ -0,0 +1,70 @@
+"""Incremental backdating against a real Postgres (needs DATABASE_URL)"""
+
+from elo_incremental import incremental_backdate
+
+HISTORY_SQL = """
+    SELECT season_player_id, match_fixture_id, old_rating, new_rating, rating_change, k_factor,
+           opponent_avg_rating, expected_score, actual_score, created_at
+    FROM elo_history
+    ORDER BY created_at, match_fixture_id, season_player_id
+"""
+
+def history(cur):
+    cur.execute(HISTORY_SQL)
+    return cur.fetchall()
+
+def ratings(cur):
+    cur.execute("SELECT id, elo_rating FROM season_players ORDER BY id")
+    return cur.fetchall()
+
+def write_app_rows(cur, season, fixture_ids):
+    """What eloCalculator.js leaves behind when a result is entered: four rows per fixture"""
+    cur.execute("""
+        INSERT INTO elo_history (season_player_id, match_fixture_id, old_rating, new_rating, rating_change,
+                                 k_factor, opponent_avg_rating, expected_score, actual_score, created_at)
+        SELECT sp.id, mf.id, sp.elo_rating, sp.elo_rating + 5, 5, 32, 1200, 0.5, 0.5, mr.created_at
+        FROM match_fixtures mf
+        JOIN match_results mr ON mr.fixture_id = mf.id
+        JOIN season_players sp ON sp.player_id IN (mf.pair1_player1_id, mf.pair1_player2_id,
+                                                   mf.pair2_player1_id, mf.pair2_player2_id)
+        WHERE mf.id = ANY(%s::uuid[]) AND sp.season_id = %s
+    """, (fixture_ids, season.season_id))
+
+def full_replay(cur, season_id):
+    """Drop the checkpoint so the next run replays the whole season"""
+    cur.execute("DELETE FROM elo_replay_checkpoints WHERE season_id = %s", (season_id,))
+    incremental_backdate(cur, season_id)
+    return history(cur), ratings(cur)
+
+def test_new_results_replace_app_rows(pg_cursor, season):
+    season.add_results(40)
+    first = incremental_backdate(pg_cursor, season.season_id)
+    assert (first['kept'], first['replayed']) == (0, 40)
+
+    new_ids = season.add_results(5)
+    write_app_rows(pg_cursor, season, new_ids)
+    second = incremental_backdate(pg_cursor, season.season_id)
+    assert (second['kept'], second['replayed'], second['removed']) == (40, 5, 0)
+
+    pg_cursor.execute("SELECT match_fixture_id, COUNT(*) FROM elo_history GROUP BY 1 HAVING COUNT(*) <> 4")
+    assert pg_cursor.fetchall() == []
+    incremental = history(pg_cursor), ratings(pg_cursor)
+    assert len(incremental[0]) == 4 * 45
+    assert incremental == full_replay(pg_cursor, season.season_id)
+
+def test_rerun_without_new_results_changes_nothing(pg_cursor, season):
+    season.add_results(30)
+    incremental_backdate(pg_cursor, season.season_id)
+    before = history(pg_cursor), ratings(pg_cursor)
+    stats = incremental_backdate(pg_cursor, season.season_id)
+    assert (stats['kept'], stats['replayed'], stats['rows_written']) == (30, 0, 0)
+    assert (history(pg_cursor), ratings(pg_cursor)) == before
+
+def test_edited_result_replays_from_that_fixture(pg_cursor, season):
+    fixture_ids = season.add_results(30)
+    incremental_backdate(pg_cursor, season.season_id)
+    pg_cursor.execute("UPDATE match_results SET pair1_score = 9 - pair1_score, pair2_score = 9 - pair2_score "
+                      "WHERE fixture_id = %s", (fixture_ids[20],))
+    stats = incremental_backdate(pg_cursor, season.season_id)
+    assert (stats['kept'], stats['replayed'], stats['removed']) == (20, 10, 10)
+    assert (history(pg_cursor), ratings(pg_cursor)) == full_replay(pg_cursor, season.season_id)
@@ -0,0 +1,92 @@
+"""Snapshots must give back exactly what was written"""
+
+import math
+from datetime import datetime, timedelta, timezone
+
+from elo_engine import FixtureBatch, RatingStore, replay_season
+from elo_incremental import incremental_backdate
+from elo_snapshot import NULL_INT, Snapshot, from_micros, snapshot_from_db, write_snapshot
+
+PLAYERS = [
+    (f"00000000-0000-4000-8000-00000000000{i}", f"00000000-0000-4000-9000-00000000000{i}", name, 1000.0 + i, 1100.5 - i)
+    for i, name in enumerate(["Ann", "Bo", "Cy", "Di", "Éa"])
+]
+
+def sample_batch(store):
+    batch = FixtureBatch()
+    start = datetime(2025, 9, 1, 19, 0, 0, 250001, tzinfo=timezone.utc)
+    for f, (players, scores) in enumerate([((0, 1, 2, 3), (6, 3)), ((4, 0, 1, 2), (0, 0)), ((3, 4, 0, 1), (9, 0))]):
+        batch.add(players, *scores, fixture_id=f"00000000-0000-4000-a000-00000000000{f}",
+                  created_at=start + timedelta(minutes=f), week=None if f == 2 else f + 1)
+    return batch
+
+def test_round_trip(tmp_path):
+    store = RatingStore.from_dict({row[1]: row[3] for row in PLAYERS})
+    batch = sample_batch(store)
+    history = [
+        (PLAYERS[0][0], batch.fixture_ids[0], 1000, 1010, 10, 32, 1200, 0.25, 2 / 3, batch.created_at[0]),
+        (PLAYERS[1][0], "00000000-0000-4000-a000-0000000000ff", None, None, None, None, None, None, None, None),
+        ("00000000-0000-4000-8000-0000000000ff", batch.fixture_ids[1], 1, 2, 1, 32, 3, 0.5, 0.5, None),
+    ]
+    path = str(tmp_path / "season.elosnap")
+
+    assert write_snapshot(path, {'id': 's', 'name': 'Winter', 'k_factor': 24}, PLAYERS, batch, history) == 1
+
+    with Snapshot(path) as snapshot:
+        assert snapshot.season == {'id': 's', 'name': 'Winter', 'k_factor': 24}
+        assert snapshot.names == [row[2] for row in PLAYERS]
+        assert snapshot.player_ids == [row[1] for row in PLAYERS]
+        assert snapshot.season_player_ids == [row[0] for row in PLAYERS]
+        assert snapshot.ratings_by_name('rating') == {row[2]: row[4] for row in PLAYERS}
+        loaded = snapshot.batch()
+        assert list(loaded.players) == list(batch.players)
+        assert list(loaded.scores) == list(batch.scores)
+        assert loaded.fixture_ids == batch.fixture_ids
+        assert loaded.created_at == batch.created_at
+        assert loaded.weeks == batch.weeks
+        assert list(snapshot.store().ratings) == list(store.ratings)
+
+        columns = snapshot.columns
+        assert list(columns['history_player']) == [0, 1]
+        assert list(columns['history_fixture']) == [0, -1]
+        assert list(columns['history_old_rating']) == [1000, NULL_INT]
+        assert list(columns['history_k_factor']) == [32, NULL_INT]
+        assert columns['history_actual'][0] == 2 / 3 and math.isnan(columns['history_expected'][1])
+        assert from_micros(columns['history_created_us'][0]) == batch.created_at[0]
+
+def player_ratings(cur):
+    cur.execute("SELECT player_id::text, elo_rating FROM season_players")
+    return dict(cur.fetchall())
+
+def test_round_trip_from_db(pg_cursor, season, tmp_path):
+    season.add_results(25)
+    incremental_backdate(pg_cursor, season.season_id)
+    path = str(tmp_path / "season.elosnap")
+
+    assert snapshot_from_db(pg_cursor, season.season_id, path) == {
+        'players': 8, 'fixtures': 25, 'history': 100, 'history_skipped': 0}
+    with Snapshot(path) as snapshot:
+        assert snapshot.season['k_factor'] == 32
+        assert dict(zip(snapshot.player_ids, snapshot.columns['rating'])) == player_ratings(pg_cursor)
+        pg_cursor.execute("SELECT new_rating FROM elo_history ORDER BY created_at, match_fixture_id, season_player_id")
+        assert list(snapshot.columns['history_new_rating']) == [row[0] for row in pg_cursor.fetchall()]
+        # Replaying the snapshot from its starting ratings lands on the stored ratings
+        store = snapshot.store()
+        replay_season(store, snapshot.batch())
+        assert {key: int(rating) for key, rating in store.to_dict().items()} == player_ratings(pg_cursor)
+
+def test_history_for_players_without_a_profile_is_skipped(pg_cursor, season, tmp_path):
+    season.add_results(25)
+    incremental_backdate(pg_cursor, season.season_id)
+    orphan = season.player_ids[0]
+    pg_cursor.execute("DELETE FROM profiles WHERE id = %s", (orphan,))
+    pg_cursor.execute("SELECT COUNT(*) FROM elo_history WHERE season_player_id = %s",
+                      (season.season_player_ids[orphan],))
+    orphan_rows = pg_cursor.fetchone()[0]
+    pg_cursor.execute("DELETE FROM match_fixtures WHERE %s IN (pair1_player1_id, pair1_player2_id, "
+                      "pair2_player1_id, pair2_player2_id)", (orphan,))
+    fixtures = 25 - orphan_rows
+
+    counts = snapshot_from_db(pg_cursor, season.season_id, str(tmp_path / "season.elosnap"))
+    assert counts == {'players': 7, 'fixtures': fixtures, 'history': 100 - orphan_rows,
+                      'history_skipped': orphan_rows}
@@ -0,0 +1,60 @@
+"""The backfill emitter's three outputs must store identical rows"""
+
+import io
+import math
+from datetime import datetime, timedelta, timezone
+
+from elo_history_writer import ELO_HISTORY_COLUMNS
+from elo_sql_emitter import execute_inserts, insert_statements, sql_literal, write_copy_file, write_insert_file
+
+SELECT_SQL = f"SELECT {', '.join(ELO_HISTORY_COLUMNS)} FROM elo_history ORDER BY id"
+
+def sample_rows(count=7):
+    created_at = datetime(2025, 9, 1, 18, 30, 0, 123456, tzinfo=timezone.utc)
+    for i in range(count):
+        yield (
+            f"00000000-0000-4000-8000-{i:012d}",
+            f"00000000-0000-4000-9000-{i // 4:012d}",
+            1000 + i, 1010 + i, 10, 32,
+            None if i == 3 else 1200,
+            0.1 + 0.2 if i % 2 else 1 / 3,
+            None if i == 5 else 0.5,
+            created_at + timedelta(minutes=i),
+        )
+
+def stored(cur):
+    cur.execute(SELECT_SQL)
+    rows = [tuple(str(value) if column.endswith('_id') else value
+                  for column, value in zip(ELO_HISTORY_COLUMNS, row)) for row in cur.fetchall()]
+    cur.execute("TRUNCATE elo_history")
+    return rows
+
+def test_insert_statements_batch_and_flatten():
+    statements = list(insert_statements(sample_rows(7), batch_size=3))
+    assert [len(params) for _, params in statements] == [30, 30, 10]
+    assert statements[0][0].count('%s::uuid') == 6
+    assert statements[2][0] == statements[0][0].split('),\n')[0] + ')'
+
+def test_sql_literal():
+    assert sql_literal("O'Brien") == "'O''Brien'"
+    assert sql_literal(None) == 'NULL'
+    assert sql_literal(math.inf) == "'inf'"
+    assert sql_literal(True) == 'TRUE'
+
+def test_outputs_round_trip(pg_cursor):
+    expected = list(sample_rows())
+
+    assert execute_inserts(pg_cursor, sample_rows(), batch_size=3) == len(expected)
+    assert stored(pg_cursor) == expected
+
+    script = io.StringIO()
+    write_insert_file(script, sample_rows(), batch_size=3)
+    body = script.getvalue().replace('BEGIN;', '').replace('COMMIT;', '')
+    pg_cursor.execute(body)
+    assert stored(pg_cursor) == expected
+
+    data = io.StringIO()
+    write_copy_file(data, sample_rows())
+    data.seek(0)
+    pg_cursor.copy_expert(f"COPY elo_history ({', '.join(ELO_HISTORY_COLUMNS)}) FROM STDIN", data)
+    assert stored(pg_cursor) == expected
@@ -0,0 +1,69 @@
+"""The time-series store must answer exactly as elo_history would"""
+
+from elo_incremental import incremental_backdate
+from elo_timeseries import RatingSeries, compact, refresh
+
+def db_history(cur):
+    """{season_player_id: [(created_at, old, new, change, fixture_id), ...]} in the store's order"""
+    cur.execute("""
+        SELECT season_player_id::text, created_at, old_rating, new_rating, rating_change, match_fixture_id::text
+        FROM elo_history ORDER BY season_player_id, created_at, match_fixture_id
+    """)
+    history = {}
+    for season_player_id, *row in cur.fetchall():
+        history.setdefault(season_player_id, []).append(tuple(row))
+    return history
+
+def store_history(path, season_player_ids):
+    with RatingSeries(path) as series:
+        return {sp_id: rows for sp_id in season_player_ids if (rows := series.history(sp_id))}
+
+def test_round_trip_through_refreshes(pg_cursor, season, tmp_path):
+    path = str(tmp_path / "series")
+    season_player_ids = list(season.season_player_ids.values())
+    fixture_ids = season.add_results(30)
+    incremental_backdate(pg_cursor, season.season_id)
+
+    counts = refresh(path, pg_cursor)
+    assert (counts['appended'], counts['rows']) == (1, 120)
+    assert store_history(path, season_player_ids) == db_history(pg_cursor)
+
+    # Unchanged: nothing fetched
+    assert refresh(path, pg_cursor)['skipped'] == 1
+
+    # New results at the end are appended under the same generation
+    season.add_results(5)
+    incremental_backdate(pg_cursor, season.season_id)
+    counts = refresh(path, pg_cursor)
+    assert (counts['appended'], counts['reloaded'], counts['rows']) == (1, 0, 20)
+    assert store_history(path, season_player_ids) == db_history(pg_cursor)
+
+    # An edited result rewrites history mid-season, so the season is reloaded
+    pg_cursor.execute("UPDATE match_results SET pair1_score = 9 - pair1_score, pair2_score = 9 - pair2_score "
+                      "WHERE fixture_id = %s", (fixture_ids[10],))
+    incremental_backdate(pg_cursor, season.season_id)
+    counts = refresh(path, pg_cursor)
+    assert (counts['reloaded'], counts['rows']) == (1, 140)
+    expected = db_history(pg_cursor)
+    assert store_history(path, season_player_ids) == expected
+
+    assert compact(path) == (280, 140)
+    assert store_history(path, season_player_ids) == expected
+
+def test_range_queries(pg_cursor, season, tmp_path):
+    path = str(tmp_path / "series")
+    season.add_results(30)
+    incremental_backdate(pg_cursor, season.season_id)
+    refresh(path, pg_cursor)
+    history = db_history(pg_cursor)
+
+    with RatingSeries(path) as series:
+        for season_player_id, rows in history.items():
+            first, middle, last = rows[0], rows[len(rows) // 2], rows[-1]
+            assert series.rating_at(season_player_id, first[0].replace(year=2000)) == first[1]
+            assert series.rating_at(season_player_id, middle[0]) == middle[2]
+            assert series.rating_at(season_player_id, last[0].replace(year=2100)) == last[2]
+            assert series.history(season_player_id, start=middle[0]) == rows[len(rows) // 2 + 1:]
+            peak = series.peak(season_player_id)['rating']
+            assert peak == max([rows[0][1]] + [row[2] for row in rows])
+        assert series.rating_at("00000000-0000-0000-0000-000000000000", last[0]) is None
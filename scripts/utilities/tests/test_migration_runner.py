@@ -0,0 +1,80 @@
+"""Statement splitting, and all-or-nothing application against a real Postgres"""
+
+import re
+
+import pytest
+
+from migration_runner import MIGRATIONS_DIR, Migration, MigrationError, apply_migrations, discover, split_statements
+
+def statements(sql):
+    return [statement for _, statement in split_statements(sql)]
+
+def test_splits_on_top_level_semicolons():
+    assert statements("SELECT 1;\nSELECT 2;\n\nSELECT 3") == ["SELECT 1;", "SELECT 2;", "SELECT 3"]
+
+@pytest.mark.parametrize('sql', [
+    "SELECT 'a;b'",
+    "SELECT 'it''s; fine'",
+    "SELECT E'\\';'",
+    'SELECT 1 AS "semi;colon"',
+    "SELECT 1 /* ; /* nested ; */ still ; a comment */",
+    "CREATE FUNCTION f() RETURNS int AS $$ BEGIN RETURN 1; END; $$ LANGUAGE plpgsql",
+    "CREATE FUNCTION f() RETURNS int AS $body$ SELECT $$;$$; $body$ LANGUAGE sql",
+])
+def test_quoted_semicolons_do_not_split(sql):
+    assert statements(sql + ";\nSELECT 2;") == [sql + ";", "SELECT 2;"]
+
+def test_line_numbers_skip_comments():
+    sql = "-- header; with a semicolon\n/* block */\nSELECT 1;\n\n-- only a comment;\nSELECT\n  2;"
+    assert list(split_statements(sql)) == [(3, "SELECT 1;"), (6, "SELECT\n  2;")]
+
+@pytest.mark.parametrize('sql, message', [
+    ("SELECT 'open", "unterminated quoted string"),
+    ("SELECT 1 /* open", "unterminated /* comment"),
+    ("SELECT $tag$ open", "unterminated $tag$ quote"),
+])
+def test_unterminated_tokens_raise_with_location(sql, message):
+    with pytest.raises(MigrationError, match=re.escape(f"<sql>:1: {message}")):
+        list(split_statements(sql))
+
+def write(tmp_path, name, sql):
+    path = tmp_path / name
+    path.write_text(sql)
+    return Migration(path, tmp_path)
+
+def test_transaction_control_is_dropped(tmp_path):
+    migration = write(tmp_path, "001.sql", "BEGIN;\nCREATE TABLE t (id int);\nCOMMIT;\n")
+    assert migration.statements == [(2, "CREATE TABLE t (id int);")]
+
+def test_non_transactional_statements_are_rejected(tmp_path):
+    migration = write(tmp_path, "001.sql", "CREATE INDEX CONCURRENTLY i ON t (id);")
+    with pytest.raises(MigrationError, match="001.sql:1: statement can't run inside a transaction"):
+        migration.statements
+
+def test_repository_migrations_split():
+    migrations = discover(MIGRATIONS_DIR)
+    assert migrations
+    for migration in migrations:
+        assert all(statement.strip() for _, statement in migration.statements)
+
+def test_failed_run_applies_nothing(pg_cursor, tmp_path):
+    conn = pg_cursor.connection
+    # apply_migrations ends the transaction, so keep the scratch schema it runs in
+    conn.commit()
+    good = write(tmp_path, "001_table.sql", "CREATE TABLE widgets (id int);\nINSERT INTO widgets VALUES (1);")
+    bad = write(tmp_path, "002_bad.sql", "INSERT INTO widgets VALUES (2);\nINSERT INTO missing VALUES (1);")
+
+    with pytest.raises(MigrationError, match="002_bad.sql:2:"):
+        apply_migrations(conn, [good, bad])
+    pg_cursor.execute("SELECT to_regclass('widgets'), to_regclass('migration_ledger')")
+    assert pg_cursor.fetchone() == (None, None)
+
+    bad = write(tmp_path, "002_bad.sql", "INSERT INTO widgets VALUES (2);")
+    assert apply_migrations(conn, [good, bad]) == [good, bad]
+    assert apply_migrations(conn, [good, bad]) == []
+    pg_cursor.execute("SELECT array_agg(id ORDER BY id) FROM widgets")
+    assert pg_cursor.fetchone() == ([1, 2],)
+
+    write(tmp_path, "001_table.sql", "CREATE TABLE widgets (id bigint);")
+    with pytest.raises(MigrationError, match="changed since they ran: 001_table.sql"):
+        apply_migrations(conn, [Migration(tmp_path / "001_table.sql", tmp_path), bad])
@@ -0,0 +1,59 @@
+"""Each resolver status, and what counts as resolved"""
+
+import pytest
+
+from name_resolver import NameResolver, UnresolvedNameError
+
+PLAYERS = {
+    1: "Sid Abraham",
+    2: "Mark A",
+    3: "Mark B",
+    4: "Jon Best",
+    5: "Ben",
+    6: "Michael Brennan",
+    7: "Charlotte Meacham",
+    8: "Charlie Meacham",
+}
+
+@pytest.fixture
+def resolver():
+    return NameResolver(PLAYERS, {"Stevie P": "Sid Abraham"})
+
+@pytest.mark.parametrize('raw, status, key', [
+    ("Sid Abraham", 'exact', 1),
+    ("  sid   ABRAHAM ", 'exact', 1),
+    ("stevie p", 'alias', 1),
+    ("Jon", 'first-name', 4),
+    ("Micheal Brennan", 'fuzzy', 6),
+    ("Mark", 'ambiguous', None),
+    ("Charl Meacham", 'ambiguous', None),
+    ("Charlie Meachem", 'unknown', None),
+    ("Ben Jones", 'unknown', None),
+    ("Zed", 'unknown', None),
+])
+def test_statuses(resolver, raw, status, key):
+    resolution = resolver.resolve(raw)
+    assert resolution.status == status
+    assert resolution.key == key
+    assert resolution.resolved == (status in ('exact', 'alias', 'first-name'))
+
+def test_ambiguous_lists_candidates(resolver):
+    assert sorted(name for name, _ in resolver.resolve("Mark").candidates) == ["Mark A", "Mark B"]
+
+def test_alias_to_an_ambiguous_target_is_ignored():
+    resolver = NameResolver({1: "Mark A", 2: "Mark A"}, {"Marky": "Mark A"})
+    assert resolver.resolve("Marky").status == 'unknown'
+    assert resolver.resolve("Mark A").status == 'ambiguous'
+
+def test_call_raises_for_guesses(resolver):
+    assert resolver("stevie p") == 1
+    with pytest.raises(UnresolvedNameError):
+        resolver("Micheal Brennan")
+    with pytest.raises(UnresolvedNameError):
+        resolver("Mark")
+    assert [resolution.raw for resolution in resolver.issues()] == ["Micheal Brennan", "Mark"]
+
+def test_resolve_many_caches_each_spelling(resolver):
+    resolutions = resolver.resolve_many(["Jon", "Zed", "Jon"])
+    assert list(resolutions) == ["Jon", "Zed"]
+    assert resolver.resolve("Jon") is resolutions["Jon"]
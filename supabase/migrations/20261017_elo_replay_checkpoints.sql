@@ -0,0 +1,17 @@
+-- Migration: ELO replay checkpoints
+-- Date: 2026-10-17
+-- Description: Stores per-season replay state so scripts/utilities/backdate_elo.py --incremental
+--              can resume from the last applied result instead of replaying the whole season
+
+CREATE TABLE IF NOT EXISTS elo_replay_checkpoints (
+  season_id UUID PRIMARY KEY REFERENCES seasons(id) ON DELETE CASCADE,
+  last_created_at TIMESTAMPTZ,
+  last_fixture_id UUID,
+  state JSONB NOT NULL,
+  updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Only the backdating scripts (service role / direct connection) touch this table
+ALTER TABLE elo_replay_checkpoints ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE elo_replay_checkpoints IS 'Per-season ELO replay state: start ratings, current ratings and applied results';
@@ -0,0 +1,152 @@
+-- Migration: Server-side ELO season replay
+-- Date: 2026-10-17
+-- Description: replay_season_elo() rebuilds a season's elo_history and final ratings in one call,
+--              with the same arithmetic as scripts/utilities/elo_engine.py (float ratings, int()
+--              truncation of stored values). Deployed and checked by scripts/utilities/elo_server_replay.py
+
+CREATE OR REPLACE FUNCTION replay_season_elo(season_uuid UUID, k_factor_override INTEGER DEFAULT NULL)
+RETURNS TABLE (fixtures_replayed INTEGER, fixtures_skipped INTEGER, history_rows INTEGER)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    k INTEGER;
+    player_ids UUID[];
+    season_player_ids UUID[];
+    ratings DOUBLE PRECISION[];
+    fixture RECORD;
+    slots INTEGER[];
+    slot INTEGER;
+    pair1_expected DOUBLE PRECISION;
+    pair1_avg DOUBLE PRECISION;
+    pair2_avg DOUBLE PRECISION;
+    pair1_actual DOUBLE PRECISION;
+    pair2_actual DOUBLE PRECISION;
+    pair1_change DOUBLE PRECISION;
+    pair2_change DOUBLE PRECISION;
+    old_rating DOUBLE PRECISION;
+    new_rating DOUBLE PRECISION;
+    total_games INTEGER;
+    replayed INTEGER := 0;
+    skipped INTEGER := 0;
+    n INTEGER := 0;
+    -- History rows are collected here and written with one INSERT at the end
+    h_season_player UUID[] := '{}';
+    h_fixture UUID[] := '{}';
+    h_old INTEGER[] := '{}';
+    h_new INTEGER[] := '{}';
+    h_change INTEGER[] := '{}';
+    h_opponent_avg INTEGER[] := '{}';
+    h_expected DOUBLE PRECISION[] := '{}';
+    h_actual DOUBLE PRECISION[] := '{}';
+    h_created TIMESTAMPTZ[] := '{}';
+BEGIN
+    SELECT COALESCE(k_factor_override, s.elo_k_factor, 32) INTO k FROM seasons s WHERE s.id = season_uuid;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Season % not found', season_uuid;
+    END IF;
+
+    -- Starting ratings as in elo_db.SEASON_PLAYERS_SQL: the first history row's
+    -- old_rating once a season has been replayed, else season_players.elo_rating
+    SELECT array_agg(sp.player_id ORDER BY sp.name, sp.id),
+           array_agg(sp.id ORDER BY sp.name, sp.id),
+           array_agg(sp.starting_elo ORDER BY sp.name, sp.id)
+    INTO player_ids, season_player_ids, ratings
+    FROM (
+        SELECT DISTINCT ON (sp.player_id) sp.id, sp.player_id, p.name,
+               COALESCE(first_eh.old_rating, sp.elo_rating)::DOUBLE PRECISION AS starting_elo
+        FROM season_players sp
+        JOIN profiles p ON sp.player_id = p.id
+        LEFT JOIN LATERAL (
+            SELECT eh.old_rating
+            FROM elo_history eh
+            WHERE eh.season_player_id = sp.id
+            ORDER BY eh.created_at, eh.match_fixture_id
+            LIMIT 1
+        ) first_eh ON TRUE
+        WHERE sp.season_id = season_uuid
+        ORDER BY sp.player_id, p.name, sp.id
+    ) sp;
+
+    IF array_position(ratings, NULL) IS NOT NULL THEN
+        RAISE EXCEPTION 'Season % has players without a starting rating', season_uuid;
+    END IF;
+
+    DELETE FROM elo_history
+    WHERE season_player_id IN (SELECT id FROM season_players WHERE season_id = season_uuid);
+    -- A full replay makes any incremental checkpoint stale
+    DELETE FROM elo_replay_checkpoints WHERE season_id = season_uuid;
+
+    -- Replay order matches elo_db.ORDERED_RESULTS_SQL; players are looked up as array positions
+    FOR fixture IN
+        SELECT mf.id, mr.pair1_score, mr.pair2_score, mr.created_at,
+               array_position(player_ids, mf.pair1_player1_id) AS a,
+               array_position(player_ids, mf.pair1_player2_id) AS b,
+               array_position(player_ids, mf.pair2_player1_id) AS c,
+               array_position(player_ids, mf.pair2_player2_id) AS d
+        FROM match_fixtures mf
+        JOIN matches m ON mf.match_id = m.id
+        JOIN match_results mr ON mf.id = mr.fixture_id
+        WHERE m.season_id = season_uuid
+        ORDER BY mr.created_at, mf.id
+    LOOP
+        -- Missing players, or players outside the season, are skipped as FixtureBatch.from_rows does
+        IF fixture.a IS NULL OR fixture.b IS NULL OR fixture.c IS NULL OR fixture.d IS NULL THEN
+            skipped := skipped + 1;
+            CONTINUE;
+        END IF;
+
+        pair1_avg := (ratings[fixture.a] + ratings[fixture.b]) / 2;
+        pair2_avg := (ratings[fixture.c] + ratings[fixture.d]) / 2;
+        pair1_expected := 1.0::DOUBLE PRECISION / (1.0::DOUBLE PRECISION + power(10::DOUBLE PRECISION, (pair2_avg - pair1_avg) / 400));
+        total_games := fixture.pair1_score + fixture.pair2_score;
+        IF total_games > 0 THEN
+            pair1_actual := fixture.pair1_score::DOUBLE PRECISION / total_games;
+            pair2_actual := fixture.pair2_score::DOUBLE PRECISION / total_games;
+        ELSE
+            pair1_actual := 0.5;
+            pair2_actual := 0.5;
+        END IF;
+        pair1_change := k * (pair1_actual - pair1_expected);
+        pair2_change := k * (pair2_actual - (1.0::DOUBLE PRECISION - pair1_expected));
+
+        slots := ARRAY[fixture.a, fixture.b, fixture.c, fixture.d];
+        FOR i IN 1..4 LOOP
+            slot := slots[i];
+            old_rating := ratings[slot];
+            new_rating := old_rating + CASE WHEN i <= 2 THEN pair1_change ELSE pair2_change END;
+            ratings[slot] := new_rating;
+
+            n := n + 1;
+            h_season_player[n] := season_player_ids[slot];
+            h_fixture[n] := fixture.id;
+            h_old[n] := trunc(old_rating)::INTEGER;
+            h_new[n] := trunc(new_rating)::INTEGER;
+            h_change[n] := trunc(new_rating - old_rating)::INTEGER;
+            h_opponent_avg[n] := trunc(CASE WHEN i <= 2 THEN pair2_avg ELSE pair1_avg END)::INTEGER;
+            h_expected[n] := CASE WHEN i <= 2 THEN pair1_expected ELSE 1.0::DOUBLE PRECISION - pair1_expected END;
+            h_actual[n] := CASE WHEN i <= 2 THEN pair1_actual ELSE pair2_actual END;
+            h_created[n] := fixture.created_at;
+        END LOOP;
+        replayed := replayed + 1;
+    END LOOP;
+
+    INSERT INTO elo_history (
+        season_player_id, match_fixture_id, old_rating, new_rating,
+        rating_change, k_factor, opponent_avg_rating, expected_score,
+        actual_score, created_at
+    )
+    SELECT h.season_player_id, h.fixture_id, h.old_rating, h.new_rating, h.rating_change, k,
+           h.opponent_avg, h.expected, h.actual, h.created_at
+    FROM unnest(h_season_player, h_fixture, h_old, h_new, h_change, h_opponent_avg, h_expected, h_actual, h_created)
+         AS h(season_player_id, fixture_id, old_rating, new_rating, rating_change, opponent_avg, expected, actual, created_at);
+
+    UPDATE season_players sp
+    SET elo_rating = trunc(f.rating)::INTEGER
+    FROM unnest(season_player_ids, ratings) AS f(id, rating)
+    WHERE sp.id = f.id;
+
+    RETURN QUERY SELECT replayed, skipped, n;
+END;
+$$;
+
+COMMENT ON FUNCTION replay_season_elo IS 'Rebuild a season''s elo_history and season_players.elo_rating from its match results in one call';